@@ -1,4 +1,5 @@
 import sys
+from multiprocessing import freeze_support
 from PySide6.QtWidgets import QApplication
 from PySide6.QtGui import QFont
 from gui import MainWindow
@@ -11,4 +12,5 @@ def main():
     sys.exit(app.exec())
 
 if __name__ == "__main__":
+    freeze_support()  # PyInstaller でのプロセスプール用
     main()
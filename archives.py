@@ -0,0 +1,139 @@
+import io, os, posixpath, re, struct, time, zipfile, zlib
+from dataclasses import dataclass
+from typing import NamedTuple
+from utils import SUPPORTED_EXTENSIONS
+
+# ZIP / CBZ を展開せずに入力として扱う
+# 探索時に中央ディレクトリを1回だけ読み、各画像のローカルヘッダ位置を ArchiveMember に持たせてワーカーへ渡す
+# ワーカーはその位置へ直接シークして読むので、アーカイブごとに中央ディレクトリを読み直さない
+
+ARCHIVE_EXTENSIONS = ('.zip', '.cbz')
+
+# ローカルファイルヘッダ（署名, 版, フラグ, 圧縮方式, 時刻, 日付, CRC, 圧縮後サイズ, 元サイズ, 名前長, 拡張長）
+_LOCAL_HEADER = struct.Struct("<4s5H3L2H")
+_LOCAL_SIGNATURE = b"PK\x03\x04"
+
+
+class MemberStat(NamedTuple):
+    """os.stat_result の代わりに処理記録へ渡す、メンバーのサイズと更新日時。"""
+    st_size: int
+    st_mtime_ns: int
+
+
+@dataclass(frozen=True)
+class ArchiveMember:
+    """アーカイブ内の画像1枚。pickle してワーカープロセスへ渡せます。"""
+    archive: str
+    name: str
+    header_offset: int
+    compress_type: int
+    compress_size: int
+    file_size: int
+    crc: int
+    mtime_ns: int
+    encrypted: bool = False
+
+    @property
+    def path(self):
+        """表示・記録用のパス（アーカイブのパス!/メンバー名）。"""
+        return f"{self.archive}!/{self.name}"
+
+    @property
+    def basename(self):
+        return posixpath.basename(self.name)
+
+    @property
+    def output_subfolder(self):
+        """出力先のサブフォルダ名（アーカイブ名から拡張子を除いたもの）。"""
+        return os.path.splitext(os.path.basename(self.archive))[0]
+
+    @property
+    def output_dir(self):
+        """出力先のフォルダ（アーカイブ名/メンバーのフォルダ）。別のフォルダにある同じ名前のページが重ならないようにします。
+
+        ".." や絶対パスは取り除き、出力フォルダの外へは出しません。
+        """
+        parts = [part for part in posixpath.dirname(self.name).replace("\\", "/").split("/") if part not in ("", ".", "..")]
+        return posixpath.join(self.output_subfolder, *parts)
+
+    def stat(self):
+        return MemberStat(self.file_size, self.mtime_ns)
+
+
+def is_archive(path):
+    return path.lower().endswith(ARCHIVE_EXTENSIONS)
+
+
+def natural_key(name):
+    """数字を数値として比べる並び順（page2 < page10）。"""
+    return [int(part) if part.isdigit() else part.lower() for part in re.split(r"(\d+)", name)]
+
+
+def _is_image_member(info):
+    name = info.filename
+    if info.is_dir() or name.startswith("__MACOSX/") or posixpath.basename(name).startswith("."):
+        return False
+    return name.lower().endswith(SUPPORTED_EXTENSIONS)
+
+
+def iter_archive_members(archive_path):
+    """アーカイブ内の画像を、名前の自然順（読む順）に ArchiveMember で返します。"""
+    with zipfile.ZipFile(archive_path) as archive:
+        infos = [info for info in archive.infolist() if _is_image_member(info)]
+    infos.sort(key=lambda info: natural_key(info.filename))
+    for info in infos:
+        mtime = time.mktime(info.date_time + (0, 0, -1))
+        yield ArchiveMember(
+            archive=archive_path, name=info.filename, header_offset=info.header_offset,
+            compress_type=info.compress_type, compress_size=info.compress_size, file_size=info.file_size,
+            crc=info.CRC, mtime_ns=int(mtime * 1_000_000_000), encrypted=bool(info.flag_bits & 0x1),
+        )
+
+
+def read_member(member):
+    """メンバーの中身をメモリに読み出します（ローカルヘッダへ直接シークし、CRC も確かめます）。"""
+    if member.encrypted:
+        raise RuntimeError("暗号化されたアーカイブには対応していません")
+    if member.compress_type not in (zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED):
+        # bzip2 / LZMA などはまれなので zipfile に任せる
+        with zipfile.ZipFile(member.archive) as archive:
+            return archive.read(member.name)
+    with open(member.archive, "rb") as f:
+        f.seek(member.header_offset)
+        header = f.read(_LOCAL_HEADER.size)
+        fields = _LOCAL_HEADER.unpack(header) if len(header) == _LOCAL_HEADER.size else None
+        if not fields or fields[0] != _LOCAL_SIGNATURE:
+            raise zipfile.BadZipFile(f"ローカルヘッダが壊れています: {member.name}")
+        f.seek(fields[9] + fields[10], os.SEEK_CUR)
+        raw = f.read(member.compress_size)
+    data = raw if member.compress_type == zipfile.ZIP_STORED else zlib.decompress(raw, -zlib.MAX_WBITS)
+    if len(data) != member.file_size or zlib.crc32(data) != member.crc:
+        raise zipfile.BadZipFile(f"CRC が一致しません: {member.name}")
+    return data
+
+
+# 入力（ファイルパス or ArchiveMember）を共通に扱うヘルパ
+
+def input_label(item):
+    """表示・記録用のパス文字列。"""
+    return item.path if isinstance(item, ArchiveMember) else item
+
+
+def input_name(item):
+    """ファイル名部分。"""
+    return item.basename if isinstance(item, ArchiveMember) else os.path.basename(item)
+
+
+def input_stat(item):
+    """サイズと更新日時（読めなければ None）。"""
+    if isinstance(item, ArchiveMember):
+        return item.stat()
+    try:
+        return os.stat(item)
+    except OSError:
+        return None
+
+
+def open_source(source):
+    """ファイルパスかバイト列を Image.open に渡せる形にします。"""
+    return io.BytesIO(source) if isinstance(source, bytes) else source
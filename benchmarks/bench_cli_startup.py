@@ -0,0 +1,55 @@
+"""cli.py のコールドスタート時間を測り、予算内か・PySide6 を読み込んでいないかを確認します。
+
+    python benchmarks/bench_cli_startup.py --budget-ms 400
+
+予算超過または PySide6 が読み込まれた場合は終了コード 1 を返します。
+"""
+import argparse, os, statistics, subprocess, sys, tempfile, time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 空フォルダを入力にして「起動→探索→終了」までを測り、最後に読み込まれたモジュールを確認する
+PROBE = (
+    "import sys, runpy; sys.argv = ['cli.py', '-q', '--summary', {summary!r}, {folder!r}];"
+    "code = 0\n"
+    "try:\n"
+    "    runpy.run_path('cli.py', run_name='__main__')\n"
+    "except SystemExit as e:\n"
+    "    code = e.code\n"
+    "print('PySide6' in sys.modules)"
+)
+
+
+def measure(cmd, repeat):
+    times = []
+    out = ""
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = subprocess.run(cmd, cwd=ROOT, capture_output=True, text=True).stdout
+        times.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(times), out
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--budget-ms", type=float, default=400.0, help="中央値の許容上限（ミリ秒）")
+    ap.add_argument("--repeat", type=int, default=7)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        summary = os.path.join(tmp, "summary.json")
+        help_ms, _ = measure([sys.executable, "cli.py", "--help"], args.repeat)
+        run_ms, out = measure([sys.executable, "-c", PROBE.format(summary=summary, folder=tmp)], args.repeat)
+
+    qt_loaded = out.strip().endswith("True")
+    print(f"cli.py --help        : {help_ms:7.1f} ms (median of {args.repeat})")
+    print(f"cli.py empty folder  : {run_ms:7.1f} ms (median of {args.repeat})")
+    print(f"budget               : {args.budget_ms:7.1f} ms")
+    print(f"PySide6 imported     : {qt_loaded}")
+    ok = run_ms <= args.budget_ms and not qt_loaded
+    print("OK" if ok else "NG")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
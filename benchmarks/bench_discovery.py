@@ -0,0 +1,113 @@
+"""ファイル探索の「最初の出力までの時間」を、一括リスト方式とストリーミング方式で比較します。
+
+    python benchmarks/bench_discovery.py --folders 200 --files 50 --latency-ms 5
+
+--latency-ms を付けると os.scandir の呼び出しごとに待ち時間を入れ、ネットワーク共有を模擬します。
+"""
+import argparse, os, shutil, sys, tempfile, time
+from contextlib import contextmanager, nullcontext
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image
+from metrics import MetricsSink
+from processor import ImageProcessor
+from utils import SUPPORTED_EXTENSIONS
+
+
+def build_tree(root, folders, files):
+    """小さな JPEG を folders × files 枚並べた合成ツリーを作ります。"""
+    sample = os.path.join(root, "sample.jpg")
+    Image.new("RGB", (64, 32), (120, 80, 40)).save(sample)
+    src = os.path.join(root, "src")
+    for d in range(folders):
+        folder = os.path.join(src, f"vol{d:04d}")
+        os.makedirs(folder)
+        for f in range(files):
+            shutil.copyfile(sample, os.path.join(folder, f"page{f:04d}.jpg"))
+    return src
+
+
+@contextmanager
+def with_latency(latency):
+    """with の間だけ os.scandir に遅延を挟みます（os.walk も内部で os.scandir を使う）。"""
+    original = os.scandir
+
+    def slow_scandir(path="."):
+        time.sleep(latency)
+        return original(path)
+
+    os.scandir = slow_scandir
+    try:
+        yield
+    finally:
+        os.scandir = original
+
+
+def split_baseline(image_path, output_folder):
+    """変更前の split_image_file と同じ分割（中央で左右に切り、そのまま保存する）。"""
+    file_base, file_ext = os.path.splitext(os.path.basename(image_path))
+    with Image.open(image_path) as image:
+        width, height = image.size
+        image.crop((width // 2, 0, width, height)).save(os.path.join(output_folder, f"{file_base}_a{file_ext}"))
+        image.crop((0, 0, width // 2, height)).save(os.path.join(output_folder, f"{file_base}_b{file_ext}"))
+
+
+def list_then_split(src):
+    """従来方式: os.walk で全件のリストを作ってから、変更前の分割処理で1枚ずつ分割する。"""
+    t0 = time.perf_counter()
+    image_files = []
+    for root, _, files in os.walk(src):
+        for file in files:
+            if file.lower().endswith(SUPPORTED_EXTENSIONS):
+                image_files.append(os.path.join(root, file))
+    output_folder = os.path.join(os.path.dirname(image_files[0]), "half")
+    os.makedirs(output_folder, exist_ok=True)
+    first = None
+    for image_path in image_files:
+        split_baseline(image_path, output_folder)
+        if first is None:
+            first = time.perf_counter() - t0
+    return first, time.perf_counter() - t0
+
+
+def streaming(src):
+    """新方式: process_images（os.scandir プロデューサー＋上限付きキュー）。"""
+    t0 = time.perf_counter()
+    first = []
+
+    # 進捗コールバックは間引かれるので、1ファイルごとに届く計測レコードで最初の完了を捉える
+    class FirstRecord(MetricsSink):
+        def record(self, record):
+            if not first:
+                first.append(time.perf_counter() - t0)
+
+    ImageProcessor(workers=1, incremental=False, metrics_sink=FirstRecord()).process_images([src], "right_to_left")
+    return first[0], time.perf_counter() - t0
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--folders", type=int, default=200)
+    ap.add_argument("--files", type=int, default=50)
+    ap.add_argument("--latency-ms", type=float, default=0.0, help="フォルダ列挙ごとの模擬遅延")
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        src = build_tree(tmp, args.folders, args.files)
+        rows = []
+        for name, fn in (("list_then_split", list_then_split), ("streaming", streaming)):
+            with with_latency(args.latency_ms / 1000) if args.latency_ms else nullcontext():
+                first, total = fn(src)
+            rows.append((name, first, total))
+            for folder in os.listdir(src):
+                shutil.rmtree(os.path.join(src, folder, "half"), ignore_errors=True)
+
+    print(f"{args.folders * args.files} files / {args.folders} folders / latency {args.latency_ms} ms")
+    print(f"{'method':<16} {'first output (s)':>17} {'total (s)':>10}")
+    for name, first, total in rows:
+        print(f"{name:<16} {first:>17.3f} {total:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
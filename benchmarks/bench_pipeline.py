@@ -0,0 +1,212 @@
+"""分割パイプライン（ImageProcessor）のベンチマーク。
+
+    python benchmarks/bench_pipeline.py --sizes thumb,screen --out results.json
+    python benchmarks/bench_pipeline.py --compare results.json          # 前回結果と比較
+
+SUPPORTED_EXTENSIONS の各形式×サイズごとに合成コーパスを作り、
+  * process_images 全体（ワーカー数指定）の files/s・MP/s・ピーク RSS
+  * 1枚分の処理（split_image_file）の工程別時間 open / decode / crop / encode / write
+を測って JSON に保存します。各ケースは子プロセスで実行するので、ピーク RSS はケースごとの値です。
+"""
+import argparse, json, os, platform, random, statistics, subprocess, sys, tempfile, time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from PIL import Image, ImageDraw
+import PIL
+from utils import SUPPORTED_EXTENSIONS
+
+# 名前: (幅, 高さ, 1ケースあたりの枚数)
+SIZES = {
+    "thumb":  (320, 240, 200),
+    "screen": (1920, 1080, 40),
+    "a4_300": (2480, 3508, 8),    # A4 見開きの片側 300dpi
+    "a3_600": (7016, 9921, 2),    # A3 600dpi スキャン
+}
+DEFAULT_SIZES = "thumb,screen,a4_300"
+
+# 拡張子ごとの保存形式
+FORMAT_OF = {".jpg": "JPEG", ".jpeg": "JPEG", ".png": "PNG", ".bmp": "BMP",
+             ".gif": "GIF", ".tiff": "TIFF", ".webp": "WEBP"}
+
+
+def synth_image(width, height, seed):
+    """グラデーション＋線画の合成ページ。乱数は seed で固定します。"""
+    rng = random.Random(seed)
+    base = Image.merge("RGB", [
+        Image.linear_gradient("L").resize((width, height)),
+        Image.radial_gradient("L").resize((width, height)),
+        Image.linear_gradient("L").rotate(90).resize((width, height)),
+    ])
+    draw = ImageDraw.Draw(base)
+    for _ in range(200):
+        x0, y0 = rng.randrange(width), rng.randrange(height)
+        x1, y1 = rng.randrange(width), rng.randrange(height)
+        draw.line((x0, y0, x1, y1), fill=(rng.randrange(256),) * 3, width=max(1, width // 400))
+    return base
+
+
+def build_corpus(folder, ext, width, height, count):
+    """同じ内容のページを count 枚書き出します（生成コストを抑えるため1枚を複製）。"""
+    os.makedirs(folder, exist_ok=True)
+    image = synth_image(width, height, seed=width * 31 + height)
+    if ext == ".gif":
+        image = image.convert("P")
+    first = os.path.join(folder, f"page0000{ext}")
+    image.save(first, FORMAT_OF[ext])
+    with open(first, "rb") as f:
+        data = f.read()
+    for i in range(1, count):
+        with open(os.path.join(folder, f"page{i:04d}{ext}"), "wb") as f:
+            f.write(data)
+    return len(data)
+
+
+def stage_timings(path, out_folder, profile="default"):
+    """1枚分の処理（split_image_file）の工程別時間を SplitStats で測ります（ミリ秒）。"""
+    from metrics import SplitStats
+    from processor import SplitOptions, split_image_file
+
+    stats = SplitStats()
+    split_image_file(path, out_folder, SplitOptions(profile=profile), stats)
+    return stats.stage_ms
+
+
+def peak_rss_mb():
+    """自プロセスと子プロセスのピーク RSS（MB）。resource が無い環境では None。"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024  # macOS はバイト、Linux は KB
+    self_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    child_rss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return round(max(self_rss, child_rss) / scale, 1)
+
+
+def run_case(ext, size_name, workers, repeat, tmp, profile="default"):
+    """子プロセスで1ケースを実行します。"""
+    from processor import ImageProcessor
+
+    width, height, count = SIZES[size_name]
+    src = os.path.join(tmp, f"{size_name}{ext.replace('.', '_')}")
+    file_bytes = build_corpus(src, ext, width, height, count)
+    out = os.path.join(tmp, "out_" + os.path.basename(src))
+    os.makedirs(out, exist_ok=True)
+    files = sorted(os.path.join(src, n) for n in os.listdir(src))
+
+    # 工程別: ウォームアップ後、先頭ファイルを repeat 回
+    stage_timings(files[0], out, profile)
+    samples = [stage_timings(files[0], out, profile) for _ in range(repeat)]
+    stages = {k: round(statistics.median(s[k] for s in samples), 3) for k in samples[0]}
+
+    # パイプライン全体: 毎回すべて分割し直す
+    processor = ImageProcessor(workers=workers, incremental=False, profile=profile)
+    walls = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        summary = processor.process_images([src], "right_to_left", output_folder=out)
+        walls.append(time.perf_counter() - t0)
+        if summary["errors"]:
+            raise RuntimeError(summary["errors"][0])
+    wall = statistics.median(walls)
+    megapixels = width * height * count / 1e6
+    return {
+        "case": f"{size_name}{ext}",
+        "format": ext,
+        "size": size_name,
+        "width": width,
+        "height": height,
+        "files": count,
+        "input_mb": round(file_bytes * count / 1e6, 2),
+        "workers": workers,
+        "profile": profile,
+        "wall_s": round(wall, 4),
+        "files_per_s": round(count / wall, 2),
+        "mp_per_s": round(megapixels / wall, 2),
+        "peak_rss_mb": peak_rss_mb(),
+        "stage_ms": stages,
+    }
+
+
+def compare(old_path, results, threshold):
+    """前回結果と files/s を比べ、threshold 以上遅くなったケースを返します。"""
+    with open(old_path, encoding="utf-8") as f:
+        old = {r["case"]: r for r in json.load(f)["results"]}
+    regressions = []
+    print(f"\n{'case':<16} {'old f/s':>10} {'new f/s':>10} {'change':>8}")
+    for r in results:
+        prev = old.get(r["case"])
+        if not prev:
+            continue
+        change = r["files_per_s"] / prev["files_per_s"] - 1
+        mark = "  <-- regression" if change < -threshold else ""
+        print(f"{r['case']:<16} {prev['files_per_s']:>10.2f} {r['files_per_s']:>10.2f} {change:>+8.1%}{mark}")
+        if mark:
+            regressions.append(r["case"])
+    return regressions
+
+
+def main():
+    ap = argparse.ArgumentParser(description="ImageProcessor のスループット計測")
+    ap.add_argument("--sizes", default=DEFAULT_SIZES, help=f"計測するサイズ（{', '.join(SIZES)}）")
+    ap.add_argument("--formats", default=",".join(SUPPORTED_EXTENSIONS), help="計測する拡張子")
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    ap.add_argument("--profile", default="default", help="エンコード設定（default / fast / archival / match）")
+    ap.add_argument("--repeat", type=int, default=3, help="各計測の繰り返し回数（中央値を採用）")
+    ap.add_argument("--out", default="bench_results.json", help="結果の保存先 JSON")
+    ap.add_argument("--compare", default=None, help="比較対象の過去結果 JSON")
+    ap.add_argument("--threshold", type=float, default=0.10, help="回帰とみなす files/s の低下率")
+    ap.add_argument("--run-case", nargs=3, metavar=("EXT", "SIZE", "TMP"), help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.run_case:
+        ext, size_name, tmp = args.run_case
+        print(json.dumps(run_case(ext, size_name, args.workers, args.repeat, tmp, args.profile)))
+        return
+
+    sizes = [s for s in args.sizes.split(",") if s]
+    formats = [f for f in args.formats.split(",") if f]
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for size_name in sizes:
+            for ext in formats:
+                # ケースごとに新しいプロセスで実行し、キャッシュや RSS を持ち越さない
+                cmd = [sys.executable, os.path.abspath(__file__), "--run-case", ext, size_name, tmp,
+                       "--workers", str(args.workers), "--repeat", str(args.repeat), "--profile", args.profile]
+                proc = subprocess.run(cmd, capture_output=True, text=True)
+                if proc.returncode != 0:
+                    print(f"{size_name}{ext}: 失敗\n{proc.stderr}", file=sys.stderr)
+                    continue
+                r = json.loads(proc.stdout.strip().splitlines()[-1])
+                results.append(r)
+                s = r["stage_ms"]
+                print(f"{r['case']:<16} {r['files_per_s']:>9.2f} files/s {r['mp_per_s']:>8.2f} MP/s "
+                      f"rss {r['peak_rss_mb']} MB | open {s['open']:.1f} decode {s['decode']:.1f} "
+                      f"crop {s['crop']:.1f} encode {s['encode']:.1f} write {s['write']:.1f} ms", flush=True)
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "pillow": PIL.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "workers": args.workers,
+            "profile": args.profile,
+            "repeat": args.repeat,
+        },
+        "results": results,
+    }
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"saved: {args.out}")
+
+    if args.compare:
+        regressions = compare(args.compare, results, args.threshold)
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
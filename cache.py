@@ -0,0 +1,146 @@
+import hashlib, json, os, shutil, time
+from writer import remove_quietly, temp_path_for
+
+try:
+    import fcntl
+except ImportError:  # Windows ではリフリンクを使わない
+    fcntl = None
+
+# 内容アドレスの分割結果キャッシュ
+# 入力の内容ハッシュと分割設定をキーにして、出力タイルを cache_dir/<キーの先頭2文字>/<キー>/ に保存する
+# 同じ内容の入力がパスや名前を変えて現れたら、デコード・エンコードせずにハードリンク（→リフリンク→コピー）で出力を作る
+# 最後に使った時刻はエントリのフォルダの更新日時で表し、合計サイズが上限を超えたら古いものから消す（LRU）
+
+# Linux の ioctl FICLONE（Btrfs / XFS などでブロックを共有したコピーを作る）
+_FICLONE = 0x40049409
+# 異常終了で残った書きかけのエントリを消すまでの時間（秒）
+_STALE_TEMP_S = 3600
+
+
+def default_cache_dir():
+    """既定のキャッシュフォルダ（Windows は %LOCALAPPDATA%、それ以外は $XDG_CACHE_HOME か ~/.cache の下）。"""
+    base = os.environ.get("LOCALAPPDATA") or os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "ImageSplitter", "results")
+
+
+def cache_key(digest, params, out_ext):
+    """入力の内容ハッシュ・分割設定（SplitOptions.signature()）・出力の拡張子からキーを作ります。"""
+    text = json.dumps([digest, params, out_ext.lower()], sort_keys=True, ensure_ascii=False)
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def _reflink(src, dst):
+    if fcntl is None:
+        return False
+    try:
+        with open(src, "rb") as s, open(dst, "wb") as d:
+            fcntl.ioctl(d.fileno(), _FICLONE, s.fileno())
+        return True
+    except OSError:
+        remove_quietly(dst)
+        return False
+
+
+def link_or_copy(src, dst):
+    """src を dst に置きます。ハードリンク、リフリンク、コピーの順に試し、一時ファイルから置き換えます。"""
+    tmp_path = temp_path_for(dst)
+    try:
+        try:
+            os.link(src, tmp_path)
+        except OSError:  # 別のドライブ・リンク非対応のファイルシステムなど
+            if not _reflink(src, tmp_path):
+                shutil.copyfile(src, tmp_path)
+        os.replace(tmp_path, dst)
+    except BaseException:
+        remove_quietly(tmp_path)
+        raise
+
+
+class ResultCache:
+    """分割結果のキャッシュ。ワーカープロセスでもそのまま作れるよう、状態はフォルダの中だけに持ちます。"""
+    def __init__(self, folder):
+        self.folder = folder
+
+    def entry_path(self, key):
+        return os.path.join(self.folder, key[:2], key)
+
+    def materialize(self, key, paths):
+        """キャッシュにあればタイルを paths に置いて True を返します。無い（または枚数が合わない）なら False。"""
+        entry = self.entry_path(key)
+        try:
+            tiles = sorted(os.listdir(entry))
+        except OSError:
+            return False
+        if len(tiles) != len(paths):
+            return False
+        try:
+            for tile, path in zip(tiles, paths):
+                link_or_copy(os.path.join(entry, tile), path)
+            os.utime(entry)  # 最後に使った時刻（LRU）
+        except OSError:
+            return False  # 置いている途中で追い出された場合などは作り直す
+        return True
+
+    def store(self, key, parts):
+        """タイルを読む順に保存します。parts は [(バイト列 or None, 書き出し済みのパス), ...]。
+
+        書きかけを拾われないよう、一時フォルダにそろえてから名前を変えます。
+        """
+        entry = self.entry_path(key)
+        if os.path.isdir(entry):
+            return
+        os.makedirs(os.path.dirname(entry), exist_ok=True)
+        tmp_entry = f"{entry}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(tmp_entry, exist_ok=True)
+            for i, (data, path) in enumerate(parts):
+                tile = os.path.join(tmp_entry, f"{i:04d}")
+                if data is None:
+                    link_or_copy(path, tile)  # 帯単位で書き出し済みの分
+                else:
+                    with open(tile, "wb") as f:
+                        f.write(data)
+            os.rename(tmp_entry, entry)
+        except OSError:
+            shutil.rmtree(tmp_entry, ignore_errors=True)  # 他のワーカーが先に保存した場合も含む
+
+    def evict(self, max_bytes):
+        """合計サイズが max_bytes 以下になるまで、最後に使った時刻の古いエントリから消します。
+
+        (残ったエントリ数, 合計バイト数) を返します。
+        """
+        entries = []
+        now = time.time()
+        try:
+            shards = os.listdir(self.folder)
+        except OSError:
+            return 0, 0
+        for shard in shards:
+            shard_path = os.path.join(self.folder, shard)
+            try:
+                names = os.listdir(shard_path)
+            except OSError:
+                continue
+            for name in names:
+                path = os.path.join(shard_path, name)
+                try:
+                    mtime = os.stat(path).st_mtime
+                    if name.endswith(".tmp"):
+                        if now - mtime > _STALE_TEMP_S:
+                            shutil.rmtree(path, ignore_errors=True)
+                        continue
+                    with os.scandir(path) as tiles:
+                        size = sum(tile.stat().st_size for tile in tiles)
+                except OSError:
+                    continue
+                entries.append((mtime, size, path))
+        entries.sort()
+        total = sum(size for _, size, _ in entries)
+        count = len(entries)
+        for _, size, path in entries:
+            if total <= max_bytes:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+            count -= 1
+        return count, total
@@ -0,0 +1,221 @@
+"""ImageSplitter のコマンドライン（ヘッドレス）版。PySide6 を読み込まずに一括分割します。
+
+    python cli.py INPUT [INPUT ...] [--direction left_to_right] [--workers 8] [--output DIR] [--summary out.json]
+    python cli.py --watch FOLDER [FOLDER ...]   # ホットフォルダ監視（Ctrl+C で終了）
+"""
+import argparse, json, os, sys
+from multiprocessing import freeze_support
+
+# processor.SPLIT_DIRECTIONS と同じ（起動を軽くするためここでは processor を読み込まない）
+DIRECTIONS = ("right_to_left", "left_to_right", "columns_right_to_left", "columns_left_to_right")
+
+
+def grid_size(text):
+    """"3x2" のような指定を (横, 縦) にします。"""
+    try:
+        columns, rows = (int(n) for n in text.lower().split("x"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"横x縦 の形で指定してください: {text}")
+    if columns < 1 or rows < 1:
+        raise argparse.ArgumentTypeError(f"分割数は 1 以上にしてください: {text}")
+    return columns, rows
+
+
+def build_parser() -> argparse.ArgumentParser:
+    ap = argparse.ArgumentParser(prog="ImageSplitter-cli", description="画像を左右に分割して保存します（GUI なし）。")
+    ap.add_argument("inputs", nargs="+", help="画像ファイル、フォルダ、または ZIP / CBZ")
+    ap.add_argument("-d", "--direction", choices=DIRECTIONS, default="right_to_left",
+                    help="読む順序（_a になる側）。columns_* は列ごとに上から。既定: right_to_left")
+    ap.add_argument("--grid", type=grid_size, default=(2, 1), metavar="COLSxROWS",
+                    help="横x縦 のタイルに分割する（例: 3x2）。既定: 2x1")
+    ap.add_argument("--margin", type=int, default=0,
+                    help="内側の境界でタイルを重ねる幅（ピクセル）。負の値なら境界の両側を削る")
+    ap.add_argument("-w", "--workers", type=int, default=None, help="並列ワーカー数。既定: CPU コア数")
+    ap.add_argument("--tile-threads", type=int, default=0,
+                    help="1枚のタイルを並列にエンコードするスレッド数の上限（空いているコアの分だけ使う）。0 でタイル数まで、1 で無効")
+    ap.add_argument("-o", "--output", default=None, help="出力フォルダ。既定: 最初の画像と同階層の half/")
+    ap.add_argument("--split-position", choices=("center", "auto", "book"), default="center",
+                    help="分割位置: 中央 / ページごとにノドを検出 / 先頭ページで検出した位置を全ページに使う（要 NumPy）")
+    ap.add_argument("--profile", choices=("default", "fast", "archival", "match"), default="default",
+                    help="エンコード設定: 既定 / 速さ優先 / 保存用 / 入力に合わせる（JPEG の量子化テーブル等を引き継ぐ）")
+    ap.add_argument("--format", choices=("png", "jpeg", "webp", "tiff"), default=None, dest="output_format",
+                    help="出力形式。既定: 入力と同じ")
+    ap.add_argument("--frames", choices=("sequence", "pages", "first"), default="sequence", dest="frame_mode",
+                    help="アニメーション・複数ページの画像: 複数フレームのまま / ページごとに別ファイル / 先頭フレームだけ")
+    ap.add_argument("--archive", choices=("zip", "cbz"), default=None,
+                    help="出力を入力フォルダ／アーカイブごとの書庫にまとめる（処理記録によるスキップは行わない）")
+    ap.add_argument("--archive-compression", choices=("stored", "deflated"), default="stored",
+                    help="書庫の格納方式（画像は圧縮済みなので既定は無圧縮）")
+    ap.add_argument("--lossless-jpeg", action="store_true", help="jpegtran で JPEG を無劣化分割する")
+    ap.add_argument("--mcu-policy", choices=("snap", "reencode"), default="snap",
+                    help="無劣化分割で分割位置が MCU 境界に乗らないときの扱い")
+    ap.add_argument("--low-memory-mp", type=float, default=100.0,
+                    help="この画素数（メガピクセル）以上の PNG / TIFF を帯単位で低メモリ分割する（0 で無効）")
+    ap.add_argument("--strip-rows", type=int, default=256, help="低メモリ分割の1帯の行数")
+    ap.add_argument("--write-workers", type=int, default=4, help="書き込みステージのスレッド数")
+    ap.add_argument("--write-buffer-mb", type=float, default=256, help="書き込み待ちバッファの上限（MB）")
+    ap.add_argument("--no-incremental", action="store_true", help="処理記録を使わず、すべて分割し直す")
+    ap.add_argument("--verify-hash", action="store_true", help="処理記録の照合に内容ハッシュも使う")
+    ap.add_argument("--cache", nargs="?", const="", default=None, metavar="DIR",
+                    help="内容が同じ入力の分割結果をキャッシュから出力する（DIR 省略時は ~/.cache/ImageSplitter/results）")
+    ap.add_argument("--cache-max-mb", type=float, default=2048, help="キャッシュの合計サイズの上限（MB）。古いものから消す")
+    ap.add_argument("--largest-first", action="store_true",
+                    help="探索を終えてからヘッダだけ読んで見積もり、重いファイルから処理する（空き容量も先に確かめる）")
+    ap.add_argument("--dry-run", action="store_true",
+                    help="分割せずに見積もり（処理順・所要時間・出力サイズ・空き容量）を JSON で出す")
+    ap.add_argument("--summary", default="-", help="JSON サマリの出力先（'-' で標準出力）")
+    ap.add_argument("--metrics", default=None, help="ファイルごとの工程別計測を JSON Lines で書き出す先")
+    ap.add_argument("--progress-interval", type=float, default=1.0, help="進行状況を出す間隔（秒）")
+    ap.add_argument("--watch", action="store_true",
+                    help="入力フォルダを監視し、新しく置かれた画像を分割し続ける（Ctrl+C で終了。サマリはジョブごとに JSON Lines）")
+    ap.add_argument("--watch-poll", action="store_true",
+                    help="inotify を使わず一定間隔の走査で監視する（ネットワーク共有向け）")
+    ap.add_argument("--poll-interval", type=float, default=2.0, help="走査で監視するときの間隔（秒）")
+    ap.add_argument("--settle", type=float, default=1.0,
+                    help="サイズと更新日時がこの秒数変わらなければ書き込み完了とみなす（監視時）")
+    ap.add_argument("-q", "--quiet", action="store_true", help="進行状況を標準エラーに出さない")
+    return ap
+
+
+def processor_settings(args):
+    """コマンドライン引数から ImageProcessor の設定を組み立てます。"""
+    cache_dir = args.cache
+    if cache_dir == "":
+        from cache import default_cache_dir
+        cache_dir = default_cache_dir()
+    return dict(
+        workers=args.workers,
+        lossless_jpeg=args.lossless_jpeg,
+        mcu_policy=args.mcu_policy,
+        incremental=not args.no_incremental,
+        verify_hash=args.verify_hash,
+        low_memory_pixels=int(args.low_memory_mp * 1_000_000),
+        strip_rows=args.strip_rows,
+        write_workers=args.write_workers,
+        write_buffer_mb=args.write_buffer_mb,
+        progress_interval=args.progress_interval,
+        split_position=args.split_position,
+        columns=args.grid[0],
+        rows=args.grid[1],
+        margin=args.margin,
+        profile=args.profile,
+        output_format=args.output_format,
+        archive_output=args.archive,
+        archive_compression=args.archive_compression,
+        cache_dir=cache_dir,
+        cache_max_mb=args.cache_max_mb,
+        largest_first=args.largest_first,
+        tile_threads=args.tile_threads,
+        frame_mode=args.frame_mode,
+    )
+
+
+def watch(args, status) -> int:
+    """ホットフォルダ監視。書き込みが終わったファイルをフォルダごとのジョブにして、共有のワーカープールで分割します。"""
+    from scheduler import JobScheduler
+    from watcher import FolderWatcher
+    from metrics import JsonlMetrics
+
+    sink = JsonlMetrics(args.metrics) if args.metrics else None
+    out = sys.stdout if args.summary == "-" else open(args.summary, "a", encoding="utf-8")
+    failed = False
+
+    def done(job):
+        nonlocal failed
+        summary = job.summary or {"error": job.error}
+        summary = dict(summary, job=job.id, inputs=job.items, state=job.state)
+        failed = failed or job.state == "failed" or bool(summary.get("errors"))
+        out.write(json.dumps(summary, ensure_ascii=False) + "\n")
+        out.flush()
+
+    scheduler = JobScheduler(status_callback=lambda job, text: status(f"[ジョブ{job.id}] {text}"), done_callback=done)
+    settings = processor_settings(args)
+    settings.update(archive_output=None, metrics_sink=sink)
+    watcher = FolderWatcher(
+        args.inputs,
+        lambda paths: scheduler.submit(paths, args.direction, output_folder=args.output, **settings),
+        settle=args.settle, poll_interval=args.poll_interval, use_inotify=not args.watch_poll,
+        status_callback=status, exclude=[args.output] if args.output else (),
+    )
+    watcher.start()
+    try:
+        while watcher.is_alive():
+            watcher.join(0.5)
+    except KeyboardInterrupt:
+        status("監視を終了します（処理中の1枚が終わるまで待ちます）…")
+    finally:
+        watcher.stop()
+        watcher.join()
+        scheduler.close(cancel=True)
+        if sink is not None:
+            sink.close()
+        if out is not sys.stdout:
+            out.close()
+    return 1 if failed else 0
+
+
+def write_summary(args, summary):
+    """JSON を標準出力または --summary のファイルに書き出します。"""
+    text = json.dumps(summary, ensure_ascii=False, indent=2)
+    if args.summary == "-":
+        print(text)
+    else:
+        with open(args.summary, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+
+
+def main(argv=None) -> int:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.watch:
+        if args.archive:
+            parser.error("--watch と --archive は同時に指定できません（書庫は実行ごとにまとめ直すため）")
+        missing = [path for path in args.inputs if not os.path.isdir(path)]
+        if missing:
+            parser.error("--watch にはフォルダを指定してください: " + ", ".join(missing))
+        if args.dry_run:
+            parser.error("--watch と --dry-run は同時に指定できません")
+        if args.output and os.path.realpath(args.output) in {os.path.realpath(path) for path in args.inputs}:
+            parser.error("--watch では監視するフォルダを --output にできません（出力した画像を分割し続けるため）")
+
+    def status(text):
+        if not args.quiet:
+            print(text, file=sys.stderr, flush=True)
+
+    if args.watch:
+        return watch(args, status)
+
+    # --help だけなら画像系のモジュールも読み込まない
+    from processor import ImageProcessor
+    from metrics import JsonlMetrics, MemoryMetrics, TeeMetrics
+
+    if args.dry_run:
+        report = ImageProcessor(status_callback=status, **processor_settings(args)).plan(
+            args.inputs, args.direction, output_folder=args.output)
+        write_summary(args, report or {"files": 0})
+        if not report:
+            return 2
+        return 0 if report["enough_space"] else 1
+
+    memory = MemoryMetrics()
+    sink = TeeMetrics(memory, JsonlMetrics(args.metrics) if args.metrics else None)
+    processor = ImageProcessor(status_callback=status, metrics_sink=sink, **processor_settings(args))
+    try:
+        summary = processor.process_images(args.inputs, args.direction, output_folder=args.output)
+    finally:
+        sink.close()
+    metrics = memory.summary()
+    del metrics["errors"]  # summary["errors"] と重複するため
+    summary["metrics"] = metrics
+
+    write_summary(args, summary)
+
+    # 終了コード: 0 = 成功 / 1 = 一部エラー / 2 = 対象なし
+    if not summary["found"]:
+        return 2
+    return 1 if summary["errors"] else 0
+
+
+if __name__ == "__main__":
+    freeze_support()
+    sys.exit(main())
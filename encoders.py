@@ -0,0 +1,111 @@
+import io
+from PIL import Image, JpegImagePlugin
+
+# 出力のエンコード設定（プロファイル）と出力形式の変換
+#   default : Pillow の既定値（従来どおり）
+#   fast    : 速さ優先（PNG は zlib レベル 1、WebP は method 0）
+#   archival: 保存用に画質・圧縮率優先（PNG は レベル 9、WebP は可逆、JPEG は 4:4:4・高画質）
+#   match   : 入力に合わせる（JPEG は量子化テーブルとサブサンプリングを引き継ぐ）
+
+PROFILES = ("default", "fast", "archival", "match")
+
+# 出力形式の指定 → (拡張子, Pillow の形式名)
+OUTPUT_FORMATS = {
+    "png": (".png", "PNG"),
+    "jpeg": (".jpg", "JPEG"),
+    "webp": (".webp", "WEBP"),
+    "tiff": (".tiff", "TIFF"),
+}
+
+# 形式ごとに保存できるモード（それ以外は変換してから保存する）
+_FORMAT_MODES = {
+    "JPEG": ("L", "RGB", "CMYK"),
+    "WEBP": ("RGB", "RGBA"),
+    "BMP": ("1", "L", "P", "RGB"),
+    "PNG": ("1", "L", "LA", "P", "RGB", "RGBA", "I;16"),
+    "TIFF": ("1", "L", "LA", "P", "RGB", "RGBA", "CMYK", "I", "I;16", "F"),
+}
+
+# プロファイルごとの保存オプション
+_PROFILE_OPTIONS = {
+    "fast": {
+        "PNG": {"compress_level": 1},
+        "WEBP": {"method": 0},
+        "TIFF": {},
+        # JPEG は標準のまま（Pillow の既定は最適化・プログレッシブなしで速い）。画質は変えない
+        "JPEG": {},
+    },
+    "archival": {
+        "PNG": {"compress_level": 9},
+        "WEBP": {"lossless": True, "method": 6},
+        "TIFF": {"compression": "tiff_deflate"},
+        "JPEG": {"quality": 95, "subsampling": 0, "optimize": True},
+    },
+}
+
+# 帯単位の低メモリ分割（strips.py）で使う zlib レベル
+_ZLIB_LEVELS = {"fast": 1, "archival": 9}
+
+
+def zlib_level(profile):
+    """PNG / Deflate TIFF を自前で圧縮するときの zlib レベルを返します。"""
+    return _ZLIB_LEVELS.get(profile, 6)
+
+
+def output_target(file_ext, source_format, output_format=None):
+    """(出力の拡張子, Pillow の形式名) を返します。output_format が None なら入力と同じ形式にします。"""
+    if output_format:
+        return OUTPUT_FORMATS[output_format]
+    return file_ext, Image.registered_extensions().get(file_ext.lower(), source_format)
+
+
+def _match_options(save_format, source):
+    """入力の JPEG 設定（量子化テーブル・サブサンプリング）を引き継ぐ保存オプションを返します。"""
+    options = {}
+    if save_format == "JPEG" and source.format == "JPEG":
+        if getattr(source, "quantization", None):
+            options["qtables"] = source.quantization
+        sampling = JpegImagePlugin.get_sampling(source)
+        if sampling != -1:
+            options["subsampling"] = sampling
+    return options
+
+
+def save_options(save_format, profile, source):
+    """保存時に渡すキーワード引数を返します。ICC プロファイルと EXIF は入力から引き継ぎます。"""
+    if profile == "match":
+        options = _match_options(save_format, source)
+    else:
+        options = dict(_PROFILE_OPTIONS.get(profile, {}).get(save_format, {}))
+    if save_format in ("JPEG", "PNG", "WEBP", "TIFF"):
+        icc_profile = source.info.get("icc_profile")
+        if icc_profile:
+            options["icc_profile"] = icc_profile
+        exif = source.info.get("exif")
+        if exif and save_format != "TIFF":
+            options["exif"] = exif
+    return options
+
+
+def convert_for(image, save_format):
+    """保存先の形式で扱えないモードを変換します。"""
+    modes = _FORMAT_MODES.get(save_format)
+    if modes is None or image.mode in modes:
+        return image
+    if (image.mode == "I" or image.mode.startswith("I;16")) and "I;16" in modes:
+        return image.convert("I;16")  # 32 ビット整数・バイト順違い（I;16B など）は 16 ビットにする
+    if save_format == "WEBP" or (image.mode in ("LA", "PA") and "RGBA" in modes):
+        return image.convert("RGBA")
+    if (image.mode in ("LA", "I", "F") or image.mode.startswith("I;16")) and "L" in modes:
+        return image.convert("L")
+    return image.convert("RGB")  # CMYK・YCbCr・LAB・HSV・P（JPEG へ）など
+
+
+def encode(image, save_format, profile, source, options=None):
+    """タイル1枚をエンコードしてバイト列を返します。options は save_options() の結果を使い回すときに渡します。"""
+    if options is None:
+        options = save_options(save_format, profile, source)
+    image = convert_for(image, save_format)
+    buffer = io.BytesIO()
+    image.save(buffer, format=save_format, **options)
+    return buffer.getvalue()
@@ -1,13 +1,20 @@
-import os, threading
+import os
 from typing import List
-from PySide6.QtCore import Qt, Signal, QObject, QEvent, QPoint, QRect
-from PySide6.QtGui import QIcon
+from PySide6.QtCore import Qt, Signal, QObject, QEvent, QPoint, QRect, QRectF, QSize, QAbstractListModel, QModelIndex
+from PySide6.QtGui import QIcon, QImage, QColor, QPen, QFont, QPainter
 from PySide6.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QFileDialog, QRadioButton,
-    QProgressBar, QApplication, QTextBrowser, QDialog, QSizePolicy
+    QProgressBar, QApplication, QTextBrowser, QDialog, QSizePolicy, QSpinBox, QCheckBox, QComboBox,
+    QListView, QStyledItemDelegate
 )
 
-from processor import ImageProcessor
+from scheduler import JobScheduler
+from watcher import FolderWatcher
+from metrics import MemoryMetrics
+from archives import ARCHIVE_EXTENSIONS, input_label, input_name
+from cache import default_cache_dir
+from processor import SplitOptions
+from preview import THUMB_SIZE, ItemLister, LRUCache, ThumbnailLoader, split_layout
 from utils import (
     build_qss, apply_drop_shadow, GAP_DEFAULT, PADDING_CARD,
     try_icon_path, SUPPORTED_EXTENSIONS
@@ -19,7 +26,10 @@ from utils import (
 class _Signals(QObject):
     progress = Signal(float)   # 0.0 - 1.0
     status  = Signal(str)
-    done    = Signal(bool)
+    done    = Signal(object)   # scheduler.Job
+    watch_ready = Signal(list) # 監視フォルダで書き込みが終わったファイル
+    preview_items = Signal(int, list)      # (一覧の世代, [(キー, item), ...])
+    thumbnail_ready = Signal(object, object)  # (キー, preview.Thumbnail)
 
 
 class DropArea(QLabel):
@@ -43,13 +53,152 @@ class DropArea(QLabel):
             self.filesDropped.emit(files)
 
 
+# プレビュー一覧（縮小画像に分割線と出力の記号を重ねる）
+
+_THUMB_ROLE = Qt.UserRole + 1
+
+
+def _to_qimage(image):
+    """PIL の RGB 画像を QImage にします（縮小画像を作るスレッドで呼ぶ。QPixmap と違い UI スレッドの外でも作れる）。"""
+    return QImage(image.tobytes(), image.width, image.height, image.width * 3, QImage.Format_RGB888).copy()
+
+
+class PreviewModel(QAbstractListModel):
+    """プレビュー一覧のモデル。縮小画像は描くときに頼み（見えている分だけ作る）、出来たら描き直します。"""
+    def __init__(self, loader, cache, parent=None):
+        super().__init__(parent)
+        self.loader = loader
+        self.cache = cache
+        self._rows = []    # [(キー, item), ...]
+        self._row_of = {}  # キー → 行
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        key, item = self._rows[index.row()]
+        if role == Qt.DisplayRole:
+            return input_name(item)
+        if role == Qt.ToolTipRole:
+            thumbnail = self.cache.get(key)
+            if thumbnail is not None and thumbnail.error:
+                return f"{input_label(item)}\n{thumbnail.error}"
+            return input_label(item)
+        if role == _THUMB_ROLE:
+            thumbnail = self.cache.get(key)
+            if thumbnail is None:
+                self.loader.request(key, item)
+            return thumbnail
+        return None
+
+    def append(self, batch):
+        # 同じファイルを何度投入しても1つだけ並べる
+        batch = [(key, item) for key, item in batch if key not in self._row_of]
+        if not batch:
+            return
+        first = len(self._rows)
+        self.beginInsertRows(QModelIndex(), first, first + len(batch) - 1)
+        for row, (key, item) in enumerate(batch, first):
+            self._rows.append((key, item))
+            self._row_of[key] = row
+        self.endInsertRows()
+
+    def clear(self):
+        self.beginResetModel()
+        self._rows = []
+        self._row_of = {}
+        self.endResetModel()
+        self.loader.clear()
+
+    def thumbnail_ready(self, key, thumbnail):
+        nbytes = thumbnail.image.sizeInBytes() if thumbnail.image is not None else 256
+        self.cache.put(key, thumbnail, nbytes)
+        row = self._row_of.get(key)
+        if row is not None:
+            index = self.index(row)
+            self.dataChanged.emit(index, index, [_THUMB_ROLE])
+
+
+class PreviewDelegate(QStyledItemDelegate):
+    """縮小画像・分割線・出力の記号（a, b …）・ファイル名を描きます。分割線は描くたびに今の設定で計算します。"""
+    def __init__(self, options_fn, parent=None):
+        super().__init__(parent)
+        self.options_fn = options_fn
+
+    def sizeHint(self, option, index):
+        return QSize(THUMB_SIZE + 12, THUMB_SIZE + 12 + option.fontMetrics.height())
+
+    def paint(self, painter, option, index):
+        painter.save()
+        rect = option.rect.adjusted(6, 6, -6, -6)
+        area = QRect(rect.left(), rect.top(), rect.width(), THUMB_SIZE)
+        text_color = option.palette.text().color()
+        thumbnail = index.data(_THUMB_ROLE)
+        if thumbnail is None or thumbnail.image is None:
+            painter.setPen(text_color)
+            painter.drawText(area, Qt.AlignCenter, "読み込み中…" if thumbnail is None else "読めません")
+        else:
+            image = thumbnail.image
+            target = QRect(0, 0, image.width(), image.height())
+            target.moveCenter(area.center())
+            painter.drawImage(target, image)
+            self._paint_split(painter, target, thumbnail)
+        name = option.fontMetrics.elidedText(index.data(Qt.DisplayRole), Qt.ElideMiddle, rect.width())
+        painter.setPen(text_color)
+        painter.drawText(QRect(rect.left(), area.bottom() + 2, rect.width(), option.fontMetrics.height()),
+                         Qt.AlignHCenter | Qt.AlignTop, name)
+        painter.restore()
+
+    def _paint_split(self, painter, target, thumbnail):
+        sx = target.width() / max(1, thumbnail.width)
+        sy = target.height() / max(1, thumbnail.height)
+        painter.setRenderHint(QPainter.Antialiasing)
+        font = QFont(painter.font()); font.setBold(True); painter.setFont(font)
+        for suffix, (x0, y0, x1, y1) in split_layout(thumbnail, self.options_fn()):
+            box = QRectF(target.left() + x0 * sx, target.top() + y0 * sy, (x1 - x0) * sx, (y1 - y0) * sy)
+            # 画像の外周には引かず、内側の境界（重ね幅があればタイルごとの縁）だけを描く
+            painter.setPen(QPen(QColor(230, 40, 40), 2))
+            if x0 > 0:
+                painter.drawLine(box.topLeft(), box.bottomLeft())
+            if x1 < thumbnail.width:
+                painter.drawLine(box.topRight(), box.bottomRight())
+            if y0 > 0:
+                painter.drawLine(box.topLeft(), box.topRight())
+            if y1 < thumbnail.height:
+                painter.drawLine(box.bottomLeft(), box.bottomRight())
+            # 出力の記号（読む順）を範囲の中央に
+            badge = QRectF(0, 0, 18, 18)
+            badge.moveCenter(box.center())
+            painter.setPen(Qt.NoPen)
+            painter.setBrush(QColor(0, 0, 0, 160))
+            painter.drawRoundedRect(badge, 4, 4)
+            painter.setPen(QColor(255, 255, 255))
+            painter.drawText(badge, Qt.AlignCenter, suffix)
+
+
 # README ダイアログ
 
 README_MD = r"""
 # 画像変換＆分割ツール ©️2025 KisaragiIchigo
 - 画像を左右で **1/2分割** して `_a`, `_b` 付きで保存する
 - 複数ファイル/フォルダを **D&D** または **選択ボタン** で投入
+- 出力は `half/` にばらで保存するほか、入力フォルダ／アーカイブごとの **CBZ / ZIP にまとめる** こともできる
+- **ZIP / CBZ** もそのまま投入でき、展開せずに中の画像を分割する（出力は `half/アーカイブ名/`、中のフォルダ構成はそのまま）
 - 進捗バーで処理状況を表示
+- **ワーカー数** の分だけ CPU コアを使って並列に分割（既定は CPU コア数）
+- **分割数（横×縦）** を変えると、コンタクトシートや面付けシートも1回のデコードでタイルに切り分ける（`_a`, `_b`, `_c`…）
+- 出力の **形式**（入力と同じ / PNG / JPEG / WebP / TIFF）と **エンコード設定**（標準 / 速さ優先 / 保存用 / 入力に合わせる）を選べる
+- アニメーション GIF / WebP / APNG や複数ページ TIFF は、**複数フレームのまま**（表示時間・ループ回数を引き継ぐ）か **ページごと**（`_p001_a`…）に分割できる
+- 分割位置は **中央** のほか、見開きスキャンの **ノドを自動検出**（ページごと／本全体で共通）も選べる
+- **JPEGを無劣化で分割** をオンにすると、jpegtran で再エンコードせずに切り出す（分割位置は MCU 境界へ寄せる）
+- 処理中に投入した分はジョブとして順番待ちになり、**一時停止** / **キャンセル** はファイル1枚の区切りで効く
+- 投入したファイルは下の **プレビュー** に縮小画像で並び、分割線と出力の記号（a, b …）で分割方向・位置を確かめられる（**確認してから開始** をオンにすると「分割を開始」を押すまで処理しない）
+- **フォルダを監視** で選んだフォルダに置かれた画像を、書き込みが終わり次第その時点の設定で分割する（もう一度押すと停止）
+- **重複した画像はキャッシュから出力** をオンにすると、名前や場所が違っても内容が同じ画像は前回の結果をリンク（またはコピー）して済ませる
+- **大きい画像から処理** をオンにすると、ヘッダだけ読んで見積もった手間の大きい順に処理し、最後に巨大な1枚だけが残るのを防ぐ（出力先の空き容量が足りなければ始めない）
+- `half/` 内の処理記録を見て、前回から変更のないファイルはスキップ（中断したバッチも続きから再開）
 - 出力先は **最初の入力画像と同階層の `half/`** フォルダ
 
 ## 使い方
@@ -128,7 +277,7 @@ class MainWindow(QWidget):
         self.setWindowTitle("画像変換＆分割ツール ©️2025 KisaragiIchigo")
         self.setWindowFlags(Qt.FramelessWindowHint)       
         self.setAttribute(Qt.WA_TranslucentBackground)   
-        self.resize(720, 520)
+        self.resize(760, 720)
         self.setMinimumSize(600, 400)
 
         ip = try_icon_path("pst.ico", "app.ico")
@@ -140,11 +289,14 @@ class MainWindow(QWidget):
         self.signals.progress.connect(self._on_progress)
         self.signals.status.connect(self._on_status)
         self.signals.done.connect(self._on_done)
-
-        # Processor（コールバックはsignalsへ橋渡し）
-        self.processor = ImageProcessor(
-            progress_callback=self.signals.progress.emit,
-            status_callback=self.signals.status.emit,
+        self.signals.watch_ready.connect(self._on_watch_ready)
+        self.signals.preview_items.connect(self._on_preview_items)
+        self.watcher = None
+
+        # ジョブキュー（コールバックはsignalsへ橋渡し）
+        self.scheduler = JobScheduler(
+            progress_callback=lambda job, value: self.signals.progress.emit(value),
+            status_callback=lambda job, text: self.signals.status.emit(self._job_text(job, text)),
             done_callback=self.signals.done.emit
         )
 
@@ -174,7 +326,7 @@ class MainWindow(QWidget):
         # D&Dエリア
         self.drop = DropArea(self._card) 
         self.drop.setFixedHeight(120)
-        self.drop.filesDropped.connect(self.start_processing)
+        self.drop.filesDropped.connect(self._add_items)
         v.addWidget(self.drop)
 
         # 分割方向
@@ -183,9 +335,69 @@ class MainWindow(QWidget):
         self.rb_r2l = QRadioButton("右 → 左"); self.rb_r2l.setChecked(True)
         self.rb_l2r = QRadioButton("左 → 右")
         row_dir.addWidget(self.rb_r2l); row_dir.addWidget(self.rb_l2r)
+        self.cmb_position = QComboBox()
+        self.cmb_position.addItem("中央で分割", "center")
+        self.cmb_position.addItem("ノドを自動検出", "auto")
+        self.cmb_position.addItem("ノドを自動検出（本全体で共通）", "book")
+        self.cmb_position.setToolTip("見開きスキャンの綴じ目を探して分割します。見つからないページは中央で分割します")
+        row_dir.addWidget(self.cmb_position)
+        self.cb_lossless = QCheckBox("JPEGを無劣化で分割")
+        self.cb_lossless.setToolTip("jpegtran で MCU 境界に沿って切り出します（分割位置は境界へ寄せます）")
+        row_dir.addWidget(self.cb_lossless)
+        self.cb_incremental = QCheckBox("変更のないファイルはスキップ"); self.cb_incremental.setChecked(True)
+        row_dir.addWidget(self.cb_incremental)
+        self.cb_cache = QCheckBox("重複した画像はキャッシュから出力")
+        self.cb_cache.setToolTip(f"内容が同じ画像は分割し直さず、前回の結果をリンク（またはコピー）します\n保存先: {default_cache_dir()}")
+        row_dir.addWidget(self.cb_cache)
+        self.cb_largest_first = QCheckBox("大きい画像から処理")
+        self.cb_largest_first.setToolTip("先にヘッダだけ読んで手間を見積もり、重い画像から並列に処理します（出力先の空き容量も確かめます）")
+        row_dir.addWidget(self.cb_largest_first)
         row_dir.addStretch(1)
+        row_dir.addWidget(QLabel("ワーカー数: "))
+        self.sp_workers = QSpinBox(); self.sp_workers.setRange(1, 256)
+        self.sp_workers.setValue(os.cpu_count() or 1)
+        row_dir.addWidget(self.sp_workers)
         v.addLayout(row_dir)
 
+        # 分割数（横×縦）と重ね幅
+        row_grid = QHBoxLayout()
+        row_grid.addWidget(QLabel("分割数: 横"))
+        self.sp_columns = QSpinBox(); self.sp_columns.setRange(1, 16); self.sp_columns.setValue(2)
+        row_grid.addWidget(self.sp_columns)
+        row_grid.addWidget(QLabel("× 縦"))
+        self.sp_rows = QSpinBox(); self.sp_rows.setRange(1, 16); self.sp_rows.setValue(1)
+        row_grid.addWidget(self.sp_rows)
+        row_grid.addWidget(QLabel("重ね幅(px): "))
+        self.sp_margin = QSpinBox(); self.sp_margin.setRange(-2000, 2000)
+        self.sp_margin.setToolTip("内側の境界でタイルを重ねる幅。負の値なら境界の両側を削ります")
+        row_grid.addWidget(self.sp_margin)
+        self.cb_columns_first = QCheckBox("列ごとに上から読む")
+        row_grid.addWidget(self.cb_columns_first)
+        row_grid.addWidget(QLabel("出力: "))
+        self.cmb_format = QComboBox()
+        for label, key in (("入力と同じ形式", None), ("PNG", "png"), ("JPEG", "jpeg"), ("WebP", "webp"), ("TIFF", "tiff")):
+            self.cmb_format.addItem(label, key)
+        row_grid.addWidget(self.cmb_format)
+        self.cmb_profile = QComboBox()
+        for label, key in (("標準", "default"), ("速さ優先", "fast"), ("保存用（高画質・高圧縮）", "archival"), ("入力に合わせる", "match")):
+            self.cmb_profile.addItem(label, key)
+        self.cmb_profile.setToolTip("エンコード設定。「入力に合わせる」は JPEG の量子化テーブルとサブサンプリングを引き継ぎます")
+        row_grid.addWidget(self.cmb_profile)
+        self.cmb_frames = QComboBox()
+        for label, key in (("複数フレームのまま", "sequence"), ("ページごとに保存", "pages"), ("先頭フレームのみ", "first")):
+            self.cmb_frames.addItem(label, key)
+        self.cmb_frames.setToolTip("アニメーション GIF / WebP / APNG や複数ページ TIFF の扱い")
+        row_grid.addWidget(self.cmb_frames)
+        self.cmb_sink = QComboBox()
+        for label, key in (("フォルダに保存", None), ("CBZ にまとめる", "cbz"), ("ZIP にまとめる", "zip")):
+            self.cmb_sink.addItem(label, key)
+        self.cmb_sink.setToolTip("入力フォルダ／アーカイブごとに1つの書庫へ、読む順に書き込みます")
+        row_grid.addWidget(self.cmb_sink)
+        self.cb_deflate = QCheckBox("書庫を圧縮")
+        row_grid.addWidget(self.cb_deflate)
+        row_grid.addStretch(1)
+        v.addLayout(row_grid)
+
         # ボタン列
         row_btn = QHBoxLayout()
         self.btn_pick_files = QPushButton("ファイル選択")
@@ -195,8 +407,50 @@ class MainWindow(QWidget):
         self.btn_pick_dir.clicked.connect(self._pick_dir)
         self.btn_run_demo.clicked.connect(self._open_readme)
         row_btn.addWidget(self.btn_pick_files); row_btn.addWidget(self.btn_pick_dir); row_btn.addWidget(self.btn_run_demo)
+        self.btn_pause  = QPushButton("一時停止"); self.btn_pause.clicked.connect(self._toggle_pause)
+        self.btn_cancel = QPushButton("キャンセル"); self.btn_cancel.clicked.connect(self._cancel_current)
+        self.btn_cancel.setToolTip("実行中のジョブを止めます（処理中の1枚が終わった時点で止まります）")
+        row_btn.addWidget(self.btn_pause); row_btn.addWidget(self.btn_cancel)
+        self.btn_watch = QPushButton("フォルダを監視"); self.btn_watch.clicked.connect(self._toggle_watch)
+        self.btn_watch.setToolTip("選んだフォルダに置かれた画像を、書き込みが終わり次第その時点の設定で分割します")
+        row_btn.addWidget(self.btn_watch)
         v.addLayout(row_btn)
 
+        # プレビュー（縮小画像は別スレッドで作り、見えている分だけ・メモリ上限付きで持つ）
+        row_preview = QHBoxLayout()
+        self.lbl_preview = QLabel("プレビュー: 0件")
+        row_preview.addWidget(self.lbl_preview)
+        row_preview.addStretch(1)
+        self.cb_preview_first = QCheckBox("確認してから開始")
+        self.cb_preview_first.setToolTip("投入したファイルはプレビューに並べるだけにし、「分割を開始」を押すまで処理しません")
+        row_preview.addWidget(self.cb_preview_first)
+        self.btn_start = QPushButton("分割を開始"); self.btn_start.clicked.connect(self._start_pending)
+        self.btn_clear_preview = QPushButton("一覧を消去"); self.btn_clear_preview.clicked.connect(self._clear_preview)
+        row_preview.addWidget(self.btn_start); row_preview.addWidget(self.btn_clear_preview)
+        v.addLayout(row_preview)
+        self._pending_items = []  # 「確認してから開始」で待たせている投入分
+        self._listers = []
+        self._preview_generation = 0
+        self.thumbnail_loader = ThumbnailLoader(self.signals.thumbnail_ready.emit, convert=_to_qimage)
+        self.preview_model = PreviewModel(self.thumbnail_loader, LRUCache(), self)
+        self.signals.thumbnail_ready.connect(self.preview_model.thumbnail_ready)
+        self.preview = QListView(); self.preview.setObjectName("previewList")
+        self.preview.setViewMode(QListView.IconMode)
+        self.preview.setResizeMode(QListView.Adjust)
+        self.preview.setMovement(QListView.Static)
+        self.preview.setSelectionMode(QListView.NoSelection)
+        # 1万件でも固まらないよう、大きさをそろえて配置を分割して計算する
+        self.preview.setUniformItemSizes(True)
+        self.preview.setLayoutMode(QListView.Batched)
+        self.preview.setBatchSize(500)
+        self.preview.setItemDelegate(PreviewDelegate(self._preview_options, self.preview))
+        self.preview.setModel(self.preview_model)
+        v.addWidget(self.preview, 1)
+        # 分割の設定が変わったら分割線だけ描き直す（縮小画像は作り直さない）
+        for signal in (self.rb_r2l.toggled, self.cb_columns_first.toggled, self.cmb_position.currentIndexChanged,
+                       self.sp_columns.valueChanged, self.sp_rows.valueChanged, self.sp_margin.valueChanged):
+            signal.connect(self.preview.viewport().update)
+
         # 進捗エリア
         self.progress = QProgressBar(); self.progress.setRange(0,100); self.progress.setValue(0)
         v.addWidget(self.progress)
@@ -213,9 +467,7 @@ class MainWindow(QWidget):
 
         # 初期スタイル
         self._apply_compact(self.isMaximized())
-
-        # 進行フラグ
-        self._busy = False
+        self._update_job_buttons()
 
     #  見た目切替 
     def _apply_compact(self, compact: bool):
@@ -304,6 +556,14 @@ class MainWindow(QWidget):
     def _toggle_max_restore(self):
         self.showNormal() if self.isMaximized() else self.showMaximized()
 
+    def closeEvent(self, e):
+        # 監視を止め、残りのジョブは取り消し、処理中の1枚が終わるのを待ってから閉じる
+        self._stop_watch()
+        self._stop_listers()
+        self.thumbnail_loader.close()
+        self.scheduler.close(cancel=True)
+        super().closeEvent(e)
+
     def _open_readme(self):
         dlg = ReadmeDialog(self)
         dlg.move(self.frameGeometry().center() - dlg.rect().center())
@@ -311,37 +571,149 @@ class MainWindow(QWidget):
 
     def _pick_files(self):
         # 複数選択
-        patterns = "画像ファイル (" + " ".join(f"*{ext}" for ext in SUPPORTED_EXTENSIONS) + ");;すべてのファイル (*.*)"
-        files, _ = QFileDialog.getOpenFileNames(self, "画像ファイルを選択", "", patterns)
+        patterns = ("画像ファイル・アーカイブ (" + " ".join(f"*{ext}" for ext in SUPPORTED_EXTENSIONS + ARCHIVE_EXTENSIONS)
+                    + ");;ZIP / CBZ (" + " ".join(f"*{ext}" for ext in ARCHIVE_EXTENSIONS) + ");;すべてのファイル (*.*)")
+        files, _ = QFileDialog.getOpenFileNames(self, "画像ファイルまたはアーカイブを選択", "", patterns)
         if files:
-            self.start_processing(files)
+            self._add_items(files)
 
     def _pick_dir(self):
         d = QFileDialog.getExistingDirectory(self, "画像が入ったフォルダを選択")
         if d:
-            self.start_processing([d])
+            self._add_items([d])
 
-    #  実行 
-    def start_processing(self, items: List[str]):
-        if self._busy:
-            self._on_status("いま処理中だよ…少し待ってね")
+    def _toggle_watch(self):
+        if self.watcher is not None:
+            self._stop_watch()
+            self._on_status("フォルダの監視を終了しました。")
             return
+        d = QFileDialog.getExistingDirectory(self, "監視するフォルダを選択")
+        if not d:
+            return
+        self.watcher = FolderWatcher([d], self.signals.watch_ready.emit, status_callback=self.signals.status.emit)
+        self.watcher.start()
+        self.btn_watch.setText("監視を停止")
+
+    def _stop_watch(self):
+        if self.watcher is not None:
+            self.watcher.stop()
+            self.watcher.join()
+            self.watcher = None
+        self.btn_watch.setText("フォルダを監視")
+
+    def _on_watch_ready(self, paths: List[str]):
+        if self.watcher is not None:
+            self.start_processing(paths, watching=True)
+
+    #  プレビュー 
+    def _preview_options(self):
+        """プレビューの分割線に使う、今の画面の設定。"""
+        split_direction = "right_to_left" if self.rb_r2l.isChecked() else "left_to_right"
+        if self.cb_columns_first.isChecked():
+            split_direction = "columns_" + split_direction
+        return SplitOptions(split_direction=split_direction, columns=self.sp_columns.value(), rows=self.sp_rows.value(),
+                            margin=self.sp_margin.value(), split_position=self.cmb_position.currentData())
+
+    def _add_items(self, items: List[str]):
+        """投入されたファイル・フォルダをプレビューに並べ、「確認してから開始」でなければそのまま処理を始めます。"""
+        busy = self.scheduler.current is not None or bool(self.scheduler.queued())
+        if not busy and not self._pending_items:
+            self._clear_preview()  # 前のバッチが終わっていれば一覧を入れ替える
+        self._listers = [lister for lister in self._listers if lister.is_alive()]
+        lister = ItemLister(items, lambda batch, generation=self._preview_generation:
+                            self.signals.preview_items.emit(generation, batch))
+        self._listers.append(lister)
+        lister.start()
+        if self.cb_preview_first.isChecked():
+            self._pending_items.extend(items)
+            self._update_job_buttons()
+            self._on_status("プレビューに追加しました。分割線と記号（a, b …）を確かめて「分割を開始」を押してください。")
+        else:
+            self.start_processing(items)
+
+    def _start_pending(self):
+        items, self._pending_items = self._pending_items, []
+        if items:
+            self.start_processing(items)
+
+    def _stop_listers(self):
+        for lister in self._listers:
+            lister.stop()
+        self._listers = []
+
+    def _clear_preview(self):
+        self._stop_listers()
+        self._preview_generation += 1  # 止める前に送られた分は受け取らない
+        self._pending_items = []
+        self.preview_model.clear()
+        self.lbl_preview.setText("プレビュー: 0件")
+        self._update_job_buttons()
+
+    def _on_preview_items(self, generation: int, batch: list):
+        if generation != self._preview_generation:
+            return
+        self.preview_model.append(batch)
+        self.lbl_preview.setText(f"プレビュー: {self.preview_model.rowCount()}件")
 
+    #  実行 
+    def start_processing(self, items: List[str], watching: bool = False):
         # 分割方向
         split_direction = "right_to_left" if self.rb_r2l.isChecked() else "left_to_right"
+        if self.cb_columns_first.isChecked():
+            split_direction = "columns_" + split_direction
+
+        # 設定は投入した時点のものでジョブに固定する（処理中でも次のジョブとして積む）
+        busy = self.scheduler.current is not None or bool(self.scheduler.queued())
+        job = self.scheduler.submit(
+            items, split_direction,
+            workers=self.sp_workers.value(),
+            lossless_jpeg=self.cb_lossless.isChecked(),
+            incremental=self.cb_incremental.isChecked(),
+            split_position=self.cmb_position.currentData(),
+            columns=self.sp_columns.value(),
+            rows=self.sp_rows.value(),
+            margin=self.sp_margin.value(),
+            profile=self.cmb_profile.currentData(),
+            output_format=self.cmb_format.currentData(),
+            # 監視で追加したファイルは書庫にまとめない（書庫は実行ごとにまとめ直すため）
+            archive_output=None if watching else self.cmb_sink.currentData(),
+            archive_compression="deflated" if self.cb_deflate.isChecked() else "stored",
+            cache_dir=default_cache_dir() if self.cb_cache.isChecked() else None,
+            largest_first=self.cb_largest_first.isChecked(),
+            frame_mode=self.cmb_frames.currentData(),
+            metrics_sink=MemoryMetrics()
+        )
+        if not busy:
+            self.progress.setValue(0)
+            self.status.setToolTip("")
+            self._on_status(self._job_text(job, "準備中…"))
+        else:
+            self._on_status(f"ジョブ{job.id}（{job.label}）を追加しました。待機 {len(self.scheduler.queued())}件")
+        self._update_job_buttons()
+
+    def _job_text(self, job, text):
+        """ステータス文にジョブ番号と待機件数を添えます。"""
+        waiting = len(self.scheduler.queued())
+        suffix = f"\n待機中のジョブ {waiting}件" if waiting else ""
+        return f"[ジョブ{job.id}] {text}{suffix}"
+
+    def _toggle_pause(self):
+        if self.scheduler.paused:
+            self.scheduler.resume()
+        else:
+            self.scheduler.pause()
+        self._update_job_buttons()
 
-        # UIロック＆初期化
-        self._busy = True
-        self.progress.setValue(0)
-        self._on_status("準備中…")
+    def _cancel_current(self):
+        self.scheduler.cancel()
+        self._on_status("キャンセルしています…（処理中の1枚が終わると止まります）")
 
-        # バックグラウンドThread
-        t = threading.Thread(
-            target=self.processor.process_images,
-            args=(items, split_direction),
-            daemon=True
-        )
-        t.start()
+    def _update_job_buttons(self):
+        running = self.scheduler.current is not None or bool(self.scheduler.queued())
+        self.btn_pause.setEnabled(running)
+        self.btn_cancel.setEnabled(running)
+        self.btn_pause.setText("再開" if self.scheduler.paused else "一時停止")
+        self.btn_start.setEnabled(bool(self._pending_items))
 
     #  シグナル受け口 
     def _on_progress(self, value: float):
@@ -350,10 +722,30 @@ class MainWindow(QWidget):
     def _on_status(self, text: str):
         self.status.setText(text)
 
-    def _on_done(self, ok: bool):
-        self._busy = False
-        if ok:
-            self._on_status("すべての画像の分割が完了しました！")
+    def _on_done(self, job):
+        self._update_job_buttons()
+        summary = job.summary or {}
+        if job.state == "done" and summary.get("errors") and not (summary["processed"] or summary["skipped"]):
+            # 空き容量不足などでバッチごと断られ、1枚も書いていない
+            errors = summary["errors"]
+            more = f"（ほか {len(errors) - 1}件）" if len(errors) > 1 else ""
+            self._on_status(self._job_text(job, f"分割できませんでした: {errors[0]['error']}{more}"))
+            self.status.setToolTip("\n".join(f"{os.path.basename(e['path'])}: {e['error']}" for e in errors[:30]))
+            self.progress.setValue(0)
+        elif job.state == "done" and job.summary["found"]:
+            metrics = job.processor.metrics_sink
+            m = metrics.summary()
+            text = "すべての画像の分割が完了しました！"
+            if m["error_count"]:
+                text += f"（エラー {m['error_count']}件）"
+            self._on_status(self._job_text(job, f"{text}\n{metrics.stage_text()}"))
+            # エラーは上書きされないよう、一覧をツールチップに残す
+            lines = [f"[{e['stage']}] {os.path.basename(e['path'])}: {e['message']}" for e in m["errors"][:30]]
+            self.status.setToolTip("\n".join(lines))
+            self.progress.setValue(100)
+        elif job.state == "done":
+            self._on_status(self._job_text(job, "対象の画像ファイルが見つかりません。"))
+        elif job.state == "cancelled":
+            self._on_status(self._job_text(job, f"キャンセルしました（{job.label}）。"))
         else:
-            self._on_status("処理が中断されました。")
-        self.progress.setValue(100)
+            self._on_status(self._job_text(job, f"処理が中断されました: {job.error}"))
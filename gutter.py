@@ -0,0 +1,89 @@
+from PIL import Image
+
+# 見開きスキャンのノド（綴じ目）の位置を、縮小画像の列ごとの濃淡プロファイルから推定する
+# NumPy が無い環境では検出せず、呼び出し側は中央で分割する
+
+try:
+    import numpy as np
+except ImportError:  # 任意依存
+    np = None
+
+# 検出に使う縮小画像の幅の上限（ピクセル）
+PROFILE_WIDTH = 512
+# 中央から左右にこの割合の範囲でノドを探す
+SEARCH_RATIO = 0.15
+# 信頼度（0-1）がこれ未満なら検出失敗として中央に戻す
+MIN_CONFIDENCE = 0.5
+
+
+def available() -> bool:
+    """ノド検出が使えるか（NumPy があるか）を返します。"""
+    return np is not None
+
+
+def reduced_gray(image):
+    """読み込み済みの画像を、幅が PROFILE_WIDTH 以下のグレースケールに縮小して返します。"""
+    factor = max(1, -(-image.width // PROFILE_WIDTH))
+    reduced = image.reduce(factor) if factor > 1 else image
+    return reduced.convert("L")
+
+
+def open_reduced(source):
+    """ファイル（パスまたはファイルオブジェクト）から検出用の縮小グレースケール画像を作ります。
+
+    JPEG は draft で 1/8 まで縮小デコードします。
+    """
+    with Image.open(source) as image:
+        if image.format == "JPEG":
+            image.draft("L", (image.width // 8, image.height // 8))
+        return reduced_gray(image)
+
+
+def _smooth(profile, radius):
+    kernel = np.ones(2 * radius + 1, dtype=np.float32) / (2 * radius + 1)
+    padded = np.pad(profile, radius, mode="edge")
+    return np.convolve(padded, kernel, mode="valid")
+
+
+def find_gutter(gray, search=SEARCH_RATIO, min_confidence=MIN_CONFIDENCE):
+    """縮小グレースケール画像からノドの位置を幅に対する割合で返します。見つからなければ None。
+
+    ノドは「文字や絵が無く列方向のばらつきが小さい帯」として探し、その帯の中に影（暗い谷）があれば谷の底を選びます。
+    信頼度は、帯のばらつきがページ全体の典型的なばらつきに比べてどれだけ小さいかで測ります。
+    """
+    if np is None:
+        return None
+    a = np.asarray(gray, dtype=np.float32)
+    if a.ndim != 2 or a.shape[1] < 32 or a.shape[0] < 8:
+        return None
+    h, w = a.shape
+    margin = h // 20  # 上下の余白や紙端の影を除く
+    rows = a[margin:h - margin] if h - 2 * margin >= 8 else a
+    radius = max(1, w // 128)
+    spread = _smooth(rows.std(axis=0), radius)
+    shade = _smooth(rows.mean(axis=0), radius)
+
+    lo = max(1, int(w * (0.5 - search)))
+    hi = min(w - 1, int(w * (0.5 + search)) + 1)
+    window = spread[lo:hi]
+    reference = float(np.median(spread))
+    if reference < 2.0:
+        return None  # ほぼ無地のページは手掛かりがない
+    best = int(np.argmin(window))
+    confidence = 1.0 - float(window[best]) / reference
+    if confidence < min_confidence:
+        return None
+
+    # 最小点を含む「平らな帯」を左右に広げる
+    tolerance = window[best] + 0.1 * (reference - window[best])
+    left = right = best
+    while left > 0 and window[left - 1] <= tolerance:
+        left -= 1
+    while right < len(window) - 1 and window[right + 1] <= tolerance:
+        right += 1
+    band = shade[lo + left:lo + right + 1]
+    if float(band.max() - band.min()) > 8.0:
+        x = lo + left + int(np.argmin(band))   # 影の谷
+    else:
+        x = lo + (left + right) / 2            # 余白の帯の中央
+    return (x + 0.5) / w
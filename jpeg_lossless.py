@@ -0,0 +1,56 @@
+import shutil, subprocess
+
+# JPEG を DCT 係数のまま切り出す（jpegtran -crop 相当）ためのヘルパ
+# Pillow には DCT 領域でのクロップ API がないため、jpegtran (libjpeg-turbo) を呼び出す
+
+JPEG_EXTENSIONS = ('.jpg', '.jpeg')
+
+
+def find_jpegtran() -> str | None:
+    """PATH 上の jpegtran を探します。見つからなければ None を返します。"""
+    return shutil.which("jpegtran")
+
+
+def mcu_size(image) -> tuple[int, int]:
+    """JPEG 画像の MCU（最小符号化単位）の幅と高さをピクセルで返します。"""
+    layers = getattr(image, "layer", None)
+    if not layers:
+        return 8, 8
+    h_samp = max(layer[1] for layer in layers)
+    v_samp = max(layer[2] for layer in layers)
+    return 8 * h_samp, 8 * v_samp
+
+
+def snap_to_mcu(position: int, unit: int, limit: int) -> int | None:
+    """位置を最も近い MCU 境界へ寄せます。両側に1列以上残せない場合は None を返します。"""
+    if limit <= unit:
+        return None
+    snapped = int(round(position / unit)) * unit
+    return min(max(snapped, unit), (limit - 1) // unit * unit)
+
+
+def is_mcu_aligned(box, unit_w: int, unit_h: int) -> bool:
+    """切り出し範囲の左上が MCU 境界上にあるか（＝無劣化で切り出せるか）を返します。"""
+    x0, y0, _, _ = box
+    return x0 % unit_w == 0 and y0 % unit_h == 0
+
+
+def crop_jpeg(jpegtran: str, source, box) -> bytes:
+    """jpegtran で JPEG を無劣化クロップし、結果の JPEG バイト列を返します。
+
+    source はファイルパス、またはメモリ上の JPEG バイト列（標準入力で渡す）です。
+    """
+    x0, y0, x1, y1 = box
+    cmd = [jpegtran, "-copy", "all", "-crop", f"{x1 - x0}x{y1 - y0}+{x0}+{y0}"]
+    data = None
+    if isinstance(source, bytes):
+        data = source
+    else:
+        cmd.append(source)
+    # Windows の --noconsole ビルドでコンソールが一瞬開かないようにする
+    flags = getattr(subprocess, "CREATE_NO_WINDOW", 0)
+    result = subprocess.run(cmd, input=data, capture_output=True, creationflags=flags)
+    if result.returncode != 0 or not result.stdout:
+        message = result.stderr.decode(errors="replace").strip() or f"exit {result.returncode}"
+        raise RuntimeError(f"jpegtran の実行に失敗しました: {message}")
+    return result.stdout
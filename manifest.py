@@ -0,0 +1,100 @@
+import hashlib, json, os
+from archives import ArchiveMember, read_member
+
+# 出力フォルダごとの処理記録（差分実行・中断からの再開用）
+
+MANIFEST_NAME = ".imagesplitter_manifest.jsonl"
+
+
+def file_digest(path, chunk_size=1 << 20) -> str:
+    """ファイル（またはアーカイブ内の画像）の内容の BLAKE2b ハッシュ（16進）を返します。"""
+    h = hashlib.blake2b(digest_size=16)
+    if isinstance(path, ArchiveMember):
+        h.update(read_member(path))
+        return h.hexdigest()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class SplitManifest:
+    """出力フォルダに置く処理記録。1ファイル処理するたびに JSON Lines で追記し、同じ入力は後の行を優先します。"""
+    def __init__(self, output_folder, use_hash=False):
+        self.output_folder = output_folder
+        self.path = os.path.join(output_folder, MANIFEST_NAME)
+        self.use_hash = use_hash
+        self.entries = {}
+        self._file = None
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue  # 異常終了で途中まで書かれた行は無視する
+                self.entries[entry["input"]] = entry
+
+    def _key(self, input_path):
+        if isinstance(input_path, ArchiveMember):
+            return f"{self._key(input_path.archive)}!/{input_path.name}"
+        # 出力フォルダからの相対パスにしておき、フォルダごと移動しても使えるようにする
+        return os.path.relpath(os.path.abspath(input_path), self.output_folder).replace(os.sep, "/")
+
+    def is_up_to_date(self, input_path, stat, params, frame_count=None) -> bool:
+        """入力が前回の処理から変わっておらず、出力も揃っていれば True を返します。
+
+        frame_count（入力のフレーム数を返す関数）を渡すと、フレーム数のない古い記録は入力が複数フレームのとき古い扱いにします。
+        """
+        entry = self.entries.get(self._key(input_path))
+        if not entry or entry.get("params") != params:
+            return False
+        if not all(os.path.exists(os.path.join(self.output_folder, name)) for name in entry["outputs"]):
+            return False
+        if frame_count is not None and "frames" not in entry:
+            try:
+                if frame_count(input_path) > 1:
+                    return False
+            except Exception:
+                return False  # 開けなければ分割に回し、そこでエラーとして報告する
+        if entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+            return True
+        # サイズ／更新日時が違っても、内容が同じなら（コピーし直しただけなど）処理済みとみなす
+        if self.use_hash and entry.get("hash") and entry["size"] == stat.st_size:
+            if file_digest(input_path) == entry["hash"]:
+                self.record(input_path, stat, params, entry["outputs"], entry["hash"], entry.get("frames", 1))
+                return True
+        return False
+
+    def record(self, input_path, stat, params, outputs, digest=None, frames=1):
+        """1ファイル分の処理結果を追記します。frames は分割した入力のフレーム数です。"""
+        entry = {
+            "input": self._key(input_path),
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "hash": digest,
+            "params": params,
+            "outputs": list(outputs),
+            "frames": frames,
+        }
+        self.entries[entry["input"]] = entry
+        if self._file is None:
+            self._file = open(self.path, "a", encoding="utf-8")
+        self._file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self._file.flush()
+
+    def close(self):
+        """追記を終え、重複行を除いた形に書き直します。"""
+        if self._file is None:
+            return
+        self._file.close()
+        self._file = None
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for entry in self.entries.values():
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        os.replace(tmp_path, self.path)
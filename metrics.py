@@ -0,0 +1,118 @@
+import json, threading, time
+from contextlib import contextmanager
+
+# 分割処理の工程別計測（open / decode / crop / encode / write）と、その受け口
+
+STAGES = ("open", "decode", "crop", "encode", "write")
+
+
+class SplitStats:
+    """1ファイル分の工程別時間と入出力バイト数。例外が起きた工程も覚えておきます。"""
+    def __init__(self):
+        self.stage_ms = {}
+        self.bytes_in = 0
+        self.bytes_out = 0
+        # 分割した入力のフレーム数（処理記録に残す）
+        self.frames = 1
+        self.current_stage = None
+
+    @contextmanager
+    def stage(self, name):
+        self.current_stage = name
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = (time.perf_counter() - t0) * 1000
+            self.stage_ms[name] = round(self.stage_ms.get(name, 0.0) + elapsed, 3)
+        self.current_stage = None
+
+
+class MetricsSink:
+    """計測レコード（辞書）の受け口。ImageProcessor の処理スレッドから record() が呼ばれます。"""
+    def record(self, record):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class MemoryMetrics(MetricsSink):
+    """レコードをメモリ上で集計します（GUI の表示や CLI のサマリ用）。"""
+    def __init__(self, max_errors=1000):
+        self._lock = threading.Lock()
+        self.max_errors = max_errors
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.files = 0
+            self.skipped = 0
+            self.bytes_in = 0
+            self.bytes_out = 0
+            self.stage_ms = {name: 0.0 for name in STAGES}
+            self.errors = []
+            self.error_count = 0
+
+    def record(self, record):
+        with self._lock:
+            if record.get("skipped"):
+                self.skipped += 1
+                return
+            self.files += 1
+            self.bytes_in += record.get("bytes_in", 0)
+            self.bytes_out += record.get("bytes_out", 0)
+            for name, ms in record.get("stage_ms", {}).items():
+                self.stage_ms[name] = self.stage_ms.get(name, 0.0) + ms
+            if record.get("error"):
+                self.error_count += 1
+                if len(self.errors) < self.max_errors:
+                    self.errors.append(record["error"])
+
+    def summary(self):
+        """集計結果を辞書で返します。"""
+        with self._lock:
+            return {
+                "files": self.files,
+                "skipped": self.skipped,
+                "bytes_in": self.bytes_in,
+                "bytes_out": self.bytes_out,
+                "stage_ms": {name: round(ms, 1) for name, ms in self.stage_ms.items()},
+                "error_count": self.error_count,
+                "errors": list(self.errors),
+            }
+
+    def stage_text(self):
+        """工程別の合計時間を1行の文字列にします。"""
+        with self._lock:
+            return " / ".join(f"{name} {self.stage_ms.get(name, 0.0) / 1000:.1f}s" for name in STAGES)
+
+
+class JsonlMetrics(MetricsSink):
+    """レコードを JSON Lines ファイルへ1行ずつ書き出します。"""
+    def __init__(self, path):
+        self._lock = threading.Lock()
+        self._file = open(path, "a", encoding="utf-8")
+
+    def record(self, record):
+        line = json.dumps(record, ensure_ascii=False)
+        with self._lock:
+            self._file.write(line + "\n")
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+class TeeMetrics(MetricsSink):
+    """複数の受け口へ同じレコードを配ります。"""
+    def __init__(self, *sinks):
+        self.sinks = [s for s in sinks if s is not None]
+
+    def record(self, record):
+        for sink in self.sinks:
+            sink.record(record)
+
+    def close(self):
+        for sink in self.sinks:
+            sink.close()
@@ -0,0 +1,205 @@
+import os, shutil, zipfile
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from PIL import Image
+from archives import ArchiveMember, input_label, input_name, input_stat
+from encoders import output_target
+from strips import open_header
+
+# 事前計画: ヘッダだけ読んで各ファイルの大きさ・手間・出力サイズを見積もり、重いものから順に並べる
+# 並列処理の最後に巨大なファイルが残り、1コアだけが動き続けるのを防ぐ（LPT: 処理時間の長い順）
+
+# 1コアあたりの処理速度の目安（メガピクセル/秒、デコード＋切り出し＋エンコード）。出力形式ごと
+_MP_PER_S = {"JPEG": 75.0, "PNG": 15.0, "WEBP": 8.0, "TIFF": 160.0, "BMP": 120.0, "GIF": 35.0}
+# jpegtran による無劣化分割
+_LOSSLESS_MP_PER_S = 200.0
+# エンコード設定による手間の違い（zlib / WebP の method が効く形式だけ）
+_PROFILE_COST = {"fast": 0.5, "archival": 2.5}
+# 形式を変えるときの出力サイズの目安（非圧縮のバイト数に対する割合。実際のスキャン向けに大きめ）
+_COMPRESSION_RATIO = {"JPEG": 0.15, "PNG": 0.6, "WEBP": 0.1, "TIFF": 1.0, "BMP": 1.0, "GIF": 0.5}
+# 1ファイルあたりの固定の手間（開く・書き込みなど、秒）
+_FILE_OVERHEAD_S = 0.005
+# 出力サイズの見積もりに掛ける余裕
+_SPACE_MARGIN = 1.1
+
+
+@dataclass
+class PlanEntry:
+    """1ファイル分の見積もり。ヘッダを読めなかったときは error に理由が入ります。"""
+    item: object
+    width: int = 0
+    height: int = 0
+    mode: str = ""
+    format: str = ""
+    frames: int = 1
+    input_bytes: int = 0
+    cost_s: float = 0.0
+    output_bytes: int = 0
+    skipped: bool = False
+    error: str | None = None
+
+    def report(self):
+        return {
+            "path": input_label(self.item), "width": self.width, "height": self.height, "mode": self.mode,
+            "format": self.format, "frames": self.frames, "input_bytes": self.input_bytes,
+            "cost_s": round(self.cost_s, 4), "output_bytes": self.output_bytes, "skipped": self.skipped,
+            "error": self.error,
+        }
+
+
+def _read_header(entry, source):
+    """ヘッダだけ読んで（load() しない）寸法・モード・形式・フレーム数を entry に入れます。"""
+    with open_header(source) as image:
+        entry.width, entry.height = image.size
+        entry.mode = image.mode
+        entry.format = image.format or ""
+        entry.frames = getattr(image, "n_frames", 1)
+
+
+def _read_file_headers(entries):
+    for entry in entries:
+        try:
+            _read_header(entry, entry.item)
+        except Exception as e:
+            entry.error = str(e)
+
+
+def _read_member_headers(archive_path, entries):
+    """同じアーカイブのメンバーは、中央ディレクトリを1回だけ読んでまとめて調べます。"""
+    try:
+        with zipfile.ZipFile(archive_path) as archive:
+            for entry in entries:
+                try:
+                    with archive.open(entry.item.name) as f:
+                        _read_header(entry, f)
+                except Exception as e:
+                    entry.error = str(e)
+    except (OSError, zipfile.BadZipFile) as e:
+        for entry in entries:
+            entry.error = str(e)
+
+
+def _tile_area_ratio(width, height, options):
+    """タイルの面積の合計と元の面積の比（重ね幅のぶん増え、削るぶん減る）。"""
+    w = max(1, width + 2 * options.margin * (options.columns - 1))
+    h = max(1, height + 2 * options.margin * (options.rows - 1))
+    return w * h / max(1, width * height)
+
+
+def _estimate(entry, options):
+    """1ファイル分の処理時間（1コアあたりの秒）と出力サイズを見積もります。"""
+    ext = os.path.splitext(input_name(entry.item))[1]
+    save_format = output_target(ext, entry.format, options.output_format)[1]
+    # アニメーション・複数ページの画像は全フレームを分割する（"first" のときだけ先頭フレーム）
+    frames = 1 if options.frame_mode == "first" else max(1, entry.frames)
+    pixels = entry.width * entry.height * frames
+    ratio = _tile_area_ratio(entry.width, entry.height, options)
+    lossless = options.jpegtran and entry.format == "JPEG" and save_format == "JPEG"
+    if lossless:
+        rate = _LOSSLESS_MP_PER_S
+    else:
+        rate = _MP_PER_S.get(save_format, 30.0)
+        if save_format in ("PNG", "WEBP"):
+            rate /= _PROFILE_COST.get(options.profile, 1.0)
+    entry.cost_s = _FILE_OVERHEAD_S + pixels / 1e6 / rate
+    if save_format == entry.format:
+        # 同じ形式なら入力の圧縮率がそのまま目安になる（入力のバイト数は全フレーム分）
+        entry.output_bytes = int(entry.input_bytes * ratio * frames / max(1, entry.frames))
+    else:
+        try:
+            bands = Image.getmodebands(entry.mode)
+        except (KeyError, ValueError):
+            bands = 3
+        entry.output_bytes = int(pixels * bands * _COMPRESSION_RATIO.get(save_format, 1.0) * ratio)
+
+
+def free_space(folder):
+    """folder（まだ無ければ存在する親フォルダ）のドライブの空き容量（バイト）。調べられなければ None。"""
+    folder = os.path.abspath(folder)
+    while not os.path.exists(folder):
+        parent = os.path.dirname(folder)
+        if parent == folder:
+            return None
+        folder = parent
+    try:
+        return shutil.disk_usage(folder).free
+    except OSError:
+        return None
+
+
+class Plan:
+    """処理順に並べた見積もりの一覧と、その合計。"""
+    def __init__(self, entries, output_folder, workers):
+        self.entries = entries
+        self.output_folder = output_folder
+        self.workers = max(1, workers)
+        work = [entry for entry in entries if not entry.skipped]
+        self.total_cost_s = sum(entry.cost_s for entry in work)
+        self.output_bytes = int(sum(entry.output_bytes for entry in work) * _SPACE_MARGIN)
+        self.free_bytes = free_space(output_folder)
+        # 重い順に割り振ったときの所要時間の目安（全体をワーカーで割った値と、最も重い1件の大きい方）
+        self.est_wall_s = max(self.total_cost_s / self.workers, max((entry.cost_s for entry in work), default=0.0))
+
+    @property
+    def enough_space(self):
+        return self.free_bytes is None or self.output_bytes <= self.free_bytes
+
+    def summary(self):
+        """集計値だけの辞書（JSON サマリ用）。"""
+        return {
+            "files": len(self.entries),
+            "to_process": sum(1 for entry in self.entries if not entry.skipped),
+            "unreadable": sum(1 for entry in self.entries if entry.error),
+            "total_pixels": sum(entry.width * entry.height for entry in self.entries if not entry.skipped),
+            "est_cpu_s": round(self.total_cost_s, 2),
+            "est_wall_s": round(self.est_wall_s, 2),
+            "workers": self.workers,
+            "est_output_bytes": self.output_bytes,
+            "free_bytes": self.free_bytes,
+            "enough_space": self.enough_space,
+            "output_folder": os.path.abspath(self.output_folder),
+        }
+
+    def report(self):
+        """ドライラン用の報告（集計値と、処理順に並べたファイルごとの見積もり）。"""
+        report = self.summary()
+        report["entries"] = [entry.report() for entry in self.entries]
+        return report
+
+
+def build_plan(items, options, output_folder, workers, skip_fn=None, largest_first=True, io_threads=8):
+    """items（パスか ArchiveMember）のヘッダを読んで見積もり、処理順に並べた Plan を返します。
+
+    skip_fn(item, stat) が True を返すもの（処理記録で最新のもの）はヘッダを読まず、すぐ終わるので先頭に置きます。
+    largest_first=False なら元の順序のまま見積もりだけ行います（書庫出力のように読む順で投入したいとき）。
+    """
+    entries = []
+    files = []
+    members = {}
+    for item in items:
+        stat = input_stat(item)
+        entry = PlanEntry(item, input_bytes=stat.st_size if stat else 0)
+        entries.append(entry)
+        if skip_fn is not None and stat and skip_fn(item, stat):
+            entry.skipped = True
+        elif isinstance(item, ArchiveMember):
+            members.setdefault(item.archive, []).append(entry)
+        else:
+            files.append(entry)
+
+    # ヘッダ読みは I/O 待ちが主なので、スレッドでまとめて進める（ネットワーク共有でも待ちが重ならない）
+    # 巨大画像も寸法を知りたいので、解凍爆弾チェックをかけずに開く（ヘッダしか読まない）
+    chunk = max(1, -(-len(files) // (io_threads * 4)))
+    with ThreadPoolExecutor(max_workers=max(1, io_threads), thread_name_prefix="ImageSplitterPlanner") as pool:
+        jobs = [pool.submit(_read_file_headers, files[i:i + chunk]) for i in range(0, len(files), chunk)]
+        jobs += [pool.submit(_read_member_headers, archive, group) for archive, group in members.items()]
+        for job in jobs:
+            job.result()
+
+    for entry in entries:
+        if not entry.skipped and not entry.error:
+            _estimate(entry, options)
+    if largest_first:
+        # 安定ソートなので、同じ見積もりのものは見つかった順のまま
+        entries.sort(key=lambda entry: (not entry.skipped, -entry.cost_s))
+    return Plan(entries, output_folder, workers)
@@ -0,0 +1,256 @@
+import os, threading, time
+from collections import OrderedDict
+from contextlib import nullcontext
+from dataclasses import dataclass, replace
+from PIL import Image
+from archives import ArchiveMember, input_label, input_stat, open_source, read_member
+from gutter import PROFILE_WIDTH, available as gutter_available, find_gutter, reduced_gray
+from processor import iter_image_files, tile_layout
+from strips import open_header, open_strip_reader
+
+# 分割プレビュー: 投入したファイルの縮小画像に分割線と出力の記号（a, b …）を重ねて見せる
+# 縮小画像は UI スレッドの外で作り、JPEG は draft（DCT 段階での 1/2〜1/8 デコード）、それ以外は reduce で縮める
+# 巨大な PNG / TIFF は帯読みで少しずつ縮め、全体を展開しない。それ以外の大きな画像は同時に1枚ずつ展開する
+# 出来たものはメモリ上限付きの LRU に置き、画面に見えているものだけを頼まれた順に作る（1万件の投入でも重くならない）
+# 分割線は元画像の寸法とノドの位置から描く側で計算するので、分割方向や分割数を変えてもデコードし直さない
+
+# 縮小画像の長辺（ピクセル）
+THUMB_SIZE = 128
+# 縮小画像を置いておくメモリの上限（バイト）
+CACHE_MAX_BYTES = 64 * 1024 * 1024
+# まだ作っていない依頼をいくつまで覚えておくか（超えたら古い依頼から捨てる。画面に戻れば頼み直される）
+MAX_PENDING = 256
+# この画素数以上の画像は、帯読みできれば帯ごとに縮め、できなければ同時に1枚だけ展開する
+LARGE_PIXELS = 32 * 1024 * 1024
+# 帯読みで縮められるモード（P は帯にパレットが付かず、reduce もできない）
+_STRIP_MODES = ("L", "LA", "RGB", "RGBA", "CMYK")
+# 帯読みの1帯の行数
+_STRIP_ROWS = 256
+_large_decodes = threading.Semaphore(1)
+
+
+@dataclass(frozen=True)
+class Thumbnail:
+    """縮小画像1枚分。image は RGB の縮小画像（convert を渡したときはその戻り値）で、読めなければ None。"""
+    image: object
+    width: int = 0   # 元画像の幅
+    height: int = 0  # 元画像の高さ
+    # 検出したノドの位置（幅に対する割合）。検出できない・NumPy が無いときは None
+    gutter: float | None = None
+    error: str | None = None
+
+
+def preview_key(item):
+    """キャッシュのキー（表示用のパス・サイズ・更新日時）。中身が変わったファイルは別のキーになります。"""
+    stat = input_stat(item)
+    return input_label(item), stat.st_size if stat else 0, stat.st_mtime_ns if stat else 0
+
+
+def make_thumbnail(item, size=THUMB_SIZE, convert=None):
+    """item（パスか ArchiveMember）の縮小画像を作ります。複数フレームの画像は先頭フレームを使います。
+
+    ノド検出にも使うため、いったん PROFILE_WIDTH 程度まで縮小デコードしてから size へ縮めます。
+    解凍爆弾チェックは、帯読みで縮める巨大な PNG / TIFF を除いて分割時と同じようにかけます。
+    """
+    source = read_member(item) if isinstance(item, ArchiveMember) else item
+    with open_header(open_source(source)) as image:
+        width, height = image.size
+        target = max(size, PROFILE_WIDTH) if gutter_available() else size
+        if image.format == "JPEG":
+            image.draft("RGB", (target, max(1, target * height // max(1, width))))
+        factor = max(1, min(image.width, image.height) // target)
+        large = image.width * image.height >= LARGE_PIXELS
+        reader = open_strip_reader(image, source, _STRIP_ROWS) if large and not isinstance(source, bytes) else None
+        if reader is not None and reader.mode in _STRIP_MODES:
+            reduced = _reduce_strips(reader, factor)
+        else:
+            Image._decompression_bomb_check(image.size)
+            with _large_decodes if large else nullcontext():
+                if image.mode not in ("L", "RGB", "RGBA"):
+                    image = image.convert("RGBA" if "transparency" in image.info or image.mode.endswith("A") else "RGB")
+                reduced = image.reduce(factor) if factor > 1 else image.copy()
+    if reduced.mode not in ("L", "RGB", "RGBA"):
+        reduced = reduced.convert("RGBA" if reduced.mode.endswith("A") else "RGB")
+
+    gutter = None
+    if gutter_available():
+        try:
+            gutter = find_gutter(reduced_gray(reduced))
+        except ValueError:
+            pass
+    reduced.thumbnail((size, size), Image.Resampling.BILINEAR)
+    if reduced.mode == "RGBA":
+        background = Image.new("RGB", reduced.size, (255, 255, 255))
+        background.paste(reduced, mask=reduced.getchannel("A"))
+        reduced = background
+    elif reduced.mode != "RGB":
+        reduced = reduced.convert("RGB")
+    return Thumbnail(convert(reduced) if convert else reduced, width, height, gutter)
+
+
+def _reduce_strips(reader, factor, rows=_STRIP_ROWS):
+    """帯リーダーで上から少しずつ読み、factor 分の1に縮めた画像を返します（全体を展開しない）。"""
+    width = reader.width
+    reduced = Image.new(reader.mode, (-(-width // factor), -(-reader.height // factor)))
+    carry = None  # factor 行に満たず、次の帯とまとめて縮める残り
+    y = 0
+    for strip in reader.iter_strips(max(rows, factor)):
+        if carry is not None:
+            joined = Image.new(strip.mode, (width, carry.height + strip.height))
+            joined.paste(carry, (0, 0))
+            joined.paste(strip, (0, carry.height))
+            strip = joined
+        usable = strip.height - strip.height % factor
+        if usable:
+            reduced.paste(strip.crop((0, 0, width, usable)).reduce(factor), (0, y))
+            y += usable // factor
+        carry = strip.crop((0, usable, width, strip.height)) if usable < strip.height else None
+    if carry is not None:
+        reduced.paste(carry.reduce(factor), (0, y))
+    return reduced
+
+
+def split_layout(thumbnail, options):
+    """元画像の座標で見た [(記号, 切り出し範囲), ...] を読む順に返します（縮小画像への倍率は描く側で掛ける）。
+
+    ノド検出はページごとに検出した位置を使います（「本全体で共通」でも目安としてページごとの位置を見せる）。
+    """
+    if options.columns == 2 and options.split_position != "center" and thumbnail.gutter is not None:
+        options = replace(options, split_ratio=thumbnail.gutter)
+    return tile_layout(thumbnail.width, thumbnail.height, options)
+
+
+class LRUCache:
+    """合計バイト数に上限のある LRU。上限を超えたら最後に使ったのが古いものから捨てます。"""
+    def __init__(self, max_bytes=CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._items = OrderedDict()  # キー → (値, バイト数)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._items)
+
+    def __contains__(self, key):
+        return key in self._items
+
+    def get(self, key):
+        with self._lock:
+            entry = self._items.get(key)
+            if entry is None:
+                return None
+            self._items.move_to_end(key)
+            return entry[0]
+
+    def put(self, key, value, nbytes):
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self.bytes -= old[1]
+            self._items[key] = (value, nbytes)
+            self.bytes += nbytes
+            # 入れたばかりのものは、それ1つで上限を超えても残す
+            while self.bytes > self.max_bytes and len(self._items) > 1:
+                _, (_, size) = self._items.popitem(last=False)
+                self.bytes -= size
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self.bytes = 0
+
+
+class ThumbnailLoader:
+    """縮小画像をスレッドで作り、出来たら on_ready(キー, Thumbnail) を呼びます（作ったスレッドから呼ばれます）。
+
+    最後に頼まれたもの（いま画面に見えているもの）から作り、作る前に MAX_PENDING を超えた古い依頼は捨てます。
+    スクロールで通り過ぎただけのファイルはデコードしません。
+    """
+    def __init__(self, on_ready, threads=None, size=THUMB_SIZE, convert=None, max_pending=MAX_PENDING):
+        self.on_ready = on_ready
+        self.size = size
+        self.convert = convert
+        self.max_pending = max_pending
+        self._pending = OrderedDict()  # キー → item（新しい依頼ほど後ろ）
+        self._running = set()
+        self._cond = threading.Condition()
+        self._closed = False
+        # 分割のワーカーの邪魔をしないよう、既定では CPU コア数の半分（最大 4 本）にとどめる
+        threads = threads or max(1, min(4, (os.cpu_count() or 1) // 2))
+        self._threads = [threading.Thread(target=self._run, name=f"ImageSplitterPreview-{i}", daemon=True)
+                         for i in range(threads)]
+        for thread in self._threads:
+            thread.start()
+
+    def request(self, key, item):
+        """縮小画像を頼みます。作成中・依頼済みのものは順番だけ先頭へ回します。"""
+        with self._cond:
+            if self._closed or key in self._running:
+                return
+            self._pending.pop(key, None)
+            self._pending[key] = item
+            while len(self._pending) > self.max_pending:
+                self._pending.popitem(last=False)
+            self._cond.notify()
+
+    def clear(self):
+        """まだ作り始めていない依頼をすべて捨てます（一覧を消したときなど）。"""
+        with self._cond:
+            self._pending.clear()
+
+    def close(self):
+        """依頼を捨ててスレッドを止めます。作成中の1枚は待ちません（スレッドはデーモン）。"""
+        with self._cond:
+            self._closed = True
+            self._pending.clear()
+            self._cond.notify_all()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+                key, item = self._pending.popitem(last=True)
+                self._running.add(key)
+            try:
+                thumbnail = make_thumbnail(item, self.size, self.convert)
+            except Exception as e:  # 壊れたファイル・未対応のモード・大きすぎる画像など
+                thumbnail = Thumbnail(None, error=str(e))
+            finally:
+                with self._cond:
+                    self._running.discard(key)
+            if not self._closed:
+                self.on_ready(key, thumbnail)
+
+
+class ItemLister(threading.Thread):
+    """投入されたファイル・フォルダから画像を探し、見つけた分を on_batch([(キー, item), ...]) でまとめて渡すスレッド。
+
+    大量のファイルでも UI への通知が多くなりすぎないよう、batch_size 件か interval 秒ごとにまとめます。
+    """
+    def __init__(self, items, on_batch, batch_size=500, interval=0.2):
+        super().__init__(daemon=True, name="ImageSplitterPreviewLister")
+        self._items = list(items)
+        self.on_batch = on_batch
+        self.batch_size = batch_size
+        self.interval = interval
+        self._stopped = threading.Event()
+
+    def stop(self):
+        self._stopped.set()
+
+    def run(self):
+        batch = []
+        sent = time.monotonic()
+        for item in iter_image_files(self._items):
+            if self._stopped.is_set():
+                return
+            batch.append((preview_key(item), item))
+            if len(batch) >= self.batch_size or time.monotonic() - sent >= self.interval:
+                self.on_batch(batch)
+                batch = []
+                sent = time.monotonic()
+        if batch and not self._stopped.is_set():
+            self.on_batch(batch)
@@ -1,81 +1,1280 @@
-import os
+import contextlib, io, itertools, multiprocessing, os, queue, signal, statistics, threading, time, zipfile
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from dataclasses import dataclass, replace
 from PIL import Image
 from utils import SUPPORTED_EXTENSIONS
+from jpeg_lossless import JPEG_EXTENSIONS, crop_jpeg, find_jpegtran, is_mcu_aligned, mcu_size, snap_to_mcu
+from manifest import SplitManifest, file_digest
+from archives import (ArchiveMember, ARCHIVE_EXTENSIONS, input_label, input_name, input_stat, is_archive,
+                      iter_archive_members, natural_key, open_source, read_member)
+from metrics import SplitStats
+from strips import STREAM_EXTENSIONS, open_header, open_strip_reader, split_streaming, strip_reader_error
+from writer import ArchiveWriter, AsyncWriter, atomic_write, remove_quietly, temp_path_for
+from progress import ProgressReporter, format_duration
+from encoders import OUTPUT_FORMATS, convert_for, encode, output_target, save_options, zlib_level
+from gutter import available as gutter_available, find_gutter, open_reduced, reduced_gray
+from cache import ResultCache, cache_key
+from planner import build_plan
+
+# 出力フォルダ名（探索時はこの名前のフォルダを入力として扱わない）
+OUTPUT_FOLDER_NAME = "half"
+
+
+# 読む順序: 行ごと（右→左 / 左→右）、または列ごとに上から（列は右→左 / 左→右）
+SPLIT_DIRECTIONS = ("right_to_left", "left_to_right", "columns_right_to_left", "columns_left_to_right")
+
+# 複数フレーム（アニメーション・複数ページ）になり得る入力の拡張子
+MULTI_FRAME_EXTENSIONS = (".gif", ".png", ".webp", ".tiff")
+
+
+@dataclass(frozen=True)
+class SplitOptions:
+    """1枚ごとの分割設定。ワーカープロセスへそのまま渡せるよう不変・pickle 可能にしておく。"""
+    split_direction: str = "right_to_left"
+    # 横 columns × 縦 rows に分割する（既定は左右2分割）
+    columns: int = 2
+    rows: int = 1
+    # 内側の境界で隣のタイルへはみ出す幅（ピクセル）。負の値なら境界の両側を削る
+    margin: int = 0
+    # エンコード設定（encoders.PROFILES）と出力形式（encoders.OUTPUT_FORMATS のキー。None なら入力と同じ）
+    profile: str = "default"
+    output_format: str | None = None
+    # JPEG を DCT 領域で無劣化分割する（jpegtran のパス。None なら再エンコード）
+    jpegtran: str | None = None
+    # 分割位置が MCU 境界に乗らないとき: "snap" は境界へ寄せる / "reencode" は再エンコードに切り替える
+    mcu_policy: str = "snap"
+    # 入力のハッシュを計算して処理記録に残すか
+    hash_input: bool = False
+    # この画素数以上の PNG / TIFF は帯単位で読み書きする（0 で無効）
+    stream_min_pixels: int = 0
+    # 帯読みのときの1帯の行数
+    strip_rows: int = 256
+    # 分割位置: "center" は中央 / "auto" はページごとにノドを検出（見つからなければ中央）
+    split_position: str = "center"
+    # 幅に対する分割位置の割合。指定すると split_position より優先する（本1冊で共通の位置を使うとき）
+    split_ratio: float | None = None
+    # 分割結果のキャッシュフォルダ（cache.ResultCache。None なら使わない）。出力内容には影響しない
+    cache_dir: str | None = None
+    # 1枚のタイルを並列にエンコードするスレッド数の上限（0 ならタイル数まで。1 で逐次）。空いているコアの分だけ使う
+    tile_threads: int = 0
+    # 複数フレーム（アニメーション・複数ページ）の扱い:
+    #   "sequence" は各タイルを複数フレームのまま保存 / "pages" はページごとに別ファイル / "first" は先頭フレームだけ
+    frame_mode: str = "sequence"
+
+    def signature(self):
+        """出力内容に影響する設定だけを辞書で返します（処理記録・キャッシュの比較用）。"""
+        params = {
+            "split_direction": self.split_direction,
+            "lossless_jpeg": self.jpegtran is not None,
+            "mcu_policy": self.mcu_policy,
+        }
+        # 既定値のときは載せない（以前の処理記録と互換にするため）
+        if (self.columns, self.rows) != (2, 1):
+            params["grid"] = [self.columns, self.rows]
+        if self.margin:
+            params["margin"] = self.margin
+        if self.profile != "default":
+            params["profile"] = self.profile
+        if self.output_format:
+            params["output_format"] = self.output_format
+        if self.split_ratio is not None:
+            params["split_ratio"] = round(self.split_ratio, 6)
+        elif self.split_position != "center":
+            params["split_position"] = self.split_position
+        if self.frame_mode != "sequence":
+            params["frame_mode"] = self.frame_mode
+        return params
+
+
+def _legacy_frame_count(options):
+    """処理記録の照合に渡すフレーム数の関数を返します（先頭フレームだけを分割する設定なら None）。
+
+    フレーム数のない記録は複数フレーム対応より前のもので、複数フレームの入力なら先頭フレームしか分割していません。
+    """
+    return input_frame_count if options.frame_mode != "first" else None
+
+
+def input_frame_count(image_path):
+    """入力のフレーム数をヘッダだけ読んで返します。複数フレームになり得ない形式は開かずに 1 を返します。"""
+    if not input_name(image_path).lower().endswith(MULTI_FRAME_EXTENSIONS):
+        return 1
+    source = read_member(image_path) if isinstance(image_path, ArchiveMember) else image_path
+    with open_header(open_source(source)) as image:
+        return getattr(image, "n_frames", 1)
+
+
+# タイルを並列に処理するときの CPU の枠（全ワーカーで共有する、CPU コア数ぶんのセマフォ）
+# ワーカーは1件処理する間1枠を持ち、追加のスレッドは空いている枠があるときだけ借りる
+# 全ワーカーが忙しい間は逐次処理になり、バッチの終盤や1枚だけの巨大画像では空いたコアを使う
+_cpu_slots = None
+# 複数フレームの画像の進み具合をメインプロセスへ送るキュー（(ファイル名, 済んだフレーム数, 全フレーム数)）
+_frame_events = None
+
+
+def _init_worker(slots, frame_events=None):
+    """ワーカープロセスの初期化。共有の CPU 枠と、フレーム単位の進捗の送り先を受け取ります。"""
+    global _cpu_slots, _frame_events
+    _cpu_slots = slots
+    _frame_events = frame_events
+
+
+def _init_pool_worker(slots, frame_events):
+    """プロセスプールのワーカーの初期化。Ctrl+C はメインプロセスだけが受け、処理中の1枚は最後まで続けます。"""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    _init_worker(slots, frame_events)
+
+
+@contextlib.contextmanager
+def _borrow_slots(count):
+    """空いている CPU 枠を待たずに最大 count 個借り、借りられた数を返します。"""
+    got = 0
+    if _cpu_slots is not None:
+        while got < count and _cpu_slots.acquire(False):
+            got += 1
+    try:
+        yield got
+    finally:
+        for _ in range(got):
+            _cpu_slots.release()
+
+
+def _extra_threads(options, count):
+    """タイル count 枚を処理するときに借りたい追加のスレッド数。"""
+    limit = count if options.tile_threads <= 0 else min(count, options.tile_threads)
+    return max(0, limit - 1)
+
+
+def _map_tiles(fn, boxes, options):
+    """タイルごとに fn(box) を呼び、結果を読む順に返します。空いているコアがあればスレッドで並列に処理します。"""
+    with _borrow_slots(_extra_threads(options, len(boxes))) as extra:
+        if not extra:
+            return [fn(box) for box in boxes]
+        with ThreadPoolExecutor(max_workers=extra + 1) as pool:
+            return list(pool.map(fn, boxes))
+
+
+def _even_cuts(length, count):
+    """長さを count 等分する境界位置（両端を含む）を返します。"""
+    return [length * i // count for i in range(count + 1)]
+
+
+def _split_boxes(width, height, xs, ys, options):
+    """境界位置 xs / ys から各タイルの切り出し範囲を、読む順に並べて返します。
+
+    margin は内側の境界にだけ効かせ、画像の外周はそのままにします。
+    """
+    margin = options.margin
+    columns, rows = len(xs) - 1, len(ys) - 1
+
+    def span(cuts, i, count, limit):
+        start = cuts[i] - margin if i > 0 else 0
+        end = cuts[i + 1] + margin if i < count - 1 else limit
+        start = min(max(start, 0), limit - 1)
+        return start, min(max(end, start + 1), limit)
+
+    order = range(columns) if options.split_direction.endswith("left_to_right") else range(columns - 1, -1, -1)
+    if options.split_direction.startswith("columns_"):
+        cells = [(c, r) for c in order for r in range(rows)]
+    else:
+        cells = [(c, r) for r in range(rows) for c in order]
+    boxes = []
+    for c, r in cells:
+        x0, x1 = span(xs, c, columns, width)
+        y0, y1 = span(ys, r, rows, height)
+        boxes.append((x0, y0, x1, y1))
+    return boxes
+
+
+def _tile_suffixes(count):
+    """出力ファイル名に付ける記号。26枚までは _a, _b, ...、それより多ければ連番。"""
+    if count <= 26:
+        return [chr(ord("a") + i) for i in range(count)]
+    digits = len(str(count))
+    return [f"{i + 1:0{digits}d}" for i in range(count)]
+
+
+def _column_cuts(width, options, image=None, source=None):
+    """横方向の境界位置を返します。左右2分割のときだけノド検出（または共通の位置）を使います。"""
+    if options.columns != 2:
+        return _even_cuts(width, options.columns)
+    return [0, _split_position(width, options, image, source), width]
+
+
+def tile_layout(width, height, options):
+    """width × height の画像を分割したときの [(記号, 切り出し範囲), ...] を読む順に返します（プレビュー用）。
+
+    ノド検出はしないので、検出した位置は options.split_ratio に入れて渡します。無ければ中央で分割します。
+    """
+    if options.split_ratio is None:
+        options = replace(options, split_position="center")
+    boxes = _split_boxes(width, height, _column_cuts(width, options), _even_cuts(height, options.rows), options)
+    return list(zip(_tile_suffixes(len(boxes)), boxes))
+
+
+def _split_position(width, options, image=None, source=None):
+    """分割位置の x 座標を返します。
+
+    ノド検出は読み込み済みの image、なければ source（パスかバイト列）の縮小デコードで行います。
+    """
+    ratio = options.split_ratio
+    if ratio is None and options.split_position == "auto":
+        try:
+            gray = reduced_gray(image) if image is not None else open_reduced(open_source(source))
+            ratio = find_gutter(gray)
+        except (OSError, ValueError):
+            ratio = None  # 検出できないモードなどは中央で分割する
+    if ratio is None:
+        return width // 2
+    return min(max(int(round(width * ratio)), 1), width - 1)
+
+
+def _snap_cuts(cuts, unit, limit, options):
+    """内側の境界を MCU 境界へ寄せます。寄せられない（または寄せない設定の）場合は None を返します。"""
+    snapped = [cuts[0]]
+    for cut in cuts[1:-1]:
+        if cut % unit:
+            if options.mcu_policy != "snap":
+                return None
+            cut = snap_to_mcu(cut, unit, limit)
+            if cut is None or cut <= snapped[-1]:
+                return None
+        snapped.append(cut)
+    snapped.append(cuts[-1])
+    return snapped
+
+
+def _split_jpeg_lossless(image, source, xs, options):
+    """JPEG を MCU 境界で無劣化分割します。できない場合は None を返します。"""
+    width, height = image.size
+    unit_w, unit_h = mcu_size(image)
+    xs = _snap_cuts(xs, unit_w, width, options)
+    ys = _snap_cuts(_even_cuts(height, options.rows), unit_h, height, options)
+    if xs is None or ys is None:
+        return None
+    boxes = _split_boxes(width, height, xs, ys, options)
+    if not all(is_mcu_aligned(box, unit_w, unit_h) for box in boxes):
+        return None
+    return _map_tiles(lambda box: crop_jpeg(options.jpegtran, source, box), boxes, options)
+
+
+def _output_names(image_path, output_folder, options, page=None, pages=0):
+    """出力ファイル名（出力フォルダからの相対）のリストを返します。アーカイブ内の画像はサブフォルダの下の名前にします。
+
+    page を渡すと、ページごとに保存するときの名前（name_p001_a.tif）にします。
+    """
+    file_base, file_ext = os.path.splitext(input_name(image_path))
+    out_ext = OUTPUT_FORMATS[options.output_format][0] if options.output_format else file_ext
+    prefix = ""
+    if isinstance(image_path, ArchiveMember):
+        prefix = image_path.output_dir + "/"
+    if page is not None:
+        file_base = f"{file_base}_p{page:0{max(3, len(str(pages)))}d}"
+    return [f"{prefix}{file_base}_{suffix}{out_ext}" for suffix in _tile_suffixes(options.columns * options.rows)]
+
+
+def _make_output_dirs(output_folder, filenames):
+    """出力ファイルを置くサブフォルダ（アーカイブ内の画像の分）を、ファイルに書く直前に作ります。"""
+    for folder in {os.path.dirname(filename) for filename in filenames}:
+        if folder:
+            os.makedirs(os.path.join(output_folder, folder), exist_ok=True)
+
+
+# 複数フレームのまま保存できる形式（PNG は APNG）
+MULTI_FRAME_FORMATS = ("GIF", "PNG", "TIFF", "WEBP")
+
+
+class _FrameProgress:
+    """複数フレームの画像の進み具合を、間引いてメインプロセスへ送ります。"""
+    def __init__(self, image_path, total, interval=0.2):
+        self.key = input_label(image_path)
+        self.name = input_name(image_path)
+        self.total = total
+        self.interval = interval
+        self.done = 0
+        self._sent = 0.0
+        self._lock = threading.Lock()
+
+    def advance(self):
+        with self._lock:
+            self.done += 1
+            now = time.monotonic()
+            if _frame_events is None or (now - self._sent < self.interval and self.done < self.total):
+                return
+            self._sent = now
+            done = self.done
+        try:
+            _frame_events.put((self.key, self.name, done, self.total))
+        except Exception:
+            pass  # 進捗が届かなくても分割は続ける
+
+
+# 複数フレームの分割で、デコードするスレッドとタイルごとの書き出しスレッドの間に置くフレーム数の上限
+_FRAME_QUEUE_SIZE = 2
+# 書き出しが全フレームを2回たどる形式（APNG は先にモードと大きさを調べる）。フレームをためてから渡す
+_MULTI_PASS_FORMATS = ("PNG",)
+
+
+def _take_frame(frames_queue):
+    """次のフレーム（切り出し済みのタイル）を受け取ります。デコード側の失敗・打ち切りはここで送出します。"""
+    item = frames_queue.get()
+    if isinstance(item, BaseException):
+        raise item
+    return item
+
+
+class _FrameTile(Image.Image):
+    """1タイル分の複数フレーム画像として振る舞う、書き出しスレッド用のビュー。
+
+    フレームはデコードするスレッドがタイルに切り出してキューで渡し、save(save_all=True) が seek() するたびに
+    次の1枚を受け取ります。元画像のデコードは全タイルで1回だけで、受け渡しに持つのはキューの上限の分だけです。
+    """
+    def __init__(self, frames_queue, n_frames, on_frame=None):
+        super().__init__()
+        self._queue = frames_queue
+        self._on_frame = on_frame
+        self.n_frames = n_frames
+        self.is_animated = n_frames > 1
+        self._frame = None
+        self.seek(0)
+
+    def seek(self, frame):
+        if frame == self._frame:
+            return
+        if not 0 <= frame < self.n_frames:
+            raise EOFError("フレームがありません")
+        if self._frame is not None and frame < self._frame:
+            # 保存の最後に元のフレームへ戻す seek（画素はもう読まれないので位置だけ戻す）
+            self._frame = frame
+            return
+        while self._frame != frame:
+            tile, info = _take_frame(self._queue)
+            self._frame = 0 if self._frame is None else self._frame + 1
+            if self._on_frame:
+                self._on_frame()
+        self.im = tile.im
+        self._mode = tile.mode
+        self._size = tile.size
+        self.palette = tile.palette
+        self.info = info  # フレームごとの表示時間などを引き継ぐ
+
+    def tell(self):
+        return self._frame
+
+
+def _put_frame(frames_queue, item, failed):
+    """キューが空くまで待って入れます。書き出しが失敗していたら諦めて False を返します。"""
+    while not failed.is_set():
+        try:
+            frames_queue.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _abort_frames(frames_queue, error):
+    """待っている書き出しスレッドへ error を届けます（キューが一杯なら古いフレームを捨てて入れる）。"""
+    while True:
+        try:
+            frames_queue.put_nowait(error)
+            return
+        except queue.Full:
+            try:
+                frames_queue.get_nowait()
+            except queue.Empty:
+                pass
+
+
+def _split_frames(image, image_path, output_folder, options, stats, frames):
+    """複数フレームの画像（アニメーション GIF / WebP / APNG、複数ページ TIFF）を1フレームずつ分割します。
+
+    frame_mode が "sequence" なら各タイルを複数フレームのまま（表示時間・ループ回数を引き継いで）、
+    "pages" か複数フレームを保存できない形式ならページごとに別ファイルで保存します。
+    出力はこの場でファイルに書き、[(出力ファイル名, None), ...] を返します。
+    """
+    file_ext = os.path.splitext(input_name(image_path))[1]
+    save_format = output_target(file_ext, image.format, options.output_format)[1]
+    tiles = options.columns * options.rows
+    progress = _FrameProgress(image_path, frames * tiles)
+    encoder_options = save_options(save_format, options.profile, image)
+    if options.frame_mode == "sequence" and save_format in MULTI_FRAME_FORMATS:
+        filenames = _output_names(image_path, output_folder, options)
+        _make_output_dirs(output_folder, filenames)
+        # 分割位置は先頭フレームで決め、全フレーム共通にする（タイルの大きさがフレームごとに変わらないように）
+        xs = _column_cuts(image.width, options, image=image)
+        frame_options = replace(options, split_position="center",
+                                split_ratio=xs[1] / image.width if options.columns == 2 else None)
+        encoder_options.update(save_all=True)
+        if "loop" in image.info:
+            encoder_options["loop"] = image.info["loop"]
+        elif save_format == "WEBP" and image.format == "GIF":
+            encoder_options["loop"] = 1  # ループ指定の無い GIF は1回だけ再生
+        if save_format == "WEBP":
+            # WebP の書き出しは表示時間をリストで受け取り、各フレームを受け取った後に duration[i] を読む。
+            # デコードしながら追記すれば、表示時間を知るためだけに全フレームを先読みしなくて済む
+            encoder_options["duration"] = durations = []
+        elif save_format == "PNG":
+            # 各フレームは合成済みの全体像なので、前のフレームに重ねず置き換える（差分は Pillow が取る）
+            encoder_options.update(disposal=0, blend=0)
+        queues = [queue.Queue(maxsize=_FRAME_QUEUE_SIZE) for _ in range(tiles)]
+        failed = threading.Event()
+        errors = []  # 書き出しの失敗（最初のものが原因で、残りは打ち切りによるもの）
+
+        def save_tile(index):
+            path = os.path.join(output_folder, filenames[index])
+            tmp_path = temp_path_for(path)
+            try:
+                if save_format in _MULTI_PASS_FORMATS:
+                    images = []
+                    for _ in range(frames):
+                        images.append(_take_frame(queues[index])[0])
+                        progress.advance()
+                    images[0].save(tmp_path, format=save_format, append_images=images[1:], **encoder_options)
+                else:
+                    _FrameTile(queues[index], frames, progress.advance).save(tmp_path, format=save_format,
+                                                                             **encoder_options)
+                os.replace(tmp_path, path)
+            except BaseException as e:
+                errors.append(e)
+                failed.set()
+                remove_quietly(tmp_path)
+                raise
+            return os.path.getsize(path)
+
+        # タイルの書き出しは全タイル同時に進める（どれかが止まるとデコードも止まるため）。
+        # GIF / APNG の書き出しは差分を取るため Pillow の中で全フレームを持つので、メモリが減るのは WebP / TIFF だけ
+        with stats.stage("encode"), ThreadPoolExecutor(max_workers=tiles,
+                                                       thread_name_prefix="ImageSplitterFrames") as pool:
+            jobs = [pool.submit(save_tile, index) for index in range(tiles)]
+            try:
+                for frame in range(frames):
+                    image.seek(frame)
+                    image.load()
+                    if save_format == "WEBP":
+                        durations.append(image.info.get("duration", 0))
+                    cuts = _column_cuts(image.width, frame_options)
+                    boxes = _split_boxes(image.width, image.height, cuts, _even_cuts(image.height, options.rows), options)
+                    info = dict(image.info)
+                    for frames_queue, box in zip(queues, boxes):
+                        if not _put_frame(frames_queue, (convert_for(image.crop(box), save_format), info), failed):
+                            break
+                    if failed.is_set():
+                        break
+            except BaseException as e:
+                for frames_queue in queues:
+                    _abort_frames(frames_queue, e)
+                raise
+            if failed.is_set():
+                for frames_queue in queues:
+                    _abort_frames(frames_queue, RuntimeError("他のタイルの書き出しに失敗したため中止しました"))
+            wait(jobs)
+        if errors:
+            raise errors[0]
+        stats.bytes_out = sum(job.result() for job in jobs)
+        return [(filename, None) for filename in filenames]
+
+    outputs = []
+    for page in range(frames):
+        with stats.stage("decode"):
+            image.seek(page)
+            image.load()
+        with stats.stage("crop"):
+            xs = _column_cuts(image.width, options, image=image)
+            boxes = _split_boxes(image.width, image.height, xs, _even_cuts(image.height, options.rows), options)
+        with stats.stage("encode"):
+            parts = _map_tiles(lambda box: encode(image.crop(box), save_format, options.profile, image, encoder_options),
+                               boxes, options)
+        filenames = _output_names(image_path, output_folder, options, page=page + 1, pages=frames)
+        with stats.stage("write"):
+            _make_output_dirs(output_folder, filenames)
+            for filename, data in zip(filenames, parts):
+                atomic_write(os.path.join(output_folder, filename), data)
+                stats.bytes_out += len(data)
+        outputs += filenames
+        for _ in range(tiles):
+            progress.advance()
+    return [(filename, None) for filename in outputs]
+
+
+def split_image_parts(image_path, output_folder, options, stats):
+    """単一の画像を分割・エンコードし、[(出力ファイル名, バイト列 or None), ...] を返します。
+
+    バイト列の書き出しは呼び出し側（書き込みステージ）に任せます。
+    低メモリ分割のように、その場でファイルまで書き終えたものはバイト列が None になります。
+    image_path は画像ファイルのパスか ArchiveMember です。アーカイブ内の画像はメモリに読み出して分割し、
+    出力はアーカイブ名（とアーカイブ内のフォルダ）のサブフォルダに置きます（ファイル名もサブフォルダ付きで返します）。
+    """
+    member = image_path if isinstance(image_path, ArchiveMember) else None
+    file_ext = os.path.splitext(input_name(image_path))[1]
+    filenames = _output_names(image_path, output_folder, options)
+
+    reader = None
+    source = image_path  # jpegtran・ノド検出に渡す元データ（パスかバイト列）
+    if member is not None:
+        with stats.stage("open"):
+            source = read_member(member)
+            image = Image.open(io.BytesIO(source))
+        stats.bytes_in = len(source)
+    elif options.stream_min_pixels and file_ext.lower() in STREAM_EXTENSIONS:
+        stats.bytes_in = os.path.getsize(image_path)
+        # 巨大画像はヘッダだけ開いて帯読みに回す。帯読みできなければ通常どおり解凍爆弾チェックをかける
+        with stats.stage("open"):
+            image = open_header(image_path)
+            width, height = image.size
+            same_format = output_target(file_ext, image.format, options.output_format)[1] == image.format
+            single_frame = getattr(image, "n_frames", 1) == 1
+            if width * height >= options.stream_min_pixels and same_format and single_frame:
+                reader = open_strip_reader(image, image_path, options.strip_rows)
+        if reader is None:
+            try:
+                Image._decompression_bomb_check(image.size)
+            except Image.DecompressionBombError as e:
+                # 全体を展開できない大きさなのに帯読みもできない。何が帯読みを妨げているかを添える
+                if not same_format:
+                    why = "出力形式を変えるときは帯読みしません"
+                elif not single_frame:
+                    why = "複数フレームの画像は帯読みしません"
+                else:
+                    why = f"帯読みできない構成です: {strip_reader_error(image, image_path, options.strip_rows)}"
+                image.close()
+                raise ValueError(f"{e}（{why}）") from None
+    else:
+        stats.bytes_in = os.path.getsize(image_path)
+        with stats.stage("open"):
+            image = Image.open(image_path)
+
+    frames = getattr(image, "n_frames", 1) if reader is None and options.frame_mode != "first" else 1
+    stats.frames = frames
+    if frames > 1:
+        with image:
+            return _split_frames(image, image_path, output_folder, options, stats, frames)
+
+    if reader is not None:
+        with image:
+            # 帯読みでは全体を縮小できないため、ノド検出は行わず中央（または共通の位置）で分割する
+            xs = _column_cuts(width, replace(options, split_position="center"))
+            boxes = _split_boxes(width, height, xs, _even_cuts(height, options.rows), options)
+            paths = [os.path.join(output_folder, filename) for filename in filenames]
+            _make_output_dirs(output_folder, filenames)
+            stats.bytes_out = split_streaming(reader, boxes, paths, options.strip_rows, stats,
+                                              level=zlib_level(options.profile))
+        return [(filename, None) for filename in filenames]
+
+    with image:
+        # 無劣化 JPEG: ヘッダだけ読んでデコード／再エンコードを省く
+        parts = None
+        xs = None
+        if (options.jpegtran and file_ext.lower() in JPEG_EXTENSIONS and image.format == "JPEG"
+                and options.output_format in (None, "jpeg")):
+            with stats.stage("crop"):
+                xs = _column_cuts(image.width, options, source=source)
+                parts = _split_jpeg_lossless(image, source, xs, options)
+
+        if parts is None:
+            with stats.stage("decode"):
+                image.load()
+            with stats.stage("crop"):
+                width, height = image.size
+                if xs is None:
+                    xs = _column_cuts(width, options, image=image)
+                boxes = _split_boxes(width, height, xs, _even_cuts(height, options.rows), options)
+            save_format = output_target(file_ext, image.format, options.output_format)[1]
+            encoder_options = save_options(save_format, options.profile, image)
+            with _borrow_slots(_extra_threads(options, len(boxes))) as extra:
+                if extra:
+                    # 空いているコアがあれば、デコード済みの画像からタイルを並列に切り出してエンコードする
+                    # （Pillow はエンコード中 GIL を手放す）。同時に持つ複製はスレッド数までに抑えられる
+                    def encode_tile(box):
+                        return encode(image.crop(box), save_format, options.profile, image, encoder_options)
+
+                    with stats.stage("encode"), ThreadPoolExecutor(max_workers=extra + 1) as pool:
+                        parts = list(pool.map(encode_tile, boxes))
+                else:
+                    parts = []
+                    # 1回のデコード結果から1枚ずつ切り出してはエンコードし、全タイル分の複製を同時に持たない
+                    for box in boxes:
+                        with stats.stage("crop"):
+                            part = image.crop(box)
+                        with stats.stage("encode"):
+                            parts.append(encode(part, save_format, options.profile, image, encoder_options))
+                        del part
+    return list(zip(filenames, parts))
+
+
+def split_image_file(image_path, output_folder, options, stats=None):
+    """単一の画像を分割して保存し、出力ファイル名のリストを返します。失敗時は例外をそのまま送出します。
+
+    stats（SplitStats）を渡すと、工程ごとの時間と入出力バイト数を記録します。
+    """
+    stats = stats or SplitStats()
+    parts = split_image_parts(image_path, output_folder, options, stats)
+    with stats.stage("write"):
+        _make_output_dirs(output_folder, [filename for filename, data in parts if data is not None])
+        for filename, data in parts:
+            if data is not None:
+                atomic_write(os.path.join(output_folder, filename), data)
+                stats.bytes_out += len(data)
+    return [filename for filename, _ in parts]
+
+
+def _split_task(image_path, output_folder, options):
+    """ワーカープロセスで実行されるタスク。結果（計測値・未書き込みのバイト列を含む）を辞書で返します。"""
+    with _borrow_slots(1):  # 自分の分の枠（取れなくても処理は進める）
+        return _run_split_task(image_path, output_folder, options)
+
+
+def _run_split_task(image_path, output_folder, options):
+    stats = SplitStats()
+    result = {"path": input_label(image_path), "error": None, "error_stage": None, "outputs": [], "parts": [], "hash": None,
+              "cached": False, "frames": 1}
+    try:
+        if options.hash_input or options.cache_dir:
+            result["hash"] = file_digest(image_path)
+        cache = key = None
+        if options.cache_dir:
+            # 同じ内容・同じ設定の結果があれば、分割せずにキャッシュから出力を置く
+            filenames = _output_names(image_path, output_folder, options)
+            cache = ResultCache(options.cache_dir)
+            params = options.signature()
+            frames = input_frame_count(image_path) if options.frame_mode != "first" else 1
+            if frames > 1:
+                # 複数フレームの入力だけキーを分ける（先頭フレームだけを分割していた頃のエントリは使わない）
+                params["frames"] = frames
+            key = cache_key(result["hash"], params, os.path.splitext(filenames[0])[1])
+            with stats.stage("write"):
+                _make_output_dirs(output_folder, filenames)
+                if cache.materialize(key, [os.path.join(output_folder, filename) for filename in filenames]):
+                    result.update(outputs=filenames, cached=True, frames=frames)
+                    stats.bytes_in = input_stat(image_path).st_size
+        if not result["cached"]:
+            parts = split_image_parts(image_path, output_folder, options, stats)
+            result["outputs"] = [filename for filename, _ in parts]
+            result["parts"] = [(filename, data) for filename, data in parts if data is not None]
+            result["frames"] = stats.frames
+            # ページごとの保存では出力の数が入力によって変わるので、キャッシュには入れない
+            if cache is not None and result["outputs"] == filenames:
+                try:
+                    cache.store(key, [(data, os.path.join(output_folder, filename)) for filename, data in parts])
+                except OSError:
+                    pass  # キャッシュに保存できなくても分割結果はそのまま使う
+    except Exception as e:
+        result["error"] = str(e)
+        result["error_stage"] = stats.current_stage
+    result.update(stage_ms=stats.stage_ms, bytes_in=stats.bytes_in, bytes_out=stats.bytes_out)
+    return result
+
+
+def _scan_tree(top, exclude=frozenset()):
+    """os.scandir でフォルダを深さ優先にたどり、画像ファイルをフォルダごとに yield します。
+
+    フォルダ内のファイルもサブフォルダも名前の自然順（読む順）に並べるので、順序はファイルシステムによりません。
+    exclude（realpath の集合）に入っているフォルダの中は探しません。
+    """
+    stack = [top]
+    while stack:
+        folder = stack.pop()
+        subfolders = []
+        files = []
+        try:
+            with os.scandir(folder) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            if entry.name != OUTPUT_FOLDER_NAME and not (exclude and os.path.realpath(entry.path) in exclude):
+                                subfolders.append(entry.name)
+                        elif entry.name.lower().endswith(SUPPORTED_EXTENSIONS + ARCHIVE_EXTENSIONS) and entry.is_file():
+                            files.append(entry.path)
+                    except OSError:
+                        continue
+        except OSError:
+            continue  # os.walk と同じく読めないフォルダは飛ばす
+        files.sort(key=lambda path: natural_key(os.path.basename(path)))
+        yield from files
+        # サブフォルダも名前の自然順にたどる（os.scandir の順序はファイルシステム次第なので並べ替える）
+        subfolders.sort(key=natural_key)
+        # 先頭のフォルダから取り出されるよう、逆順に積む
+        stack.extend(os.path.join(folder, name) for name in reversed(subfolders))
+
+
+def _output_group(image_path):
+    """書庫出力でのまとめ先 (キー, 書庫の名前)。
+
+    キーは入力アーカイブ、またはファイルのあるフォルダの絶対パスなので、同じ名前の別フォルダはまとめません。
+    """
+    if isinstance(image_path, ArchiveMember):
+        return os.path.abspath(image_path.archive), image_path.output_subfolder
+    folder = os.path.dirname(os.path.abspath(image_path))
+    return folder, os.path.basename(folder) or "pages"
+
+
+def _archive_entry_name(image_path, filename):
+    """書庫内の名前（出力フォルダからの名前から、アーカイブ名のサブフォルダを除いたもの）。"""
+    if isinstance(image_path, ArchiveMember):
+        return filename[len(image_path.output_subfolder) + 1:]
+    return filename
+
+
+def _expand_archive(path):
+    """ZIP / CBZ なら中の画像を ArchiveMember で、それ以外はパスをそのまま yield します。"""
+    if not is_archive(path):
+        yield path
+        return
+    try:
+        members = list(iter_archive_members(path))
+    except (OSError, zipfile.BadZipFile):
+        yield path  # 壊れたアーカイブは分割時のエラーとして報告する
+        return
+    yield from members
+
+
+def iter_image_files(items, exclude=()):
+    """指定されたパスから画像ファイル（アーカイブ内の画像を含む）を再帰的に探し、見つけ次第 yield します。
+
+    exclude には探さないフォルダ（入力フォルダの中に置いた出力先など）を渡します。
+    """
+    exclude = {os.path.realpath(folder) for folder in exclude}
+    for item in items:
+        if not item:
+            continue
+        if os.path.isdir(item):
+            for path in _scan_tree(item, exclude):
+                yield from _expand_archive(path)
+        elif os.path.isfile(item) and item.lower().endswith(SUPPORTED_EXTENSIONS + ARCHIVE_EXTENSIONS):
+            yield from _expand_archive(item)
+
+
+class _FileDiscovery(threading.Thread):
+    """画像ファイルを探索し、上限付きのキューへ流し込むプロデューサースレッド。"""
+    _END = object()
+
+    def __init__(self, items, queue_size, exclude=()):
+        super().__init__(daemon=True)
+        self._items = list(items)
+        self._exclude = list(exclude)
+        self._queue = queue.Queue(maxsize=max(1, queue_size))
+        self._stopped = threading.Event()
+        self.found = 0          # これまでに見つかった件数
+        self.finished = False   # 探索が最後まで終わったか
+        self._ended = False     # 終端を受け取ったか
+
+    def run(self):
+        try:
+            for image_path in iter_image_files(self._items, self._exclude):
+                if not self._put(image_path):
+                    return
+                self.found += 1
+        finally:
+            self.finished = True
+            self._put(self._END)
+
+    def _put(self, item):
+        """キューが空くまで待って入れます。stop() されたら諦めて False を返します。"""
+        while not self._stopped.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def stop(self):
+        """探索を打ち切ります（キャンセル時・処理の終了時）。"""
+        self._stopped.set()
+
+    def get(self, poll=None, interval=0.05):
+        """次のファイルパスを返します。探索が終わったか stop() されていれば None。待つ間は poll を呼び続けます。"""
+        if self._ended or self._stopped.is_set():
+            return None
+        while True:
+            try:
+                item = self._queue.get(timeout=interval if poll else None)
+            except queue.Empty:
+                poll()
+                if self._stopped.is_set():
+                    return None  # poll の中でキャンセルされた
+                continue
+            if item is self._END:
+                self._ended = True
+                return None
+            return item
+
+
+class _InlineExecutor:
+    """ワーカー数1のときに使う、呼び出しスレッドでそのまま実行するExecutor。"""
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def submit(self, fn, *args, **kwargs):
+        future = Future()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except BaseException as e:
+            future.set_exception(e)
+        return future
+
+    def shutdown(self, wait=True):
+        pass
+
 
 class ImageProcessor:
     """画像処理のロジックを担当するクラス"""
-    def __init__(self, progress_callback=None, status_callback=None, done_callback=None):
+    def __init__(self, progress_callback=None, status_callback=None, done_callback=None, workers=None,
+                 lossless_jpeg=False, mcu_policy="snap", queue_size=1024, incremental=True, verify_hash=False,
+                 metrics_sink=None, low_memory_pixels=100_000_000, strip_rows=256,
+                 write_workers=4, write_buffer_mb=256, progress_interval=0.25, split_position="center",
+                 book_sample=5, columns=2, rows=1, margin=0, profile="default", output_format=None,
+                 archive_output=None, archive_compression="stored", cache_dir=None, cache_max_mb=2048,
+                 largest_first=False, tile_threads=0, frame_mode="sequence"):
         self.progress_callback = progress_callback
         self.status_callback = status_callback
         self.done_callback = done_callback
+        # 並列ワーカー数（None のときは CPU コア数）
+        self.workers = workers
+        # JPEG を jpegtran で無劣化分割するか
+        self.lossless_jpeg = lossless_jpeg
+        self.mcu_policy = mcu_policy
+        # 探索スレッドから分割処理へ渡す待ち行列の上限
+        self.queue_size = queue_size
+        # 処理記録を見て、変更のないファイルをスキップするか（ハッシュでも照合するか）
+        self.incremental = incremental
+        self.verify_hash = verify_hash
+        # 工程別の計測レコードの受け口（metrics.MetricsSink）
+        self.metrics_sink = metrics_sink
+        # この画素数以上の PNG / TIFF は帯単位の低メモリ分割にする（0 / None で無効）と、その帯の行数
+        self.low_memory_pixels = low_memory_pixels
+        self.strip_rows = strip_rows
+        # 書き込みステージのスレッド数と、書き込み待ちバッファの上限
+        self.write_workers = write_workers
+        self.write_buffer_bytes = int(write_buffer_mb * 1024 * 1024)
+        # 進捗／ステータスをまとめて通知する間隔（秒）
+        self.progress_interval = progress_interval
+        # 分割位置: "center" / "auto"（ページごとにノド検出）/ "book"（先頭 book_sample ページで検出した位置を全ページに使う）
+        self.split_position = split_position
+        self.book_sample = book_sample
+        # 横 columns × 縦 rows のタイルに分割し、内側の境界を margin ピクセルだけ重ねる（負なら削る）
+        self.columns = columns
+        self.rows = rows
+        self.margin = margin
+        # エンコード設定（"default" / "fast" / "archival" / "match"）と出力形式（None なら入力と同じ）
+        self.profile = profile
+        self.output_format = output_format
+        # 出力をばらのファイルではなく、入力フォルダ／アーカイブごとの書庫にまとめる（None / "zip" / "cbz"）と、
+        # その圧縮方式（"stored" / "deflated"）
+        self.archive_output = archive_output
+        self.archive_compression = archive_compression
+        # 内容が同じ入力の分割結果を使い回すキャッシュのフォルダ（None で無効）と、その合計サイズの上限
+        self.cache_dir = cache_dir
+        self.cache_max_bytes = int(cache_max_mb * 1024 * 1024)
+        # 探索を最後まで終えてからヘッダだけ読んで見積もり、重いファイルから処理する（出力先の空き容量も先に確かめる）
+        self.largest_first = largest_first
+        # 1枚のタイルを並列にエンコードするスレッド数の上限（0 ならタイル数まで、1 で無効）
+        self.tile_threads = tile_threads
+        # 複数フレームの扱い（"sequence" は複数フレームのまま / "pages" はページごと / "first" は先頭フレームだけ）
+        self.frame_mode = frame_mode
 
-    def _split_one_image(self, image_path, split_direction, output_folder):
-        """単一の画像を分割して保存します。"""
+    def _build_options(self, split_direction):
+        """現在の設定から SplitOptions を組み立てます。"""
+        jpegtran = None
+        if self.lossless_jpeg:
+            jpegtran = find_jpegtran()
+            if not jpegtran and self.status_callback:
+                self.status_callback("jpegtran が見つからないため、JPEG は再エンコードで分割します。")
+        split_position = "center"
+        if self.split_position in ("auto", "book") and self.columns == 2:  # ノド検出は左右2分割のときだけ
+            if gutter_available():
+                split_position = "auto"
+            elif self.status_callback:
+                self.status_callback("NumPy が見つからないため、ノド検出はせず中央で分割します。")
+        return SplitOptions(split_direction=split_direction, jpegtran=jpegtran, mcu_policy=self.mcu_policy,
+                            hash_input=self.verify_hash, cache_dir=self._cache_folder(), stream_min_pixels=self.low_memory_pixels or 0,
+                            strip_rows=max(1, self.strip_rows), split_position=split_position,
+                            columns=max(1, self.columns), rows=max(1, self.rows), margin=self.margin,
+                            profile=self.profile, output_format=self.output_format or None,
+                            tile_threads=self.tile_threads, frame_mode=self.frame_mode)
+
+    def _cache_folder(self):
+        """使えるキャッシュフォルダを返します。書庫出力では使いません（出力がファイルとして残らないため）。"""
+        if not self.cache_dir or self.archive_output:
+            return None
         try:
-            with Image.open(image_path) as image:
-                width, height = image.size
-                half_width = width // 2
-
-                if split_direction == "left_to_right":
-                    part_a = image.crop((0, 0, half_width, height))
-                    part_b = image.crop((half_width, 0, width, height))
-                else:  # right_to_left
-                    part_a = image.crop((half_width, 0, width, height))
-                    part_b = image.crop((0, 0, half_width, height))
-
-                file_base, file_ext = os.path.splitext(os.path.basename(image_path))
-                filename_a = f"{file_base}_a{file_ext}"
-                filename_b = f"{file_base}_b{file_ext}"
-
-                part_a.save(os.path.join(output_folder, filename_a))
-                part_b.save(os.path.join(output_folder, filename_b))
-        except Exception as e:
+            os.makedirs(self.cache_dir, exist_ok=True)
+        except OSError as e:
             if self.status_callback:
-                self.status_callback(f"エラー: {os.path.basename(image_path)} - {e}")
+                self.status_callback(f"キャッシュフォルダを作れないため、キャッシュは使いません: {e}")
+            return None
+        return os.path.abspath(self.cache_dir)
+
+    def _book_options(self, options, sample_paths):
+        """先頭のページでノドを検出し、その中央値を全ページ共通の分割位置にした SplitOptions を返します。"""
+        if options.split_position != "auto":
+            return options
+        ratios = []
+        for path in sample_paths:
+            try:
+                source = read_member(path) if isinstance(path, ArchiveMember) else path
+                ratio = find_gutter(open_reduced(open_source(source)))
+            except (OSError, ValueError, zipfile.BadZipFile):
+                ratio = None
+            if ratio is not None:
+                ratios.append(ratio)
+        if not ratios:
+            if self.status_callback:
+                self.status_callback("ノドを検出できなかったため、中央で分割します。")
+            return replace(options, split_position="center")
+        ratio = statistics.median(ratios)
+        if self.status_callback:
+            self.status_callback(f"ノドの位置: 中央から {ratio - 0.5:+.1%}（先頭 {len(sample_paths)} ページ中 "
+                                 f"{len(ratios)} ページで検出）")
+        return replace(options, split_position="center", split_ratio=ratio)
+
+    def _worker_count(self):
+        return max(1, self.workers or os.cpu_count() or 1)
+
+    def _create_executor(self):
+        """ワーカー数に応じてプロセスプール、または逐次実行のExecutorを返します。"""
+        workers = self._worker_count()
+        cpus = os.cpu_count() or 1
+        if workers == 1:
+            # 逐次実行でも、空いているコアはタイルの並列エンコードに使う
+            executor = _InlineExecutor()
+            executor.frame_events = queue.Queue()
+            _init_worker(threading.BoundedSemaphore(cpus), executor.frame_events)
+            return executor
+        # プロセスは投入に応じて起動されるので、ファイル数が少なくても無駄に立ち上がらない
+        # タイルの並列エンコードがコア数を超えないよう、CPU の枠を全ワーカーで共有する
+        # 複数フレームの画像の進み具合はキューで受け取る（ProgressReporter が読む）
+        frame_events = multiprocessing.Queue()
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_pool_worker,
+                                       initargs=(multiprocessing.BoundedSemaphore(cpus), frame_events))
+        executor.frame_events = frame_events
+        return executor
+
+    def _split_one_image(self, image_path, split_direction, output_folder):
+        """単一の画像を分割して保存します。"""
+        result = _split_task(image_path, output_folder, self._build_options(split_direction))
+        if not result["error"]:
+            stats = SplitStats()
+            try:
+                with stats.stage("write"):
+                    parts = result.pop("parts")
+                    _make_output_dirs(output_folder, [filename for filename, _ in parts])
+                    for filename, data in parts:
+                        atomic_write(os.path.join(output_folder, filename), data)
+                        result["bytes_out"] += len(data)
+            except Exception as e:
+                result.update(error=str(e), error_stage="write")
+            result["stage_ms"]["write"] = stats.stage_ms.get("write", 0.0)
+        self._record_metrics(result)
+        if result["error"] and self.status_callback:
+            self.status_callback(f"エラー: {input_name(image_path)} - {result['error']}")
+
+    def _record_metrics(self, result, skipped=False):
+        """1ファイル分の計測レコードを metrics_sink へ渡します。"""
+        if self.metrics_sink is None:
+            return
+        if skipped:
+            self.metrics_sink.record({"path": result["path"], "skipped": True})
+            return
+        error = None
+        if result["error"]:
+            error = {"path": result["path"], "stage": result.get("error_stage"), "message": result["error"]}
+        self.metrics_sink.record({
+            "path": result["path"],
+            "ok": error is None,
+            "stage_ms": result.get("stage_ms", {}),
+            "bytes_in": result.get("bytes_in", 0),
+            "bytes_out": result.get("bytes_out", 0),
+            "outputs": result.get("outputs", []),
+            "cached": result.get("cached", False),
+            "error": error,
+        })
 
-    def _find_image_files(self, items):
+    def _find_image_files(self, items, exclude=()):
         """指定されたパスから画像ファイルのリストを再帰的に検索します。"""
-        image_files = []
-        for item in items:
-            if not item:
-                continue
-            if os.path.isdir(item):
-                for root, _, files in os.walk(item):
-                    for file in files:
-                        if file.lower().endswith(SUPPORTED_EXTENSIONS):
-                            image_files.append(os.path.join(root, file))
-            elif os.path.isfile(item) and item.lower().endswith(SUPPORTED_EXTENSIONS):
-                image_files.append(item)
-        return image_files
-
-    def process_images(self, items, split_direction):
-        """指定されたアイテム（ファイル/フォルダ）の画像処理を開始します。"""
+        return list(iter_image_files(items, exclude))
+
+    @staticmethod
+    def _default_output_folder(first_path):
+        """最初に見つかった画像（アーカイブ内ならアーカイブ）と同じ階層の half/ を返します。"""
+        first_file = first_path.archive if isinstance(first_path, ArchiveMember) else first_path
+        return os.path.join(os.path.dirname(first_file) or ".", OUTPUT_FOLDER_NAME)
+
+    def _plan(self, paths, options, output_folder, manifest):
+        """ヘッダだけ読んで見積もった Plan を返します。処理記録で最新のものは見積もりから外します。"""
+        frame_count = _legacy_frame_count(options)
+        skip_fn = ((lambda path, stat: manifest.is_up_to_date(path, stat, options.signature(), frame_count))
+                   if manifest is not None else None)
+        # 書庫出力は読む順に投入するので並べ替えない（見積もりと空き容量の確認だけ行う）
+        return build_plan(paths, options, output_folder, self._worker_count(), skip_fn=skip_fn,
+                          largest_first=not self.archive_output)
+
+    def plan(self, items, split_direction, output_folder=None):
+        """分割はせずに見積もりだけ行い、処理順に並べた報告を辞書で返します（ドライラン）。"""
+        paths = self._find_image_files(items, [output_folder] if output_folder else ())
+        if not paths:
+            return None
+        if output_folder is None:
+            output_folder = self._default_output_folder(paths[0])
+        options = self._build_options(split_direction)
+        manifest = None
+        if self.incremental and not self.archive_output and os.path.isdir(output_folder):
+            manifest = SplitManifest(output_folder)  # 読むだけ（ハッシュ照合はしないので書き込まない）
+        return self._plan(paths, options, output_folder, manifest).report()
+
+    def process_images(self, items, split_direction, output_folder=None, executor=None, control=None):
+        """指定されたアイテム（ファイル/フォルダ）の画像処理を開始し、集計結果を辞書で返します。
+
+        output_folder を省略すると、最初に見つかった画像と同じ階層の half/ に出力します。
+        executor を渡すとそれを使い回し（終了時に閉じない）、control（scheduler.JobControl）を渡すと
+        ファイルの切れ目ごとに一時停止／キャンセルを確認します。
+        """
+        started = time.perf_counter()
+        summary = {"found": 0, "processed": 0, "skipped": 0, "errors": [], "output_folder": None, "elapsed_s": 0.0,
+                   "cancelled": False}
+        cache_hits = cache_misses = 0
         if self.status_callback:
             self.status_callback("ファイルリストを作成中...")
 
-        image_files_to_process = self._find_image_files(items)
+        # 探索は別スレッドで進め、見つかった順に分割を始める
+        # 出力先を入力フォルダの中に指定されても、出力した画像を入力として拾わない
+        discovery = _FileDiscovery(items, self.queue_size, [output_folder] if output_folder else ())
+        discovery.start()
 
-        if not image_files_to_process:
-            if self.status_callback:
+        def cancelled():
+            """キャンセルされていれば探索を止めて True を返します（ネットワーク共有などで探索を待つ間も確かめる）。"""
+            if control is not None and control.cancelled:
+                discovery.stop()
+                return True
+            return False
+
+        first_path = discovery.get(poll=cancelled)
+        if first_path is None:
+            summary["cancelled"] = cancelled()
+            if self.status_callback and not summary["cancelled"]:
                 self.status_callback("対象の画像ファイルが見つかりません。")
             if self.done_callback:
                 self.done_callback(False)
-            return
+            return summary
 
-        total_files = len(image_files_to_process)
-        base_folder = os.path.dirname(image_files_to_process[0]) or "."
-        output_folder = os.path.join(base_folder, "half")
+        if output_folder is None:
+            output_folder = self._default_output_folder(first_path)
         os.makedirs(output_folder, exist_ok=True)
-
-        for index, image_path in enumerate(image_files_to_process, start=1):
+        summary["output_folder"] = os.path.abspath(output_folder)
+        options = self._build_options(split_direction)
+        head = [first_path]
+        if self.split_position == "book":
+            # 先頭の数ページを先取りしてノドを検出し、同じ位置で本全体を分割する
+            while len(head) < max(1, self.book_sample):
+                image_path = discovery.get(poll=cancelled)
+                if image_path is None:
+                    break
+                head.append(image_path)
+            options = self._book_options(options, head)
+        # 書庫出力は毎回まとめ直すので、処理記録によるスキップは使わない
+        use_manifest = self.incremental and not self.archive_output
+        manifest = SplitManifest(output_folder, use_hash=self.verify_hash) if use_manifest else None
+        frame_count = _legacy_frame_count(options)
+        if self.largest_first:
+            # 探索を最後まで待ち、ヘッダだけ読んで重い順に並べ替える
+            if self.status_callback:
+                self.status_callback("ファイルの大きさを見積もり中...")
+            while (image_path := discovery.get(poll=cancelled)) is not None:
+                head.append(image_path)
+        if self.largest_first and not cancelled():
+            plan = self._plan(head, options, output_folder, manifest)
+            summary["plan"] = plan.summary()
             if self.status_callback:
-                self.status_callback(f"処理中 ({index}/{total_files}): {os.path.basename(image_path)}")
+                free_text = f"（空き {plan.free_bytes / 1e6:,.0f} MB）" if plan.free_bytes is not None else ""
+                self.status_callback(f"見積もり: {len(head)}件、所要 約{format_duration(plan.est_wall_s)}、"
+                                     f"出力 約{plan.output_bytes / 1e6:,.0f} MB{free_text}")
+            if not plan.enough_space:
+                error = (f"出力先の空き容量が足りません（必要 約{plan.output_bytes / 1e6:,.0f} MB / "
+                         f"空き {plan.free_bytes / 1e6:,.0f} MB）")
+                summary["errors"].append({"path": summary["output_folder"], "error": error})
+                summary["found"] = discovery.found
+                if manifest is not None:
+                    manifest.close()
+                if self.status_callback:
+                    self.status_callback(f"エラー: {error}")
+                if self.done_callback:
+                    self.done_callback(False)
+                return summary
+            head = [entry.item for entry in plan.entries]
+            first_path = head[0]
+        max_in_flight = self._worker_count() * 2
+
+        # 計算（分割・エンコード）はワーカー、書き込みは AsyncWriter（または ArchiveWriter）のスレッドで進める
+        # 完了の集計はこのスレッドで行い、進捗／ステータスは ProgressReporter が一定間隔でまとめて通知する
+        if self.archive_output:
+            writer = ArchiveWriter(output_folder, "." + self.archive_output, self.archive_compression)
+        else:
+            writer = AsyncWriter(self.write_workers, self.write_buffer_bytes)
+        archive = writer if self.archive_output else None
+        sequence = itertools.count()
+        reporter = ProgressReporter(self.progress_callback, self.status_callback,
+                                    total_fn=lambda: (discovery.found, discovery.finished),
+                                    interval=self.progress_interval)
+        reporter.start()
+        owned = self._create_executor() if executor is None else contextlib.nullcontext(executor)
+        with owned as executor:
+            reporter.watch_frames(getattr(executor, "frame_events", None))
+            pending = {}   # 計算中: Future → (パス, stat, 投入順の番号)
+            writing = {}   # 書き込み中: Future → (パス, stat, 結果)
+
+            def finish(image_path, stat, result):
+                nonlocal cache_hits, cache_misses
+                error = result["error"]
+                self._record_metrics(result)
+                if error:
+                    summary["errors"].append({"path": input_label(image_path), "error": error})
+                else:
+                    summary["processed"] += 1
+                    if options.cache_dir:
+                        if result.get("cached"):
+                            cache_hits += 1
+                        else:
+                            cache_misses += 1
+                    if manifest is not None and stat:
+                        manifest.record(image_path, stat, options.signature(), result["outputs"], result["hash"],
+                                        result.get("frames", 1))
+                reporter.update(input_name(image_path), result.get("bytes_in", 0), error, cached=result.get("cached", False),
+                                key=input_label(image_path))
+
+            def harvest(timeout):
+                done, _ = wait(list(pending) + list(writing), timeout=timeout, return_when=FIRST_COMPLETED)
+                for future in done:
+                    if future in pending:
+                        image_path, stat, seq = pending.pop(future)
+                        try:
+                            result = future.result()
+                        except Exception as e:  # ワーカープロセスの異常終了など
+                            result = {"path": input_label(image_path), "error": str(e), "error_stage": "worker"}
+                        parts = result.pop("parts", None)
+                        if archive is not None:
+                            if result["error"]:
+                                archive.skip(seq)
+                                finish(image_path, stat, result)
+                            else:
+                                # 帯単位で書き出し済みの分（バイト列なし）も書庫へ移す
+                                data = dict(parts or [])
+                                items = [(filename, _archive_entry_name(image_path, filename), data.get(filename))
+                                         for filename in result["outputs"]]
+                                writing[archive.submit(seq, _output_group(image_path), items)] = (image_path, stat, result)
+                        elif result["error"] or not parts:
+                            finish(image_path, stat, result)
+                        else:
+                            # 書き込み待ちのバッファが上限を超えていれば、ここで空くまで待つ
+                            _make_output_dirs(output_folder, [filename for filename, _ in parts])
+                            items = [(os.path.join(output_folder, filename), data) for filename, data in parts]
+                            writing[writer.submit(items)] = (image_path, stat, result)
+                    else:
+                        image_path, stat, result = writing.pop(future)
+                        try:
+                            written, write_ms = future.result()
+                            result["bytes_out"] += written
+                            result["stage_ms"]["write"] = round(write_ms, 3)
+                        except Exception as e:
+                            result.update(error=str(e), error_stage="write")
+                        finish(image_path, stat, result)
+
+            # 先取りした分と、一時停止で取り下げた分（先に投入する）。取り下げた分は投入順の番号を引き継ぐ
+            deferred = [(path, None) for path in head[1:]]
+
+            def withdraw():
+                """ワーカーがまだ手を付けていない投入を取り消し、(パス, 番号) を返します。"""
+                withdrawn = []
+                for future in list(pending):
+                    if future.cancel():
+                        image_path, _, seq = pending.pop(future)
+                        withdrawn.append((image_path, seq))
+                return withdrawn
+
+            def cancel_rest():
+                """探索を止め、ワーカーがまだ手を付けていない分を取り消します（実行中の分は最後まで待つ）。"""
+                summary["cancelled"] = True
+                discovery.stop()
+                for _, seq in withdraw() + deferred:
+                    if archive is not None and seq is not None:
+                        archive.skip(seq)
+                deferred.clear()
+
+            def poll():
+                """探索を待つ間に、完了分の集計とキャンセルの確認をします。"""
+                if pending or writing:
+                    harvest(0)
+                cancelled()
+
+            def should_stop():
+                """一時停止中は実行中の分だけ集計しながら待ち、キャンセルされていれば True を返します。"""
+                if control is None:
+                    return False
+                if control.paused and not control.cancelled:
+                    deferred[:0] = withdraw()
+                    reporter.paused = True
+                    while control.paused and not control.cancelled:
+                        if pending or writing:
+                            harvest(0.1)
+                        else:
+                            control.wait_resumed(0.1)
+                    reporter.paused = False
+                return control.cancelled
 
-            self._split_one_image(image_path, split_direction, output_folder)
+            try:
+                image_path, seq = first_path, None
+                while image_path is not None:
+                    if should_stop():
+                        # 手にしている分（一時停止で取り下げた番号付きのもの）も取り消しに含める
+                        deferred.insert(0, (image_path, seq))
+                        break
+                    stat = input_stat(image_path)
+                    if manifest is not None and stat and manifest.is_up_to_date(image_path, stat, options.signature(), frame_count):
+                        summary["skipped"] += 1
+                        self._record_metrics({"path": input_label(image_path)}, skipped=True)
+                        reporter.update(input_name(image_path), skipped=True, key=input_label(image_path))
+                    else:
+                        future = executor.submit(_split_task, image_path, output_folder, options)
+                        pending[future] = (image_path, stat, next(sequence) if seq is None else seq)
+                        # 投入数を絞り、探索待ちの間も完了分を報告する（書庫出力では並べ替え待ちが溜まりすぎないようにする）
+                        busy = len(pending) >= max_in_flight
+                        if archive is not None:
+                            busy = busy or archive.waiting >= max_in_flight * 4
+                        harvest(None if busy else 0)
+                    if deferred:
+                        image_path, seq = deferred.pop(0)
+                    else:
+                        image_path, seq = discovery.get(poll=poll), None
 
-            if self.progress_callback:
-                progress_value = index / total_files
-                self.progress_callback(progress_value)
+                if cancelled():
+                    cancel_rest()
+                while pending or writing:
+                    # 残りを待つ間もキャンセルを受け付ける
+                    if not summary["cancelled"] and cancelled():
+                        cancel_rest()
+                    harvest(None if summary["cancelled"] or control is None else 0.1)
+            finally:
+                # 例外で抜けたときも、キューの空きを待っている探索スレッドを止める
+                discovery.stop()
+                writer.close()
+                reporter.stop()
+                if manifest is not None:
+                    manifest.close()
 
+        summary["found"] = discovery.found
+        if options.cache_dir:
+            entries, cache_bytes = ResultCache(options.cache_dir).evict(self.cache_max_bytes)
+            lookups = cache_hits + cache_misses
+            hit_rate = cache_hits / lookups if lookups else 0.0
+            summary["cache"] = {"hits": cache_hits, "misses": cache_misses, "hit_rate": round(hit_rate, 4),
+                                "entries": entries, "bytes": cache_bytes}
+            if self.status_callback and lookups:
+                self.status_callback(f"キャッシュ: {lookups}件中 {cache_hits}件ヒット（{hit_rate:.0%}）、"
+                                     f"保存 {entries}件 {cache_bytes / 1e6:.1f} MB")
+        if archive is not None:
+            summary["archives"] = list(archive.archives)
+        summary["elapsed_s"] = round(time.perf_counter() - started, 3)
         if self.done_callback:
-            self.done_callback(True)
+            self.done_callback(not summary["cancelled"])
+        return summary
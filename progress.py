@@ -0,0 +1,134 @@
+import queue, threading, time
+
+# 進捗の集約: 1ファイルごとにコールバックを呼ぶ代わりに、一定間隔でまとめて通知する
+
+
+def format_duration(seconds):
+    """秒数を H:MM:SS にします。"""
+    seconds = int(max(0, seconds))
+    return f"{seconds // 3600}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+
+
+class ProgressReporter:
+    """完了件数・バイト数・エラー数を集計し、interval 秒ごとに progress / status コールバックへ流します。
+
+    total_fn は (見つかった件数, 探索が終わったか) を返す関数です。
+    """
+    def __init__(self, progress_callback=None, status_callback=None, total_fn=None, interval=0.25):
+        self.progress_callback = progress_callback
+        self.status_callback = status_callback
+        self.total_fn = total_fn or (lambda: (0, False))
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.done = 0
+        self.skipped = 0
+        self.cached = 0
+        self.errors = 0
+        self.bytes_in = 0
+        self.last_name = ""
+        self.last_error = ""
+        self.paused = False     # 一時停止中は見出しを切り替える
+        self.partial = {}       # 処理中の複数フレームの画像: 入力のパス → (ファイル名, 済んだフレーム数, 全フレーム数)
+        self._frame_events = None
+        self._started = None
+
+    def start(self):
+        self._started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="ImageSplitterProgress", daemon=True)
+        self._thread.start()
+
+    def watch_frames(self, events):
+        """ワーカーから届くフレーム単位の進み具合のキュー（(入力のパス, ファイル名, 済んだ数, 全体の数)）を読むようにします。"""
+        if events is not None:
+            self._drain(events)  # 前のジョブの分は捨てる
+            with self._lock:
+                self.partial.clear()
+        self._frame_events = events
+
+    def _drain(self, events):
+        while True:
+            try:
+                key, name, done, total = events.get_nowait()
+            except (queue.Empty, OSError, ValueError):
+                return
+            with self._lock:
+                self.partial[key] = (name, done, total)
+
+    def update(self, name, bytes_in=0, error=None, skipped=False, cached=False, key=None):
+        """1ファイル分の完了を記録します（コールバックは呼びません）。cached はキャッシュから出力した分。
+
+        key は入力のパス（別フォルダの同じ名前のファイルを区別するため。省略すると name）。
+        """
+        with self._lock:
+            self.partial.pop(name if key is None else key, None)
+            self.done += 1
+            self.bytes_in += bytes_in
+            self.last_name = name
+            if skipped:
+                self.skipped += 1
+            if cached:
+                self.cached += 1
+            if error:
+                self.errors += 1
+                self.last_error = f"{name} - {error}"
+
+    def stop(self):
+        """ティッカーを止め、最終状態を1回通知します。"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self._emit()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._emit()
+
+    def snapshot(self):
+        """現在の集計値を辞書で返します。"""
+        found, finished = self.total_fn()
+        with self._lock:
+            done, skipped, cached, errors, bytes_in = self.done, self.skipped, self.cached, self.errors, self.bytes_in
+            last_name, last_error = self.last_name, self.last_error
+            partial = [value for value in self.partial.values() if value[1] < value[2]]
+        elapsed = time.perf_counter() - (self._started or time.perf_counter())
+        total = max(found, done)
+        processed = done - skipped
+        files_per_s = processed / elapsed if elapsed > 0 else 0.0
+        eta = None
+        if finished and files_per_s > 0:
+            eta = (total - done) / files_per_s
+        return {
+            "done": done, "total": total, "finished": finished, "skipped": skipped, "cached": cached, "errors": errors,
+            "elapsed_s": elapsed, "eta_s": eta, "files_per_s": files_per_s,
+            "mb_per_s": bytes_in / 1e6 / elapsed if elapsed > 0 else 0.0,
+            "last_name": last_name, "last_error": last_error,
+            # 処理中の複数フレームの画像の進み具合（ファイル1件を 1 とした割合の合計）と、その内訳
+            "partial": sum(d / t for _, d, t in partial), "frames": partial,
+        }
+
+    def _emit(self):
+        if self._frame_events is not None:
+            self._drain(self._frame_events)
+        s = self.snapshot()
+        if not s["done"] and not s["total"]:
+            return
+        if self.progress_callback and s["total"]:
+            self.progress_callback(min(1.0, (s["done"] + s["partial"]) / s["total"]))
+        if self.status_callback:
+            total_text = f"{s['total']}" if s["finished"] else f"{s['total']}+"
+            eta_text = format_duration(s["eta_s"]) if s["eta_s"] is not None else "--:--:--"
+            heading = "一時停止中" if self.paused else "処理中"
+            text = (f"{heading} ({s['done']}/{total_text}): {s['last_name']}\n"
+                    f"{s['files_per_s']:.1f} 枚/s  {s['mb_per_s']:.1f} MB/s  "
+                    f"経過 {format_duration(s['elapsed_s'])}  残り {eta_text}")
+            if s["skipped"]:
+                text += f"  スキップ {s['skipped']}件"
+            if s["cached"]:
+                text += f"  キャッシュ {s['cached']}件"
+            if s["errors"]:
+                text += f"  エラー {s['errors']}件（最新: {s['last_error']}）"
+            for name, done, total in s["frames"][:3]:
+                text += f"\n  {name}: フレーム {done}/{total}"
+            self.status_callback(text)
@@ -0,0 +1,205 @@
+import itertools, os, threading, traceback
+from collections import deque
+from processor import ImageProcessor
+
+# ジョブキュー: 処理中に追加された投入を1件ずつのジョブとして積み、共有のワーカープールで順に処理する
+# 一時停止／キャンセルは協調的で、ファイルの切れ目（実行中の1枚が終わった時点）で効く
+
+
+class JobControl:
+    """1ジョブ分の一時停止／キャンセルの合図。ImageProcessor.process_images がファイルごとに確認します。"""
+    def __init__(self):
+        self._cancelled = threading.Event()
+        self._resumed = threading.Event()
+        self._resumed.set()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    @property
+    def paused(self):
+        return not self._resumed.is_set()
+
+    def cancel(self):
+        self._cancelled.set()
+        self._resumed.set()  # 一時停止中でも待ちを解く
+
+    def pause(self):
+        if not self.cancelled:
+            self._resumed.clear()
+
+    def resume(self):
+        self._resumed.set()
+
+    def wait_resumed(self, timeout=None):
+        """再開（またはキャンセル）されるまで最大 timeout 秒待ちます。"""
+        return self._resumed.wait(timeout)
+
+
+class Job:
+    """キューに積まれた1回分の投入。state は queued / running / done / cancelled / failed のいずれか。"""
+    def __init__(self, job_id, items, split_direction, processor, output_folder=None):
+        self.id = job_id
+        self.items = list(items)
+        self.split_direction = split_direction
+        self.output_folder = output_folder
+        self.processor = processor
+        self.control = JobControl()
+        self.state = "queued"
+        self.progress = 0.0
+        self.status = ""
+        self.summary = None
+        self.error = None
+
+    @property
+    def label(self):
+        """表示用の名前（先頭の投入パス＋残りの件数）。"""
+        name = os.path.basename(os.path.normpath(self.items[0])) if self.items else ""
+        return name if len(self.items) <= 1 else f"{name} ほか{len(self.items) - 1}件"
+
+
+class JobScheduler:
+    """投入をジョブとして順に処理します。ワーカープールはジョブをまたいで使い回します。
+
+    コールバックはすべて処理スレッドから呼ばれます。
+      progress_callback(job, 0.0-1.0) / status_callback(job, text) / done_callback(job)
+    """
+    def __init__(self, progress_callback=None, status_callback=None, done_callback=None):
+        self.progress_callback = progress_callback
+        self.status_callback = status_callback
+        self.done_callback = done_callback
+        self._ids = itertools.count(1)
+        self._cond = threading.Condition()
+        self._queue = deque()
+        self._current = None
+        self._closed = False
+        self._thread = None
+        # 共有のワーカープール（ワーカー数が変わったときだけ作り直す）
+        self._executor = None
+        self._executor_workers = None
+
+    def submit(self, items, split_direction, output_folder=None, **settings):
+        """ジョブを積んで返します。settings は ImageProcessor の引数で、投入した時点の設定として固定されます。"""
+        processor = ImageProcessor(**settings)
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("JobScheduler is closed")
+            job = Job(next(self._ids), items, split_direction, processor, output_folder)
+            processor.progress_callback = lambda value: self._on_progress(job, value)
+            processor.status_callback = lambda text: self._on_status(job, text)
+            self._queue.append(job)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="ImageSplitterScheduler", daemon=True)
+                self._thread.start()
+            self._cond.notify_all()
+        return job
+
+    @property
+    def current(self):
+        """実行中のジョブ（なければ None）。"""
+        return self._current
+
+    def queued(self):
+        """待機中のジョブの一覧。"""
+        with self._cond:
+            return list(self._queue)
+
+    def cancel(self, job=None):
+        """ジョブをキャンセルします。省略時は実行中のジョブ。待機中のジョブはそのまま取り除きます。"""
+        with self._cond:
+            job = job or self._current
+            if job is None:
+                return
+            if job in self._queue:
+                self._queue.remove(job)
+                job.state = "cancelled"
+                removed = True
+            else:
+                removed = False
+            job.control.cancel()
+        if removed and self.done_callback:
+            self.done_callback(job)
+
+    def cancel_all(self):
+        """待機中のジョブをすべて取り除き、実行中のジョブもキャンセルします。"""
+        for job in self.queued():
+            self.cancel(job)
+        self.cancel()
+
+    def pause(self):
+        """実行中のジョブを一時停止します（後続のジョブも待たされます）。"""
+        job = self._current
+        if job is not None:
+            job.control.pause()
+
+    def resume(self):
+        job = self._current
+        if job is not None:
+            job.control.resume()
+
+    @property
+    def paused(self):
+        job = self._current
+        return job is not None and job.control.paused
+
+    def close(self, cancel=True):
+        """スケジューラーを止めます。cancel=True なら残りのジョブも取り消します。"""
+        if cancel:
+            self.cancel_all()
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+        self._shutdown_executor()
+
+    def _executor_for(self, processor):
+        workers = processor._worker_count()
+        if self._executor is None or workers != self._executor_workers:
+            self._shutdown_executor()
+            self._executor = processor._create_executor()
+            self._executor_workers = workers
+        return self._executor
+
+    def _shutdown_executor(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+            self._executor_workers = None
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._queue and not self._closed:
+                    self._cond.wait()
+                if not self._queue:
+                    return
+                job = self._queue.popleft()
+                job.state = "running"
+                self._current = job
+            try:
+                job.summary = job.processor.process_images(
+                    job.items, job.split_direction, output_folder=job.output_folder,
+                    executor=self._executor_for(job.processor), control=job.control)
+                job.state = "cancelled" if job.summary["cancelled"] else "done"
+            except Exception as e:
+                job.state = "failed"
+                job.error = str(e)
+                traceback.print_exc()
+                self._shutdown_executor()  # プールが壊れている可能性があるので次のジョブで作り直す
+            finally:
+                with self._cond:
+                    self._current = None
+            if self.done_callback:
+                self.done_callback(job)
+
+    def _on_progress(self, job, value):
+        job.progress = value
+        if self.progress_callback:
+            self.progress_callback(job, value)
+
+    def _on_status(self, job, text):
+        job.status = text
+        if self.status_callback:
+            self.status_callback(job, text)
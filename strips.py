@@ -0,0 +1,452 @@
+import io, os, struct, zlib
+from PIL import Image, ImageChops, TiffImagePlugin, TiffTags
+from writer import remove_quietly, temp_path_for
+
+# 巨大な PNG / TIFF を横長の帯（ストリップ）単位で読み、各パートを帯ごとにエンコーダへ流す低メモリ分割
+# ピークメモリは画像全体ではなく帯の高さに比例する
+
+STREAM_EXTENSIONS = ('.png', '.tiff')
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+# PNG のカラータイプ → Pillow のモード（8bit・非インターレースのみ対応）
+PNG_COLOR_MODES = {0: "L", 2: "RGB", 3: "P", 4: "LA", 6: "RGBA"}
+PNG_MODE_COLORS = {mode: color for color, mode in PNG_COLOR_MODES.items()}
+# 出力へそのまま引き継ぐ補助チャンク
+PNG_COPY_CHUNKS = (b"PLTE", b"tRNS", b"gAMA", b"cHRM", b"sRGB", b"iCCP", b"pHYs")
+
+TIFF_MODES = ("L", "RGB", "RGBA", "CMYK")
+TIFF_PHOTOMETRIC = {"L": 1, "RGB": 2, "RGBA": 2, "CMYK": 5}
+# 出力 TIFF に引き継ぐタグ（解像度・ICC）
+TIFF_COPY_TAGS = (282, 283, 296, 34675)
+# 帯ごとの TIFF を組み立てるときに作り直すタグ
+TIFF_STRIP_TAGS = (257, 273, 278, 279)
+# 1ストリップが帯より高いときに、ストリップの途中から行単位で読める圧縮方式（なし・Deflate）
+TIFF_ROW_COMPRESSIONS = {1: "raw", 8: "tiff_adobe_deflate", 32946: "tiff_deflate"}
+
+
+def open_header(fp):
+    """解凍爆弾チェックをかけずに画像を開きます（ヘッダだけ読む。帯読みや見積もりで巨大画像の寸法を知るため）。
+
+    Image.MAX_IMAGE_PIXELS は書き換えないので、同時に動く他のスレッドの Image.open はチェックされたままです。
+    load() する前に、必要なら Image._decompression_bomb_check(image.size) を呼んでください。
+    """
+    is_path = isinstance(fp, (str, bytes, os.PathLike))
+    if is_path:
+        with open(fp, "rb") as f:
+            prefix = f.read(16)
+    else:
+        prefix = fp.read(16)
+    tried = set()
+    # Image.open と同じく、よく使う形式のプラグインから試し、見つからなければすべて読み込んで試す
+    for loader in (Image.preinit, Image.init):
+        loader()
+        for format_id in Image.ID:
+            if format_id in tried:
+                continue
+            tried.add(format_id)
+            factory, accept = Image.OPEN[format_id]
+            result = not accept or accept(prefix)
+            if not result or isinstance(result, str):
+                continue
+            if not is_path:
+                fp.seek(0)
+            try:
+                return factory(fp)
+            except (SyntaxError, IndexError, TypeError, struct.error):
+                continue
+    raise Image.UnidentifiedImageError(f"cannot identify image file {fp!r}")
+
+
+def _make_reader(image, image_path, strip_rows):
+    if image.format == "PNG":
+        return _PngStripReader(image_path)
+    if image.format == "TIFF":
+        return _TiffStripReader(image, image_path, strip_rows)
+    return None
+
+
+def open_strip_reader(image, image_path, strip_rows=256):
+    """画像に合った帯リーダーを返します。帯読みできない形式・構成なら None。
+
+    strip_rows は1帯の行数で、TIFF のストリップがこれより高いときに行単位で読めるかの判断に使います。
+    """
+    reader = _make_reader(image, image_path, strip_rows)
+    return reader if reader is not None and reader.reason is None else None
+
+
+def strip_reader_error(image, image_path, strip_rows=256):
+    """帯読みできない理由を返します（エラーメッセージ用。帯読みできるなら None）。"""
+    reader = _make_reader(image, image_path, strip_rows)
+    return f"{image.format} 形式" if reader is None else reader.reason
+
+
+def split_streaming(reader, boxes, output_paths, strip_rows, stats, level=6):
+    """帯ごとに読み、boxes の各範囲を切り出して output_paths へ書き出します。出力バイト数を返します。
+
+    level は出力の zlib 圧縮レベルです。
+
+    各出力は一時ファイルへ書き、すべて書き終えてから置き換えます。
+    """
+    temp_paths = [temp_path_for(path) for path in output_paths]
+    writers = []
+    try:
+        for box, path in zip(boxes, temp_paths):
+            writers.append(reader.create_writer(path, box[2] - box[0], box[3] - box[1], level))
+        y = 0
+        strips = reader.iter_strips(strip_rows)
+        while True:
+            with stats.stage("decode"):
+                strip = next(strips, None)
+            if strip is None:
+                break
+            rows = strip.size[1]
+            for (x0, y0, x1, y1), writer in zip(boxes, writers):
+                top, bottom = max(y0, y), min(y1, y + rows)
+                if top >= bottom:
+                    continue
+                with stats.stage("crop"):
+                    part = strip.crop((x0, top - y, x1, bottom - y))
+                with stats.stage("encode"):
+                    writer.write(part)
+            y += rows
+        with stats.stage("write"):
+            for writer in writers:
+                writer.close()
+            for tmp_path, path in zip(temp_paths, output_paths):
+                os.replace(tmp_path, path)
+    except BaseException:
+        for writer in writers:
+            writer.abort()
+        for tmp_path in temp_paths:
+            remove_quietly(tmp_path)
+        raise
+    return sum(os.path.getsize(path) for path in output_paths)
+
+
+# PNG
+
+def _read_png_chunks(f):
+    """PNG のチャンクを (種類, データ) で順に返します。IDAT も1チャンクずつ読むだけで全体は持ちません。"""
+    if f.read(8) != PNG_SIGNATURE:
+        raise ValueError("PNG シグネチャが不正です")
+    while True:
+        header = f.read(8)
+        if len(header) < 8:
+            return
+        length, kind = struct.unpack(">I4s", header)
+        data = f.read(length)
+        f.read(4)  # CRC（Pillow の通常経路と同じく検証は zlib 側の整合性に任せる）
+        yield kind, data
+        if kind == b"IEND":
+            return
+
+
+class _PngStripReader:
+    """非インターレース 8bit PNG を帯ごとに展開します。"""
+    def __init__(self, image_path):
+        self.path = image_path
+        self.chunks = []
+        with open(image_path, "rb") as f:
+            for kind, data in _read_png_chunks(f):
+                if kind == b"IHDR":
+                    self.width, self.height, depth, color, _, _, interlace = struct.unpack(">IIBBBBB", data)
+                elif kind in PNG_COPY_CHUNKS:
+                    self.chunks.append((kind, data))
+                elif kind == b"IDAT":
+                    break
+        self.mode = PNG_COLOR_MODES.get(color)
+        if self.mode is None or depth != 8:
+            self.reason = f"{depth}bit・カラータイプ {color} の PNG"
+        elif interlace:
+            self.reason = "インターレース PNG"
+        else:
+            self.reason = None
+        self.supported = self.reason is None
+
+    def _filtered_rows(self, rows):
+        """フィルタ済みの生データ（行頭にフィルタ種別1バイト）を rows 行ずつ返します。"""
+        row_bytes = len(Image.new(self.mode, (self.width, 1)).tobytes()) + 1
+        want = row_bytes * rows
+        inflater = zlib.decompressobj()
+        pending = bytearray()
+        with open(self.path, "rb") as f:
+            for kind, data in _read_png_chunks(f):
+                if kind != b"IDAT":
+                    continue
+                # 展開後のサイズを帯1本分までに抑えながら少しずつ展開する
+                while data:
+                    pending += inflater.decompress(data, max(want - len(pending), 1))
+                    data = inflater.unconsumed_tail
+                    while len(pending) >= want:
+                        yield bytes(pending[:want])
+                        del pending[:want]
+        pending += inflater.flush()
+        if pending:
+            yield bytes(pending)
+
+    def iter_strips(self, rows):
+        """帯ごとの画像を上から順に返します。"""
+        previous = bytes(len(Image.new(self.mode, (self.width, 1)).tobytes()))
+        for raw in self._filtered_rows(rows):
+            # 帯の先頭行は前の帯の最終行を参照するので、展開済みの最終行を「フィルタなし」の行として前置して
+            # Pillow の PNG 展開器（フィルタ解除）にかけ、結果の先頭行を捨てる
+            count = len(raw) // (len(previous) + 1)
+            decoder = Image._getdecoder(self.mode, "zip", self.mode)
+            block = Image.new(self.mode, (self.width, count + 1))
+            block.load()
+            decoder.setimage(block.im, (0, 0, self.width, count + 1))
+            try:
+                decoder.decode(zlib.compress(b"\x00" + previous + raw, 0))
+            finally:
+                decoder.cleanup()
+            strip = block.crop((0, 1, self.width, count + 1))
+            previous = strip.crop((0, count - 1, self.width, count)).tobytes()
+            yield strip
+
+    def create_writer(self, path, width, height, level=6):
+        return _PngStripWriter(path, width, height, self.mode, self.chunks, level)
+
+
+def _png_chunk(kind, data):
+    return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data) & 0xffffffff)
+
+
+class _PngStripWriter:
+    """帯ごとに受け取った画像を Up フィルタ＋zlib で1本の PNG に書き出します。"""
+    def __init__(self, path, width, height, mode, chunks, level=6):
+        self.path = path
+        self.width = width
+        self.mode = mode
+        self._file = open(path, "wb")
+        self._deflater = zlib.compressobj(level)
+        self._previous = Image.new(mode, (width, 1))
+        self._file.write(PNG_SIGNATURE)
+        ihdr = struct.pack(">IIBBBBB", width, height, 8, PNG_MODE_COLORS[mode], 0, 0, 0)
+        self._file.write(_png_chunk(b"IHDR", ihdr))
+        for kind, data in chunks:
+            self._file.write(_png_chunk(kind, data))
+
+    def write(self, part):
+        rows = part.size[1]
+        # Up フィルタ: 1行上との差（mod 256）。1行上は前の帯の最終行から続ける
+        above = Image.new(self.mode, part.size)
+        above.paste(self._previous, (0, 0))
+        if rows > 1:
+            above.paste(part.crop((0, 0, self.width, rows - 1)), (0, 1))
+        diff = ImageChops.subtract_modulo(part, above).tobytes()
+        stride = len(diff) // rows
+        filtered = b"".join(b"\x02" + diff[i * stride:(i + 1) * stride] for i in range(rows))
+        self._emit(self._deflater.compress(filtered))
+        self._previous = part.crop((0, rows - 1, self.width, rows))
+
+    def _emit(self, data):
+        if data:
+            self._file.write(_png_chunk(b"IDAT", data))
+
+    def close(self):
+        self._emit(self._deflater.flush())
+        self._file.write(_png_chunk(b"IEND", b""))
+        self._file.close()
+
+    def abort(self):
+        self._file.close()
+
+
+# TIFF
+
+def _relative_offsets(strips):
+    """ImageFileDirectory_v2.tobytes は StripOffsets に IFD 末尾の位置を足して書くので、IFD 直後からの相対値を渡す。"""
+    offsets, pos = [], 0
+    for s in strips:
+        offsets.append(pos)
+        pos += len(s)
+    return tuple(offsets)
+
+
+class _TiffStripReader:
+    """ストリップ構成の 8bit TIFF を、数ストリップずつの小さな TIFF に組み直して libtiff で展開します。
+
+    ストリップが帯より高い（スキャナ出力に多い1ストリップの TIFF など）ときは、非圧縮・Deflate に限り
+    ストリップの途中から帯の行数ずつ読みます。それ以外の圧縮方式は帯読みしません。
+    """
+    def __init__(self, image, image_path, strip_rows=256):
+        self.path = image_path
+        self.mode = image.mode
+        self.width, self.height = image.size
+        self.tags = image.tag_v2
+        self.rows_per_strip = min(int(self.tags.get(278, self.height)), self.height)
+        bits = self.tags.get(258, (8,))
+        compression = self.tags.get(259, 1)
+        if self.mode not in TIFF_MODES:
+            self.reason = f"モード {self.mode} の TIFF"
+        elif 322 in self.tags or 273 not in self.tags or 279 not in self.tags:
+            self.reason = "タイル構成の TIFF"
+        elif self.tags.get(284, 1) != 1:
+            self.reason = "プレーン分割（PlanarConfiguration=2）の TIFF"
+        elif not all(b == 8 for b in (bits if isinstance(bits, tuple) else (bits,))):
+            self.reason = "8bit 以外の TIFF"
+        elif getattr(image, "n_frames", 1) != 1:
+            self.reason = "複数ページの TIFF"
+        elif self.rows_per_strip > strip_rows and compression not in TIFF_ROW_COMPRESSIONS:
+            name = TiffImagePlugin.COMPRESSION_INFO.get(compression, compression)
+            self.reason = f"1ストリップが {self.rows_per_strip} 行あり、圧縮方式 {name} では途中から読めない TIFF"
+        else:
+            self.reason = None
+        self.supported = self.reason is None
+
+    def iter_strips(self, rows):
+        if self.rows_per_strip > rows:
+            yield from self._iter_strip_rows(rows)
+            return
+        offsets = self.tags[273]
+        counts = self.tags[279]
+        per_group = max(1, rows // self.rows_per_strip)
+        with open(self.path, "rb") as f:
+            for first in range(0, len(offsets), per_group):
+                last = min(first + per_group, len(offsets))
+                y0 = first * self.rows_per_strip
+                group_rows = min(self.height, last * self.rows_per_strip) - y0
+                if group_rows <= 0:
+                    break
+                data = []
+                for i in range(first, last):
+                    f.seek(offsets[i])
+                    data.append(f.read(counts[i]))
+                yield self._decode(group_rows, data)
+
+    def _iter_strip_rows(self, rows):
+        """帯より高いストリップを、展開しながら rows 行ずつの帯にして返します（非圧縮・Deflate のみ）。"""
+        row_bytes = len(Image.new(self.mode, (self.width, 1)).tobytes())
+        want = row_bytes * rows
+        deflated = self.tags.get(259, 1) != 1
+        with open(self.path, "rb") as f:
+            for offset, count in zip(self.tags[273], self.tags[279]):
+                f.seek(offset)
+                inflater = zlib.decompressobj() if deflated else None
+                pending = bytearray()
+                left = count
+                while left:
+                    data = f.read(min(left, 1 << 20))
+                    if not data:
+                        break  # ファイルが途中で切れている
+                    left -= len(data)
+                    # 展開後のサイズを帯1本分までに抑えながら少しずつ展開する
+                    while data:
+                        if inflater is None:
+                            pending += data
+                            data = b""
+                        else:
+                            pending += inflater.decompress(data, max(want - len(pending), 1))
+                            data = inflater.unconsumed_tail
+                        while len(pending) >= want:
+                            yield self._decode_rows(bytes(pending[:want]), deflated)
+                            del pending[:want]
+                if inflater is not None:
+                    pending += inflater.flush()
+                usable = len(pending) - len(pending) % row_bytes
+                if usable:
+                    yield self._decode_rows(bytes(pending[:usable]), deflated)
+
+    def _decode_rows(self, raw, deflated):
+        """展開済みの行（予測子は掛かったまま）を、同じタグの小さな TIFF にして libtiff で展開します。"""
+        rows = len(raw) // len(Image.new(self.mode, (self.width, 1)).tobytes())
+        # 予測子（水平差分）は行ごとに完結するので、Deflate は無圧縮のまま包み直して元のタグで展開させる
+        data = zlib.compress(raw, 0) if deflated else raw
+        return self._decode(rows, [data], rows_per_strip=rows)
+
+    def _decode(self, rows, strips, rows_per_strip=None):
+        with Image.open(io.BytesIO(self._mini_tiff(rows, strips, rows_per_strip))) as strip:
+            strip.load()
+            return strip.copy() if strip.mode == self.mode else strip.convert(self.mode)
+
+    def _mini_tiff(self, rows, strips, rows_per_strip=None):
+        """元のタグを写し、指定のストリップだけを含む TIFF をメモリ上に組み立てます。"""
+        ifd = TiffImagePlugin.ImageFileDirectory_v2()
+        for tag, value in self.tags.items():
+            if tag in TIFF_STRIP_TAGS:
+                continue
+            ifd[tag] = value
+            if tag in self.tags.tagtype:
+                ifd.tagtype[tag] = self.tags.tagtype[tag]
+        ifd[257] = rows
+        ifd[278] = rows_per_strip or self.rows_per_strip
+        ifd[273] = _relative_offsets(strips)
+        ifd[279] = tuple(len(s) for s in strips)
+        ifd.tagtype[273] = ifd.tagtype[279] = TiffTags.LONG
+        return b"II*\x00" + struct.pack("<I", 8) + ifd.tobytes(8) + b"".join(strips)
+
+    def create_writer(self, path, width, height, level=6):
+        copied = {tag: (self.tags[tag], self.tags.tagtype.get(tag)) for tag in TIFF_COPY_TAGS if tag in self.tags}
+        return _TiffStripWriter(path, width, height, self.mode, copied, level=level)
+
+
+class _TiffStripWriter:
+    """受け取った行を RowsPerStrip ごとに Deflate 圧縮して書きます。
+
+    ストリップ数は高さから決まるので、先頭に同じ長さの仮 IFD を置いておき、最後に本物で上書きします。
+    """
+    def __init__(self, path, width, height, mode, copied_tags, rows_per_strip=64, level=6):
+        self.path = path
+        self.mode = mode
+        self.rows_per_strip = max(1, min(rows_per_strip, height))
+        self.level = level
+        self._stride = len(Image.new(mode, (width, 1)).tobytes())
+        self._pending = bytearray()
+        self._strips = []  # (ファイル上の位置, 長さ)
+
+        bands = len(mode)
+        self._ifd = ifd = TiffImagePlugin.ImageFileDirectory_v2()
+        ifd[256] = width
+        ifd[257] = height
+        ifd[258] = (8,) * bands
+        ifd[259] = 8  # Adobe Deflate
+        ifd[262] = TIFF_PHOTOMETRIC[mode]
+        ifd[277] = bands
+        ifd[278] = self.rows_per_strip
+        ifd[284] = 1
+        if mode == "RGBA":
+            ifd[338] = 2  # 非乗算済みアルファ
+        for tag, (value, tagtype) in copied_tags.items():
+            ifd[tag] = value
+            if tagtype is not None:
+                ifd.tagtype[tag] = tagtype
+        strip_count = -(-height // self.rows_per_strip)
+        self._set_strips([0] * strip_count, [0] * strip_count)
+
+        self._file = open(path, "wb")
+        self._file.write(b"II*\x00" + struct.pack("<I", 8))
+        self._ifd_size = len(ifd.tobytes(8))
+        self._file.write(bytes(self._ifd_size))
+        self._data_start = self._file.tell()
+
+    def _set_strips(self, offsets, counts):
+        self._ifd[273] = tuple(offsets)
+        self._ifd[279] = tuple(counts)
+        self._ifd.tagtype[273] = self._ifd.tagtype[279] = TiffTags.LONG
+
+    def write(self, part):
+        self._pending += part.tobytes()
+        chunk = self._stride * self.rows_per_strip
+        while len(self._pending) >= chunk:
+            self._write_strip(bytes(self._pending[:chunk]))
+            del self._pending[:chunk]
+
+    def _write_strip(self, data):
+        packed = zlib.compress(data, self.level)
+        self._strips.append((self._file.tell(), len(packed)))
+        self._file.write(packed)
+
+    def close(self):
+        if self._pending:
+            self._write_strip(bytes(self._pending))
+        # StripOffsets は IFD 直後からの相対値で渡す（_relative_offsets と同じ理由）
+        self._set_strips([pos - self._data_start for pos, _ in self._strips], [n for _, n in self._strips])
+        blob = self._ifd.tobytes(8)
+        if len(blob) != self._ifd_size:
+            raise RuntimeError("TIFF の IFD 長が変わりました")
+        self._file.seek(8)
+        self._file.write(blob)
+        self._file.close()
+
+    def abort(self):
+        self._file.close()
@@ -0,0 +1,27 @@
+import os, sys
+import pytest
+from PIL import Image
+
+# モジュールはリポジトリ直下に並んでいるので、テストからもそのまま import できるようにする
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def sample_image(mode, size=(96, 70)):
+    """帯の境目や分割位置で取り違えると分かるよう、行ごと・列ごとに値の変わる画像を作ります。"""
+    gradient = Image.linear_gradient("L").resize(size)
+    noise = Image.effect_noise(size, 64).convert("L")
+    if mode == "P":
+        return Image.merge("RGB", (gradient, noise, gradient.transpose(Image.Transpose.FLIP_LEFT_RIGHT))).quantize(64)
+    bands = [gradient, noise, gradient.transpose(Image.Transpose.FLIP_LEFT_RIGHT), noise.rotate(180)]
+    return Image.merge(mode, bands[:len(mode)])
+
+
+@pytest.fixture
+def make_image(tmp_path):
+    """tmp_path に画像を保存してパスを返す関数。"""
+    def make(name, mode="RGB", size=(96, 70), **save_options):
+        path = tmp_path / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        sample_image(mode, size).save(path, **save_options)
+        return str(path)
+    return make
@@ -0,0 +1,133 @@
+import io, os, threading, zipfile
+from concurrent.futures import Future, ThreadPoolExecutor
+import pytest
+from conftest import sample_image
+from processor import ImageProcessor
+from scheduler import JobControl
+from writer import ArchiveWriter
+
+# 書庫出力（ZIP / CBZ）の並び順と書庫の分け方
+
+def test_archive_writer_writes_in_submit_order(tmp_path):
+    writer = ArchiveWriter(str(tmp_path), ".cbz")
+    group = (str(tmp_path / "ch1"), "ch1")
+    futures = [
+        writer.submit(2, group, [("p3_a.png", "p3_a.png", b"3")]),
+        writer.submit(0, group, [("p1_a.png", "p1_a.png", b"1")]),
+    ]
+    writer.skip(1)
+    writer.close()
+    for future in futures:
+        future.result()
+    with zipfile.ZipFile(tmp_path / "ch1.cbz") as archive:
+        assert archive.namelist() == ["p1_a.png", "p3_a.png"]
+
+
+def test_archive_writer_rejects_duplicate_names(tmp_path):
+    writer = ArchiveWriter(str(tmp_path), ".cbz")
+    group = (str(tmp_path / "ch1"), "ch1")
+    first = writer.submit(0, group, [("p1_a.png", "p1_a.png", b"1")])
+    second = writer.submit(1, group, [("p1_a.png", "p1_a.png", b"2")])
+    writer.close()
+    first.result()
+    with pytest.raises(ValueError):
+        second.result()
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_archive_output_keeps_reading_order(make_image, tmp_path, workers):
+    for name in ("p10.png", "p2.png", "p1.png"):
+        make_image(f"in/ch1/{name}", "RGB", size=(60 + len(name), 20))
+    make_image("in/ch2/p1.png", "RGB")
+    make_image("in/other/ch1/p1.png", "RGB")
+    out = tmp_path / "out"
+    processor = ImageProcessor(workers=workers, archive_output="cbz")
+    summary = processor.process_images([str(tmp_path / "in")], "right_to_left", output_folder=str(out))
+    assert summary["processed"] == 5 and not summary["errors"]
+    # 同じ名前の別フォルダは別の書庫になる
+    assert sorted(os.listdir(out)) == ["ch1.cbz", "ch1_2.cbz", "ch2.cbz"]
+    with zipfile.ZipFile(out / "ch1.cbz") as archive:
+        assert archive.namelist() == [f"{page}_{suffix}.png" for page in ("p1", "p2", "p10") for suffix in "ab"]
+    with zipfile.ZipFile(out / "ch1_2.cbz") as archive:
+        assert archive.namelist() == ["p1_a.png", "p1_b.png"]
+
+
+class GatedExecutor:
+    """1本のスレッドで実行し、最初の1件だけ gate が開くまで止めておく Executor。
+
+    inline に入っている回目の投入は呼び出し元でその場で実行します。submit のたびに on_submit(回数) を呼びます。
+    """
+    def __init__(self, on_submit, inline=()):
+        self.gate = threading.Event()
+        self.on_submit = on_submit
+        self.inline = inline
+        self.count = 0
+        self._executor = ThreadPoolExecutor(max_workers=1)
+
+    def submit(self, fn, *args):
+        self.count += 1
+        if self.count in self.inline:
+            future = Future()
+            future.set_result(fn(*args))
+        elif self.count == 1:
+            def gated(*args):
+                self.gate.wait(10)
+                return fn(*args)
+            future = self._executor.submit(gated, *args)
+        else:
+            future = self._executor.submit(fn, *args)
+        self.on_submit(self.count)
+        return future
+
+    def shutdown(self):
+        self.gate.set()
+        self._executor.shutdown()
+
+
+def test_cancel_after_pause_does_not_hang(make_image, tmp_path):
+    for i in range(1, 7):
+        make_image(f"in/ch1/p{i}.png", "RGB")
+    control = JobControl()
+
+    def on_submit(count):
+        if count == 3:
+            # 2件目・3件目は未着手のうちに取り下げられ、番号を持ったまま後回しになる
+            control.pause()
+            threading.Timer(0.3, lambda: (executor.gate.set(), control.resume())).start()
+        elif count == 4:
+            # 4件目は書庫への書き込み待ちに入り、その直後（取り下げた分を手にしたところ）でキャンセルする
+            control.cancel()
+
+    executor = GatedExecutor(on_submit, inline=(4,))
+    result = {}
+    processor = ImageProcessor(workers=2, archive_output="cbz")
+    thread = threading.Thread(target=lambda: result.update(processor.process_images(
+        [str(tmp_path / "in")], "right_to_left", output_folder=str(tmp_path / "out"),
+        executor=executor, control=control)), daemon=True)
+    thread.start()
+    thread.join(10)
+    executor.shutdown()
+    assert not thread.is_alive(), "キャンセル後に書庫の書き込み待ちが終わらない"
+    assert result["cancelled"]
+    with zipfile.ZipFile(tmp_path / "out" / "ch1.cbz") as archive:
+        names = archive.namelist()
+    # 書けた分は読む順のまま
+    assert names == sorted(names, key=lambda name: int(name[1:name.index("_")]))
+
+
+def test_archive_output_leaves_no_member_folders(tmp_path):
+    # 書庫内のフォルダに入った画像も、書庫出力では出力フォルダにサブフォルダを残さない
+    # （アニメーション GIF のタイルはファイルに書いてから書庫へ移すので、その分のフォルダも消える）
+    frames = [sample_image("RGB").rotate(angle) for angle in (0, 90)]
+    buffer = io.BytesIO()
+    frames[0].save(buffer, "GIF", save_all=True, append_images=frames[1:], duration=100)
+    png = io.BytesIO()
+    frames[0].save(png, "PNG")
+    with zipfile.ZipFile(tmp_path / "book.cbz", "w") as archive:
+        archive.writestr("vol1/p1.png", png.getvalue())
+        archive.writestr("vol2/anim.gif", buffer.getvalue())
+    out = tmp_path / "out"
+    summary = ImageProcessor(workers=1, archive_output="cbz").process_images(
+        [str(tmp_path / "book.cbz")], "right_to_left", output_folder=str(out))
+    assert summary["processed"] == 2 and not summary["errors"]
+    assert all(name.endswith(".cbz") for name in os.listdir(out)), os.listdir(out)
@@ -0,0 +1,79 @@
+import io, os, zipfile
+import pytest
+from PIL import Image
+from archives import iter_archive_members, read_member
+from processor import ImageProcessor, iter_image_files
+from conftest import sample_image
+
+
+def png_bytes(mode="RGB", size=(40, 20)):
+    buffer = io.BytesIO()
+    sample_image(mode, size).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def make_zip(path, members):
+    """[(名前, バイト列, 圧縮方式), ...] の ZIP を作ります。"""
+    with zipfile.ZipFile(path, "w") as archive:
+        for name, data, compression in members:
+            archive.writestr(name, data, compress_type=compression)
+    return str(path)
+
+
+# アーカイブ内の画像の読み出し
+
+def test_members_are_images_in_natural_order(tmp_path):
+    data = png_bytes()
+    path = make_zip(tmp_path / "book.cbz", [
+        ("p10.png", data, zipfile.ZIP_STORED),
+        ("p2.png", data, zipfile.ZIP_DEFLATED),
+        ("p1.png", data, zipfile.ZIP_STORED),
+        ("notes.txt", b"text", zipfile.ZIP_STORED),
+        (".hidden.png", data, zipfile.ZIP_STORED),
+        ("__MACOSX/._p1.png", b"junk", zipfile.ZIP_STORED),
+    ])
+    assert [member.name for member in iter_archive_members(path)] == ["p1.png", "p2.png", "p10.png"]
+
+
+@pytest.mark.parametrize("compression", [zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED, zipfile.ZIP_BZIP2])
+def test_read_member_returns_exact_bytes(tmp_path, compression):
+    pages = {f"vol1/p{i}.png": png_bytes(size=(30 + i, 20)) for i in range(1, 4)}
+    path = make_zip(tmp_path / "book.zip", [(name, data, compression) for name, data in pages.items()])
+    members = list(iter_archive_members(path))
+    assert {member.name: read_member(member) for member in members} == pages
+
+
+def test_read_member_detects_corruption(tmp_path):
+    data = png_bytes()
+    path = make_zip(tmp_path / "book.zip", [("p1.png", data, zipfile.ZIP_STORED)])
+    member, = iter_archive_members(path)
+    raw = bytearray(open(path, "rb").read())
+    offset = raw.index(data)
+    raw[offset + len(data) // 2] ^= 0xFF
+    open(path, "wb").write(bytes(raw))
+    with pytest.raises(zipfile.BadZipFile):
+        read_member(member)
+
+
+def test_discovery_expands_archives(tmp_path):
+    data = png_bytes()
+    (tmp_path / "in").mkdir()
+    make_zip(tmp_path / "in" / "book.cbz", [("p2.png", data, zipfile.ZIP_STORED), ("p1.png", data, zipfile.ZIP_STORED)])
+    sample_image("RGB").save(tmp_path / "in" / "cover.png")
+    found = list(iter_image_files([str(tmp_path / "in")]))
+    assert [getattr(item, "name", os.path.basename(str(item))) for item in found] == ["p1.png", "p2.png", "cover.png"]
+
+
+def test_members_split_into_their_folders(tmp_path):
+    data = png_bytes()
+    path = make_zip(tmp_path / "book.cbz", [
+        ("vol1/p1.png", data, zipfile.ZIP_STORED),
+        ("vol2/p1.png", data, zipfile.ZIP_DEFLATED),
+    ])
+    out = tmp_path / "out"
+    summary = ImageProcessor(workers=1).process_images([path], "right_to_left", output_folder=str(out))
+    assert summary["processed"] == 2 and not summary["errors"]
+    for folder in ("vol1", "vol2"):
+        for suffix in ("a", "b"):
+            with Image.open(out / "book" / folder / f"p1_{suffix}.png") as part:
+                assert part.size == (20, 20)
@@ -0,0 +1,63 @@
+import os, shutil
+from cache import ResultCache, cache_key
+from processor import ImageProcessor
+
+# 分割結果のキャッシュ（ヒット・設定違い・追い出し）
+
+
+def run(inputs, out, cache_dir, **settings):
+    settings.setdefault("workers", 1)
+    summary = ImageProcessor(cache_dir=str(cache_dir), **settings).process_images(
+        [str(inputs)], "right_to_left", output_folder=str(out))
+    assert not summary["errors"], summary["errors"]
+    return summary["cache"]
+
+
+def read(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def test_same_content_under_another_name_hits(make_image, tmp_path):
+    make_image("in/p1.png")
+    cache_dir = tmp_path / "cache"
+    first = run(tmp_path / "in", tmp_path / "out1", cache_dir)
+    assert (first["hits"], first["misses"], first["entries"]) == (0, 1, 1)
+    # 名前も場所も違う同じ内容の入力は、分割せずにキャッシュから出力する
+    os.makedirs(tmp_path / "copy")
+    shutil.copy(tmp_path / "in" / "p1.png", tmp_path / "copy" / "renamed.png")
+    second = run(tmp_path / "copy", tmp_path / "out2", cache_dir)
+    assert (second["hits"], second["misses"], second["entries"]) == (1, 0, 1)
+    for suffix in "ab":
+        assert read(tmp_path / "out2" / f"renamed_{suffix}.png") == read(tmp_path / "out1" / f"p1_{suffix}.png")
+
+
+def test_other_settings_miss(make_image, tmp_path):
+    make_image("in/p1.png")
+    cache_dir = tmp_path / "cache"
+    run(tmp_path / "in", tmp_path / "out1", cache_dir)
+    stats = run(tmp_path / "in", tmp_path / "out2", cache_dir, columns=3)
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (0, 1, 2)
+
+
+def test_materialize_needs_every_tile(tmp_path):
+    cache = ResultCache(str(tmp_path / "cache"))
+    key = cache_key("digest", {}, ".png")
+    assert not cache.materialize(key, [str(tmp_path / "a.png")])
+    cache.store(key, [(b"a", None), (b"b", None)])
+    assert not cache.materialize(key, [str(tmp_path / "a.png")])
+    assert cache.materialize(key, [str(tmp_path / "a.png"), str(tmp_path / "b.png")])
+    assert read(tmp_path / "b.png") == b"b"
+
+
+def test_evict_removes_least_recently_used(tmp_path):
+    cache = ResultCache(str(tmp_path / "cache"))
+    keys = [cache_key(f"digest{i}", {}, ".png") for i in range(3)]
+    for age, key in zip((300, 200, 100), keys):
+        cache.store(key, [(b"x" * 1000, None)])
+        stamp = os.stat(cache.entry_path(key)).st_mtime - age
+        os.utime(cache.entry_path(key), (stamp, stamp))
+    # 使ったエントリは最後に使った時刻が新しくなり、追い出されない
+    assert cache.materialize(keys[0], [str(tmp_path / "tile.png")])
+    assert cache.evict(2000) == (2, 2000)
+    assert [os.path.isdir(cache.entry_path(key)) for key in keys] == [True, False, True]
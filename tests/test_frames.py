@@ -0,0 +1,75 @@
+import os
+import pytest
+from PIL import Image, ImageSequence, features
+from conftest import sample_image
+from processor import SplitOptions, split_image_file
+
+# アニメーション・複数ページの画像の分割（フレーム数・表示時間・ループ回数の引き継ぎ）
+
+DURATIONS = [100, 200, 300]
+
+
+def make_animation(path, **save_options):
+    frames = [sample_image("RGB", (60, 40)).rotate(angle) for angle in (0, 90, 180)]
+    frames[0].save(path, save_all=True, append_images=frames[1:], **save_options)
+    return str(path)
+
+
+def frame_info(path):
+    durations = []
+    with Image.open(path) as image:
+        for frame in ImageSequence.Iterator(image):
+            frame.load()  # WebP は読み込んだ後でないと表示時間が入らない
+            durations.append(frame.info.get("duration"))
+        return image.size, image.n_frames, durations, image.info.get("loop")
+
+
+@pytest.mark.parametrize("ext, save_options", [
+    (".gif", {}),
+    (".png", {"default_image": False}),
+    pytest.param(".webp", {"lossless": True},
+                 marks=pytest.mark.skipif(not features.check("webp"), reason="WebP 非対応")),
+])
+def test_sequence_keeps_durations_and_loop(tmp_path, ext, save_options):
+    path = make_animation(tmp_path / f"anim{ext}", duration=DURATIONS, loop=2, **save_options)
+    outputs = split_image_file(path, str(tmp_path), SplitOptions())
+    assert outputs == [f"anim_a{ext}", f"anim_b{ext}"]
+    for filename in outputs:
+        assert frame_info(tmp_path / filename) == ((30, 40), 3, DURATIONS, 2)
+
+
+def test_sequence_frames_are_cropped_alike(tmp_path):
+    path = make_animation(tmp_path / "anim.png", duration=DURATIONS, loop=0)
+    split_image_file(path, str(tmp_path), SplitOptions())
+    with Image.open(path) as source, Image.open(tmp_path / "anim_b.png") as part:
+        for index in range(3):
+            source.seek(index)
+            part.seek(index)
+            assert part.convert("RGB").tobytes() == source.convert("RGB").crop((0, 0, 30, 40)).tobytes()
+
+
+def test_multi_page_tiff_sequence(tmp_path):
+    path = make_animation(tmp_path / "scan.tiff")
+    outputs = split_image_file(path, str(tmp_path), SplitOptions(columns=3))
+    assert outputs == ["scan_a.tiff", "scan_b.tiff", "scan_c.tiff"]
+    for filename in outputs:
+        with Image.open(tmp_path / filename) as part:
+            assert (part.size, part.n_frames) == ((20, 40), 3)
+
+
+def test_pages_mode_writes_a_file_per_page(tmp_path):
+    path = make_animation(tmp_path / "scan.tiff")
+    outputs = split_image_file(path, str(tmp_path), SplitOptions(frame_mode="pages"))
+    assert outputs == [f"scan_p{page:03d}_{suffix}.tiff" for page in (1, 2, 3) for suffix in "ab"]
+    with Image.open(path) as source:
+        source.seek(1)
+        with Image.open(tmp_path / "scan_p002_b.tiff") as part:
+            assert part.n_frames == 1
+            assert part.tobytes() == source.crop((0, 0, 30, 40)).tobytes()
+
+
+def test_first_mode_splits_only_the_first_frame(tmp_path):
+    path = make_animation(tmp_path / "anim.gif", duration=DURATIONS, loop=0)
+    outputs = split_image_file(path, str(tmp_path), SplitOptions(frame_mode="first"))
+    assert outputs == ["anim_a.gif", "anim_b.gif"]
+    assert all(frame_info(tmp_path / filename)[1] == 1 for filename in outputs)
@@ -0,0 +1,46 @@
+import os
+import pytest
+from PIL import Image
+from processor import SplitOptions, split_image_file, tile_layout
+
+# 格子分割・重ね幅の切り出し範囲と、読む順のファイル名
+
+COLUMNS = {0: (0, 32), 1: (28, 62), 2: (58, 90)}
+ROWS = {0: (0, 32), 1: (28, 60)}
+
+
+def box(c, r):
+    return (COLUMNS[c][0], ROWS[r][0], COLUMNS[c][1], ROWS[r][1])
+
+
+@pytest.mark.parametrize("direction, cells", [
+    ("right_to_left", [(2, 0), (1, 0), (0, 0), (2, 1), (1, 1), (0, 1)]),
+    ("left_to_right", [(0, 0), (1, 0), (2, 0), (0, 1), (1, 1), (2, 1)]),
+    ("columns_right_to_left", [(2, 0), (2, 1), (1, 0), (1, 1), (0, 0), (0, 1)]),
+    ("columns_left_to_right", [(0, 0), (0, 1), (1, 0), (1, 1), (2, 0), (2, 1)]),
+])
+def test_grid_with_margin_in_reading_order(direction, cells):
+    # 重ね幅は内側の境界にだけ付き、画像の外周ははみ出さない
+    options = SplitOptions(split_direction=direction, columns=3, rows=2, margin=2)
+    assert tile_layout(90, 60, options) == list(zip("abcdef", (box(c, r) for c, r in cells)))
+
+
+def test_default_is_two_pages_at_the_center():
+    assert tile_layout(91, 40, SplitOptions()) == [("a", (45, 0, 91, 40)), ("b", (0, 0, 45, 40))]
+    assert tile_layout(100, 40, SplitOptions(split_ratio=0.4)) == [("a", (40, 0, 100, 40)), ("b", (0, 0, 40, 40))]
+
+
+def test_many_tiles_are_numbered():
+    layout = tile_layout(270, 10, SplitOptions(split_direction="left_to_right", columns=27))
+    assert [suffix for suffix, _ in layout[:2]] == ["01", "02"] and layout[-1] == ("27", (260, 0, 270, 10))
+
+
+def test_split_outputs_match_the_layout(make_image):
+    path = make_image("page.png", "RGB", size=(90, 60))
+    options = SplitOptions(columns=3, rows=2, margin=2)
+    outputs = split_image_file(path, os.path.dirname(path), options)
+    assert outputs == [f"page_{suffix}.png" for suffix in "abcdef"]
+    with Image.open(path) as image:
+        for filename, (_, crop) in zip(outputs, tile_layout(90, 60, options)):
+            with Image.open(os.path.join(os.path.dirname(path), filename)) as part:
+                assert part.tobytes() == image.crop(crop).tobytes(), filename
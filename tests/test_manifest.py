@@ -0,0 +1,104 @@
+import json, os, shutil
+from conftest import sample_image
+from manifest import MANIFEST_NAME
+from processor import ImageProcessor
+
+
+def run(inputs, out, **settings):
+    settings.setdefault("workers", 1)
+    summary = ImageProcessor(**settings).process_images([str(inputs)], "right_to_left", output_folder=str(out))
+    assert not summary["errors"], summary["errors"]
+    return summary["processed"], summary["skipped"]
+
+
+def bump_mtime(path, seconds=10):
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + seconds * 1_000_000_000))
+
+
+def test_second_run_skips_everything(make_image, tmp_path):
+    make_image("in/p1.png")
+    make_image("in/p2.jpg")
+    out = tmp_path / "out"
+    assert run(tmp_path / "in", out) == (2, 0)
+    assert (out / MANIFEST_NAME).exists()
+    assert run(tmp_path / "in", out) == (0, 2)
+
+
+def test_changed_input_is_split_again(make_image, tmp_path):
+    make_image("in/p1.png")
+    path = make_image("in/p2.png")
+    out = tmp_path / "out"
+    run(tmp_path / "in", out)
+    make_image("in/p2.png", "L")
+    bump_mtime(path)
+    assert run(tmp_path / "in", out) == (1, 1)
+
+
+def test_missing_output_is_split_again(make_image, tmp_path):
+    make_image("in/p1.png")
+    make_image("in/p2.png")
+    out = tmp_path / "out"
+    run(tmp_path / "in", out)
+    os.remove(out / "p2_b.png")
+    assert run(tmp_path / "in", out) == (1, 1)
+    assert (out / "p2_b.png").exists()
+
+
+def test_changed_settings_split_again(make_image, tmp_path):
+    make_image("in/p1.png")
+    out = tmp_path / "out"
+    run(tmp_path / "in", out)
+    summary = ImageProcessor(workers=1).process_images([str(tmp_path / "in")], "left_to_right", output_folder=str(out))
+    assert (summary["processed"], summary["skipped"]) == (1, 0)
+    assert run(tmp_path / "in", out, columns=3) == (1, 0)
+
+
+def test_touched_input_is_skipped_by_hash(make_image, tmp_path):
+    path = make_image("in/p1.png")
+    out = tmp_path / "out"
+    run(tmp_path / "in", out, verify_hash=True)
+    bump_mtime(path)
+    # 内容が同じならハッシュで処理済みと分かる（記録も新しい更新日時に直す）
+    assert run(tmp_path / "in", out, verify_hash=True) == (0, 1)
+    assert run(tmp_path / "in", out) == (0, 1)
+    bump_mtime(path)
+    assert run(tmp_path / "in", out) == (1, 0)
+
+
+def test_moved_output_folder_still_skips(make_image, tmp_path):
+    make_image("in/p1.png")
+    run(tmp_path / "in", tmp_path / "in" / "half")
+    # 処理記録は出力フォルダからの相対パスなので、入力と出力をまとめて移しても使える
+    shutil.move(str(tmp_path / "in"), str(tmp_path / "moved"))
+    assert run(tmp_path / "moved", tmp_path / "moved" / "half") == (0, 1)
+
+
+def test_incremental_off_always_splits(make_image, tmp_path):
+    make_image("in/p1.png")
+    out = tmp_path / "out"
+    run(tmp_path / "in", out)
+    assert run(tmp_path / "in", out, incremental=False) == (1, 0)
+
+
+def drop_frame_counts(out):
+    """処理記録からフレーム数を消し、複数フレーム対応より前の版の記録にします。"""
+    path = out / MANIFEST_NAME
+    entries = [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+    for entry in entries:
+        entry.pop("frames", None)
+    path.write_text("".join(json.dumps(entry) + "\n" for entry in entries), encoding="utf-8")
+
+
+def test_old_records_of_multi_frame_inputs_are_stale(make_image, tmp_path):
+    make_image("in/p1.png")
+    frames = [sample_image("RGB").rotate(angle) for angle in (0, 90)]
+    frames[0].save(tmp_path / "in" / "anim.gif", save_all=True, append_images=frames[1:], duration=100)
+    out = tmp_path / "out"
+    assert run(tmp_path / "in", out) == (2, 0)
+    drop_frame_counts(out)
+    # 1フレームの PNG は古い記録のままスキップし、アニメーション GIF だけ全フレームで分割し直す
+    assert run(tmp_path / "in", out) == (1, 1)
+    assert run(tmp_path / "in", out) == (0, 2)
+    drop_frame_counts(out)
+    assert run(tmp_path / "in", out, frame_mode="first") == (2, 0)
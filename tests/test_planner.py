@@ -0,0 +1,63 @@
+import os
+from planner import build_plan
+import processor
+from processor import ImageProcessor, SplitOptions
+
+# 事前計画（重い順の並べ替え・ドライランの報告）
+
+
+def make_pages(make_image, sizes):
+    return [make_image(f"in/{name}", "RGB", size=size) for name, size in sizes.items()]
+
+
+SIZES = {"p1.png": (40, 20), "p2.png": (200, 100), "p3.png": (100, 50), "p4.png": (40, 20)}
+
+
+def test_largest_first_keeps_ties_in_found_order(make_image):
+    paths = make_pages(make_image, SIZES)
+    plan = build_plan(paths, SplitOptions(), os.path.dirname(paths[0]), workers=2)
+    assert [os.path.basename(entry.item) for entry in plan.entries] == ["p2.png", "p3.png", "p1.png", "p4.png"]
+    assert plan.est_wall_s >= plan.entries[0].cost_s
+    unordered = build_plan(paths, SplitOptions(), os.path.dirname(paths[0]), workers=2, largest_first=False)
+    assert [entry.item for entry in unordered.entries] == paths
+
+
+def test_skipped_and_unreadable_entries(make_image, tmp_path):
+    paths = make_pages(make_image, SIZES)
+    broken = tmp_path / "in" / "broken.png"
+    broken.write_bytes(b"not an image")
+    paths.append(str(broken))
+    plan = build_plan(paths, SplitOptions(), str(tmp_path), workers=1,
+                      skip_fn=lambda item, stat: os.path.basename(item) == "p4.png")
+    # 処理記録で最新のものはすぐ終わるので先頭に置き、見積もりには入れない
+    assert os.path.basename(plan.entries[0].item) == "p4.png" and plan.entries[0].skipped
+    report = plan.report()
+    assert (report["files"], report["to_process"], report["unreadable"]) == (5, 4, 1)
+    assert [entry["error"] is not None for entry in report["entries"]].count(True) == 1
+    assert report["total_pixels"] == 200 * 100 + 100 * 50 + 40 * 20
+
+
+def test_dry_run_reports_without_writing(make_image, tmp_path):
+    make_pages(make_image, SIZES)
+    out = tmp_path / "out"
+    report = ImageProcessor(workers=1).plan([str(tmp_path / "in")], "right_to_left", output_folder=str(out))
+    assert [os.path.basename(entry["path"]) for entry in report["entries"]] == ["p2.png", "p3.png", "p1.png", "p4.png"]
+    assert report["entries"][0]["width"] == 200 and report["entries"][0]["output_bytes"] > 0
+    assert not out.exists()
+    # 分割した後のドライランは、処理記録で最新のものをスキップとして報告する
+    ImageProcessor(workers=1).process_images([str(tmp_path / "in")], "right_to_left", output_folder=str(out))
+    report = ImageProcessor(workers=1).plan([str(tmp_path / "in")], "right_to_left", output_folder=str(out))
+    assert report["to_process"] == 0 and all(entry["skipped"] for entry in report["entries"])
+
+
+def test_largest_first_processes_heavy_files_first(make_image, tmp_path, monkeypatch):
+    make_pages(make_image, SIZES)
+    # ワーカー1つなら投入した順にその場で分割する（完了の順は書き込みスレッドしだいなので見ない）
+    submitted = []
+    split_task = processor._split_task
+    monkeypatch.setattr(processor, "_split_task",
+                        lambda image_path, *args: submitted.append(os.path.basename(image_path)) or split_task(image_path, *args))
+    summary = ImageProcessor(workers=1, largest_first=True).process_images(
+        [str(tmp_path / "in")], "right_to_left", output_folder=str(tmp_path / "out"))
+    assert summary["processed"] == 4 and summary["plan"]["to_process"] == 4
+    assert submitted == ["p2.png", "p3.png", "p1.png", "p4.png"]
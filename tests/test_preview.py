@@ -0,0 +1,26 @@
+import pytest
+from PIL import Image, ImageChops
+import preview
+
+
+@pytest.mark.parametrize("mode, name, options", [
+    ("RGB", "page.png", {}),
+    ("LA", "page.png", {}),
+    ("RGBA", "page.tiff", {"compression": "tiff_lzw", "strip_size": 4096}),
+])
+def test_large_images_are_reduced_by_strips(make_image, monkeypatch, mode, name, options):
+    path = make_image(name, mode, size=(1500, 1030), **options)
+    full = preview.make_thumbnail(path)
+    # 帯読みに切り替わる画素数を下げ、画像全体は解凍爆弾チェックにかかる（帯1本はかからない）上限にする
+    monkeypatch.setattr(preview, "LARGE_PIXELS", 1)
+    monkeypatch.setattr(Image, "MAX_IMAGE_PIXELS", 400_000)
+    strips = preview.make_thumbnail(path)
+    assert (strips.width, strips.height) == (1500, 1030)
+    assert ImageChops.difference(full.image, strips.image).getbbox() is None
+
+
+def test_large_images_without_strips_keep_bomb_check(make_image, monkeypatch):
+    path = make_image("page.gif", "P", size=(300, 200))
+    monkeypatch.setattr(Image, "MAX_IMAGE_PIXELS", 1000)
+    with pytest.raises(Image.DecompressionBombError):
+        preview.make_thumbnail(path)
@@ -0,0 +1,19 @@
+import queue
+from progress import ProgressReporter
+
+# 複数フレームの画像の進み具合の集計
+
+
+def test_same_names_in_other_folders_are_tracked_apart():
+    events = queue.Queue()
+    reporter = ProgressReporter(total_fn=lambda: (2, True))
+    reporter.watch_frames(events)
+    events.put(("ch1/anim.gif", "anim.gif", 3, 10))
+    events.put(("ch2/anim.gif", "anim.gif", 5, 10))
+    reporter._drain(events)
+    assert reporter.snapshot()["frames"] == [("anim.gif", 3, 10), ("anim.gif", 5, 10)]
+    # 片方が終わっても、もう片方の途中経過は残る
+    reporter.update("anim.gif", key="ch1/anim.gif")
+    s = reporter.snapshot()
+    assert s["frames"] == [("anim.gif", 5, 10)]
+    assert s["partial"] == 0.5
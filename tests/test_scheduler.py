@@ -0,0 +1,94 @@
+import os, time
+from scheduler import JobControl, JobScheduler
+
+# ジョブキューの順序と、一時停止／キャンセル
+
+
+def wait_for(predicate, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "時間内に状態が変わらない"
+        time.sleep(0.01)
+
+
+def outputs(folder):
+    return sorted(name for name in os.listdir(folder) if name.endswith(".png")) if os.path.isdir(folder) else []
+
+
+def make_books(make_image, *names):
+    for name in names:
+        for page in range(3):
+            make_image(f"{name}/p{page}.png")
+
+
+def paused_scheduler(finished, paused_ids=(1,)):
+    """指定した番号のジョブを、探索を始める前に一時停止させるスケジューラーを返します。"""
+    def status(job, text):
+        if job.id in paused_ids and text == "ファイルリストを作成中...":
+            job.control.pause()
+    return JobScheduler(status_callback=status, done_callback=finished.append)
+
+
+def test_control_pause_resume_cancel():
+    control = JobControl()
+    control.pause()
+    assert control.paused and not control.wait_resumed(0.01)
+    control.resume()
+    assert not control.paused and control.wait_resumed(0)
+    control.pause()
+    control.cancel()
+    # キャンセルは一時停止の待ちも解き、その後の一時停止は受け付けない
+    assert control.cancelled and not control.paused
+    control.pause()
+    assert not control.paused
+
+
+def test_paused_job_holds_the_queue(make_image, tmp_path):
+    make_books(make_image, "a", "b", "c")
+    finished = []
+    scheduler = paused_scheduler(finished)
+    first, second, third = (scheduler.submit([str(tmp_path / name)], "right_to_left",
+                                             output_folder=str(tmp_path / f"out_{name}"), workers=1)
+                            for name in ("a", "b", "c"))
+    wait_for(lambda: scheduler.paused)
+    time.sleep(0.2)
+    assert outputs(tmp_path / "out_a") == []
+    assert [job.id for job in scheduler.queued()] == [second.id, third.id]
+    # 待機中のジョブのキャンセルは、その場で取り除かれる
+    scheduler.cancel(second)
+    assert second.state == "cancelled" and scheduler.queued() == [third]
+    scheduler.resume()
+    scheduler.close(cancel=False)
+    assert [job.id for job in finished] == [second.id, first.id, third.id]
+    assert (first.state, third.state) == ("done", "done")
+    assert first.summary["processed"] == third.summary["processed"] == 3
+    assert len(outputs(tmp_path / "out_a")) == 6 and outputs(tmp_path / "out_b") == []
+
+
+def test_cancelling_a_paused_job_runs_the_next(make_image, tmp_path):
+    make_books(make_image, "a", "b")
+    finished = []
+    scheduler = paused_scheduler(finished)
+    first, second = (scheduler.submit([str(tmp_path / name)], "right_to_left",
+                                      output_folder=str(tmp_path / f"out_{name}"), workers=1)
+                     for name in ("a", "b"))
+    wait_for(lambda: scheduler.paused)
+    scheduler.cancel()
+    scheduler.close(cancel=False)
+    assert first.state == "cancelled" and first.summary["cancelled"]
+    assert first.summary["processed"] == 0 and outputs(tmp_path / "out_a") == []
+    assert second.state == "done" and len(outputs(tmp_path / "out_b")) == 6
+    assert [job.id for job in finished] == [first.id, second.id]
+
+
+def test_close_cancels_remaining_jobs(make_image, tmp_path):
+    make_books(make_image, "a", "b")
+    finished = []
+    scheduler = paused_scheduler(finished)
+    first, second = (scheduler.submit([str(tmp_path / name)], "right_to_left",
+                                      output_folder=str(tmp_path / f"out_{name}"), workers=1)
+                     for name in ("a", "b"))
+    wait_for(lambda: scheduler.paused)
+    scheduler.close()
+    assert (first.state, second.state) == ("cancelled", "cancelled")
+    assert outputs(tmp_path / "out_a") == outputs(tmp_path / "out_b") == []
@@ -0,0 +1,109 @@
+import os
+import pytest
+from PIL import Image
+from processor import SplitOptions, split_image_file, tile_layout
+from strips import open_header, open_strip_reader, strip_reader_error
+
+# 帯読みの分割結果が、全体をデコードして切り出した結果と画素単位で一致するかを確かめる
+# strip_rows を小さくして、1枚が何帯にも分かれるようにしている
+
+OPTIONS = SplitOptions(stream_min_pixels=1, strip_rows=8)
+
+
+def split_and_compare(path, options=OPTIONS, max_pixels=None):
+    """帯読みで分割し、各出力を全体デコードからの切り出しと比べます。
+
+    max_pixels を渡すと、分割の間だけ解凍爆弾チェックの上限をその値にします（全体を展開していないことの確認）。
+    """
+    with open_header(path) as image:
+        assert open_strip_reader(image, path, options.strip_rows) is not None, "帯読みの対象になっていない"
+    saved = Image.MAX_IMAGE_PIXELS
+    Image.MAX_IMAGE_PIXELS = max_pixels or saved
+    try:
+        outputs = split_image_file(path, os.path.dirname(path), options)
+    finally:
+        Image.MAX_IMAGE_PIXELS = saved
+    with Image.open(path) as image:
+        image.load()
+        layout = tile_layout(image.width, image.height, options)
+        assert len(outputs) == len(layout)
+        for filename, (_, box) in zip(outputs, layout):
+            with Image.open(os.path.join(os.path.dirname(path), filename)) as part:
+                expected = image.crop(box)
+                assert part.mode == expected.mode
+                assert part.size == expected.size
+                if part.mode == "P":
+                    assert part.getpalette() == expected.getpalette()
+                    assert part.info.get("transparency") == expected.info.get("transparency")
+                assert part.tobytes() == expected.tobytes(), filename
+
+
+@pytest.mark.parametrize("mode", ["L", "LA", "RGB", "RGBA", "P"])
+@pytest.mark.parametrize("compress_level", [0, 6])
+def test_png_strips_match_full_decode(make_image, mode, compress_level):
+    split_and_compare(make_image(f"page_{mode}.png", mode, compress_level=compress_level))
+
+
+def test_png_palette_transparency_is_kept(make_image):
+    split_and_compare(make_image("page.png", "P", transparency=3))
+
+
+def test_png_odd_size_and_grid(make_image):
+    options = SplitOptions(stream_min_pixels=1, strip_rows=5, columns=3, rows=2, margin=2)
+    split_and_compare(make_image("page.png", "RGB", size=(101, 67)), options)
+
+
+@pytest.mark.parametrize("mode", ["L", "RGB", "RGBA", "CMYK"])
+@pytest.mark.parametrize("compression", [None, "tiff_deflate", "tiff_lzw", "packbits"])
+def test_tiff_strips_match_full_decode(make_image, mode, compression):
+    # strip_size を小さくして、元の TIFF も帯（8行）より低いストリップの並びにする
+    split_and_compare(make_image(f"page_{mode}.tiff", mode, compression=compression, strip_size=512))
+
+
+@pytest.mark.parametrize("mode", ["L", "RGB", "CMYK"])
+@pytest.mark.parametrize("compression", [None, "tiff_deflate", "tiff_adobe_deflate"])
+def test_single_strip_tiff_is_read_in_rows(make_image, mode, compression):
+    # スキャナ出力に多い1ストリップの TIFF。全体は解凍爆弾チェックにかかる上限でも、帯ごとなら読める
+    path = make_image(f"page_{mode}.tiff", mode, size=(150, 103), compression=compression, strip_size=1 << 30)
+    with open_header(path) as image:
+        assert int(image.tag_v2.get(278, image.height)) >= image.height
+    split_and_compare(path, max_pixels=150 * OPTIONS.strip_rows * 2)
+
+
+def test_single_strip_lzw_tiff_reports_its_layout(make_image, monkeypatch):
+    path = make_image("page.tiff", "RGB", size=(150, 103), compression="tiff_lzw", strip_size=1 << 30)
+    with open_header(path) as image:
+        assert open_strip_reader(image, path, OPTIONS.strip_rows) is None
+        assert "1ストリップ" in strip_reader_error(image, path, OPTIONS.strip_rows)
+    # 全体を展開できる大きさなら、通常の分割に切り替える
+    assert split_image_file(path, os.path.dirname(path), OPTIONS) == ["page_a.tiff", "page_b.tiff"]
+    monkeypatch.setattr(Image, "MAX_IMAGE_PIXELS", 1000)
+    with pytest.raises(ValueError, match="帯読みできない構成です"):
+        split_image_file(path, os.path.dirname(path), OPTIONS)
+
+
+def test_tiff_resolution_is_kept(make_image):
+    path = make_image("page.tiff", "RGB", dpi=(300, 300), strip_size=1024)
+    split_and_compare(path)
+    with Image.open(os.path.join(os.path.dirname(path), "page_a.tiff")) as part:
+        assert part.info["dpi"] == pytest.approx((300, 300))
+
+
+def test_unsupported_png_falls_back(make_image):
+    # 16bit の PNG は帯読みできないので、通常の分割になる
+    path = make_image("page.png", "L")
+    Image.open(path).convert("I;16").save(path)
+    with open_header(path) as image:
+        assert image.mode == "I;16"
+        assert open_strip_reader(image, path) is None
+    assert split_image_file(path, os.path.dirname(path), OPTIONS) == ["page_a.png", "page_b.png"]
+
+
+def test_open_header_keeps_bomb_limit(make_image, monkeypatch):
+    path = make_image("page.png", "RGB")
+    monkeypatch.setattr(Image, "MAX_IMAGE_PIXELS", 100)
+    with open_header(path) as image:
+        assert image.size == (96, 70)
+    assert Image.MAX_IMAGE_PIXELS == 100
+    with pytest.raises(Image.DecompressionBombError):
+        Image.open(path)
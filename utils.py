@@ -1,6 +1,10 @@
+from __future__ import annotations
 import os, sys
-from PySide6.QtGui import QColor
-from PySide6.QtWidgets import QGraphicsDropShadowEffect, QWidget
+from typing import TYPE_CHECKING
+
+# PySide6 は GUI 部品を作るときだけ読み込む（processor / cli から Qt を引き込まないため）
+if TYPE_CHECKING:
+    from PySide6.QtWidgets import QGraphicsDropShadowEffect, QWidget
 
 
 # サポートされる画像形式の拡張子
@@ -54,6 +58,13 @@ def build_qss(compact: bool = False) -> str:
         background-color: rgba(25, 25, 112, 0.45);
         color:#b8dcff; font-weight:bold;
     }}
+    /* プレビュー一覧 */
+    QListView#previewList {{
+        border:1px solid {PRIMARY_COLOR};
+        border-radius:{RADIUS_PANEL}px;
+        background-color: rgba(25, 25, 112, 0.45);
+        color:#b8dcff;
+    }}
     /* タイトル */
     QLabel#titleLabel {{ color:{TITLE_COLOR}; font-weight:bold; }}
     /* テキストパネル */
@@ -82,6 +93,8 @@ def build_qss(compact: bool = False) -> str:
 # ドロップシャドウ
 
 def apply_drop_shadow(widget: QWidget) -> QGraphicsDropShadowEffect:
+    from PySide6.QtGui import QColor
+    from PySide6.QtWidgets import QGraphicsDropShadowEffect
     eff = QGraphicsDropShadowEffect(widget)
     eff.setBlurRadius(28)
     eff.setOffset(0, 3)
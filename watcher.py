@@ -0,0 +1,249 @@
+import ctypes, ctypes.util, os, select, struct, sys, threading, time
+from archives import ARCHIVE_EXTENSIONS, natural_key
+from processor import OUTPUT_FOLDER_NAME
+from utils import SUPPORTED_EXTENSIONS
+
+# ホットフォルダ監視: 入力フォルダに置かれた画像・アーカイブを、書き込みが終わり次第フォルダごとに渡す
+# Linux では inotify（ctypes で libc を直接呼ぶ）で変更を待ち、使えない環境では一定間隔の走査に切り替える
+
+# <sys/inotify.h> の定数
+_IN_MODIFY = 0x00000002
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_Q_OVERFLOW = 0x00004000
+_IN_IGNORED = 0x00008000
+_IN_ISDIR = 0x40000000
+_IN_NONBLOCK = 0o4000
+_IN_CLOEXEC = 0o2000000
+_WATCH_MASK = _IN_MODIFY | _IN_CLOSE_WRITE | _IN_MOVED_TO | _IN_CREATE
+# inotify_event（wd, mask, cookie, len）の後に len バイトの名前が続く
+_EVENT = struct.Struct("iIII")
+
+
+class _Inotify:
+    """libc の inotify を ctypes で呼ぶ薄いラッパ。使えない環境では生成時に OSError を送出します。"""
+    def __init__(self):
+        if not sys.platform.startswith("linux"):
+            raise OSError("inotify は Linux でのみ使えます")
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = (ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32)
+        self._add_watch.restype = ctypes.c_int
+        self.fd = libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+        if self.fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+        self._folders = {}  # 監視番号 → フォルダ
+
+    def add(self, folder):
+        """フォルダを監視対象に加えます（サブフォルダは呼び出し側で個別に加える）。"""
+        wd = self._add_watch(self.fd, os.fsencode(folder), _WATCH_MASK)
+        if wd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno), folder)
+        self._folders[wd] = folder
+
+    def read(self, timeout):
+        """最大 timeout 秒イベントを待ち、[(フォルダ, 名前, mask), ...] を返します。
+
+        キューがあふれたときはフォルダが None のイベントを返すので、呼び出し側で走査し直します。
+        """
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        events = []
+        offset = 0
+        while offset + _EVENT.size <= len(data):
+            wd, mask, _, length = _EVENT.unpack_from(data, offset)
+            offset += _EVENT.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b"\0"))
+            offset += length
+            if mask & _IN_IGNORED:
+                self._folders.pop(wd, None)  # フォルダが消えた
+                continue
+            events.append((self._folders.get(wd), name, mask))
+        return events
+
+    def close(self):
+        os.close(self.fd)
+
+
+def _is_input_name(name):
+    # ドットで始まる名前は転送ツールの一時ファイルなどなので対象外
+    return not name.startswith(".") and name.lower().endswith(SUPPORTED_EXTENSIONS + ARCHIVE_EXTENSIONS)
+
+
+def _walk_folders(top, exclude=frozenset()):
+    """top 以下のフォルダ（出力フォルダ half/ と exclude に入っているフォルダを除く）を返します。"""
+    folders = []
+    for folder, subfolders, _ in os.walk(top):
+        subfolders[:] = [name for name in subfolders if name != OUTPUT_FOLDER_NAME
+                         and not (exclude and os.path.realpath(os.path.join(folder, name)) in exclude)]
+        folders.append(folder)
+    return folders
+
+
+class FolderWatcher(threading.Thread):
+    """入力フォルダ（サブフォルダを含む）を監視し、書き込みが終わった画像・アーカイブを on_ready へ渡すスレッド。
+
+    サイズと更新日時が settle 秒変わらなくなったファイルを書き込み完了とみなし、
+    フォルダごとに名前の自然順で on_ready(パスのリスト) を呼びます（監視スレッドから呼ばれます）。
+    inotify が使えない環境（Linux 以外・監視数の上限など）や use_inotify=False のときは
+    poll_interval 秒ごとの走査で探します。ネットワーク共有では他のマシンからの書き込みが
+    inotify に届かないため、走査を使ってください。
+    exclude には監視しないフォルダ（監視フォルダの中に置いた出力先など）を渡します。
+    """
+    def __init__(self, folders, on_ready, settle=1.0, poll_interval=2.0, use_inotify=True,
+                 initial_scan=True, status_callback=None, exclude=()):
+        super().__init__(daemon=True, name="ImageSplitterWatcher")
+        self.folders = [os.path.abspath(folder) for folder in folders]
+        # 出力した画像を入力として拾い、分割し続けることのないよう出力先は監視しない
+        self.exclude = {os.path.realpath(folder) for folder in exclude}
+        self.on_ready = on_ready
+        self.settle = settle
+        self.poll_interval = poll_interval
+        self.use_inotify = use_inotify
+        # 監視を始めた時点で置かれているファイルも渡すか（処理済みのものは処理記録でスキップされる）
+        self.initial_scan = initial_scan
+        self.status_callback = status_callback
+        self.mode = None  # "inotify" / "polling"
+        self._candidates = {}  # 書き込み待ち: パス → ((サイズ, 更新日時), 最後に変化を見た時刻)
+        self._delivered = {}   # 渡し済み: パス → (サイズ, 更新日時)
+        self._stopped = threading.Event()
+
+    def stop(self):
+        self._stopped.set()
+
+    def _status(self, text):
+        if self.status_callback:
+            self.status_callback(text)
+
+    def _open_inotify(self):
+        """すべてのフォルダに inotify の監視を張ります。できなければ None を返します。"""
+        try:
+            notifier = _Inotify()
+        except OSError as e:
+            self._status(f"inotify が使えないため、{self.poll_interval:g} 秒ごとの走査で監視します（{e}）")
+            return None
+        try:
+            for top in self.folders:
+                for folder in _walk_folders(top, self.exclude):
+                    notifier.add(folder)
+        except OSError as e:
+            notifier.close()
+            self._status(f"inotify の監視を設定できないため、{self.poll_interval:g} 秒ごとの走査で監視します（{e}）")
+            return None
+        return notifier
+
+    def run(self):
+        notifier = self._open_inotify() if self.use_inotify else None
+        self.mode = "inotify" if notifier else "polling"
+        self._status(f"フォルダを監視しています（{self.mode}）: " + ", ".join(self.folders))
+        # 監視を張ってから走査するので、その間に置かれたファイルも取りこぼさない
+        self._scan(deliver=self.initial_scan)
+        try:
+            next_scan = time.monotonic() + self.poll_interval
+            while not self._stopped.is_set():
+                # 書き込み待ちがあれば完了の判定のために細かく起きる
+                timeout = min(0.25, self.settle) if self._candidates else 1.0
+                if notifier is None:
+                    if self._stopped.wait(min(timeout, max(0.0, next_scan - time.monotonic()))):
+                        break
+                    if time.monotonic() >= next_scan:
+                        self._scan()
+                        next_scan = time.monotonic() + self.poll_interval
+                else:
+                    self._handle_events(notifier, notifier.read(timeout))
+                self._flush()
+        finally:
+            if notifier is not None:
+                notifier.close()
+
+    def _handle_events(self, notifier, events):
+        for folder, name, mask in events:
+            if folder is None:
+                if mask & _IN_Q_OVERFLOW:
+                    self._scan()  # 取りこぼしたイベントは走査で拾い直す
+                continue
+            path = os.path.join(folder, name)
+            if mask & _IN_ISDIR:
+                if name == OUTPUT_FOLDER_NAME or not mask & (_IN_CREATE | _IN_MOVED_TO) or os.path.realpath(path) in self.exclude:
+                    continue
+                # 新しいフォルダ（移動してきたものを含む）にも監視を張り、すでに中にあるファイルを拾う
+                try:
+                    for subfolder in _walk_folders(path, self.exclude):
+                        notifier.add(subfolder)
+                except OSError as e:
+                    self._status(f"監視を追加できません: {path}（{e}）")
+                self._scan_folder(path)
+            elif _is_input_name(name):
+                self._observe(path)
+
+    def _scan(self, deliver=True):
+        """監視中のフォルダを走査します。deliver=False なら今あるファイルを渡し済みとして記録するだけにします。"""
+        for top in self.folders:
+            self._scan_folder(top, deliver)
+
+    def _scan_folder(self, top, deliver=True):
+        for folder in _walk_folders(top, self.exclude):
+            try:
+                with os.scandir(folder) as entries:
+                    names = [entry.name for entry in entries if _is_input_name(entry.name)]
+            except OSError:
+                continue
+            for name in names:
+                path = os.path.join(folder, name)
+                if deliver:
+                    self._observe(path)
+                else:
+                    key = self._stat_key(path)
+                    if key:
+                        self._delivered[path] = key
+
+    @staticmethod
+    def _stat_key(path):
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        if not os.path.isfile(path):
+            return None
+        return st.st_size, st.st_mtime_ns
+
+    def _observe(self, path):
+        """ファイルのサイズと更新日時を記録し、変わっていれば書き込み待ちの時刻を更新します。"""
+        key = self._stat_key(path)
+        if key is None or self._delivered.get(path) == key:
+            self._candidates.pop(path, None)
+            return
+        previous = self._candidates.get(path)
+        if previous is None or previous[0] != key:
+            self._candidates[path] = (key, time.monotonic())
+
+    def _flush(self):
+        """settle 秒変化のないファイルをフォルダごとにまとめて on_ready へ渡します。"""
+        now = time.monotonic()
+        ready = {}
+        for path, (key, changed) in list(self._candidates.items()):
+            if now - changed < self.settle:
+                continue
+            current = self._stat_key(path)
+            if current is None:
+                del self._candidates[path]  # 消えた（一時ファイルが移動されたなど）
+            elif current != key:
+                self._candidates[path] = (current, now)  # まだ書き込み中
+            elif current[0] > 0:  # 空のファイルは中身が書かれるまで待つ
+                del self._candidates[path]
+                self._delivered[path] = current
+                ready.setdefault(os.path.dirname(path), []).append(path)
+        for folder in sorted(ready, key=natural_key):
+            paths = sorted(ready[folder], key=lambda path: natural_key(os.path.basename(path)))
+            try:
+                self.on_ready(paths)
+            except Exception as e:
+                self._status(f"エラー: {folder} - {e}")
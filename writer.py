@@ -0,0 +1,210 @@
+import os, threading, time, zipfile
+from concurrent.futures import Future, ThreadPoolExecutor
+
+# 書き込みステージ: エンコード済みバッファを上限付きで溜め、別スレッドで書き出す
+# 書き込みは一時ファイル → os.replace なので、途中で落ちても中途半端な _a / _b は残らない
+# 出力先はフォルダ（AsyncWriter）か、入力フォルダ／アーカイブごとの ZIP・CBZ（ArchiveWriter）
+
+
+def temp_path_for(path):
+    """path と同じフォルダに置く一時ファイル名を返します（探索に拾われないよう先頭を . にする）。"""
+    folder, name = os.path.split(path)
+    return os.path.join(folder, f".{name}.{os.getpid()}.{threading.get_ident()}.tmp")
+
+
+def remove_quietly(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def atomic_write(path, data):
+    """一時ファイルに書いてから置き換えます。"""
+    tmp_path = temp_path_for(path)
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        remove_quietly(tmp_path)
+        raise
+
+
+class AsyncWriter:
+    """書き込み専用のスレッドプール。溜めているバイト数が上限を超えると submit() が空くまで待ちます。"""
+    def __init__(self, workers=4, max_buffer_bytes=256 * 1024 * 1024):
+        self.max_buffer_bytes = max_buffer_bytes
+        self._executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="ImageSplitterWriter")
+        self._cond = threading.Condition()
+        self._buffered = 0
+
+    def submit(self, items):
+        """[(出力パス, バイト列), ...] を書き込みに回し、(書いたバイト数, 所要ミリ秒) を返す Future を返します。"""
+        size = sum(len(data) for _, data in items)
+        with self._cond:
+            # 1件だけで上限を超える場合は、他が空になってから受け付ける
+            while self._buffered and self._buffered + size > self.max_buffer_bytes:
+                self._cond.wait()
+            self._buffered += size
+        return self._executor.submit(self._write, items, size)
+
+    def _write(self, items, size):
+        t0 = time.perf_counter()
+        try:
+            for path, data in items:
+                atomic_write(path, data)
+        finally:
+            with self._cond:
+                self._buffered -= size
+                self._cond.notify_all()
+        return size, (time.perf_counter() - t0) * 1000
+
+    def close(self):
+        """残りの書き込みを待ってスレッドを止めます。"""
+        self._executor.shutdown(wait=True)
+
+
+# ZIP / CBZ への出力
+
+ARCHIVE_COMPRESSION = {"stored": zipfile.ZIP_STORED, "deflated": zipfile.ZIP_DEFLATED}
+
+
+class ArchiveWriter:
+    """分割結果を、入力フォルダ（またはアーカイブ）ごとの ZIP / CBZ へ読む順に書き込みます。
+
+    結果は完了した順に届くので、投入順の番号 seq で並べ替えてから書きます。
+    ZIP は同時に書けないため、書き込みは専用スレッド1本で行い、開いておく書庫も1つだけにします。
+    書庫は一時ファイルに書き、close() で置き換えます。
+    """
+    def __init__(self, output_folder, extension=".cbz", compression="stored"):
+        self.output_folder = output_folder
+        self.extension = extension
+        self.compression = ARCHIVE_COMPRESSION[compression]
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ImageSplitterArchive")
+        self._lock = threading.Lock()
+        self._next = 0
+        self._ready = {}      # seq → (グループ, [(名前, 書庫内の名前, バイト列 or None)], Future)。出力なしは None
+        self._current = None  # (書庫名, ZipFile)
+        self._temp_paths = {}  # 書庫名 → 一時ファイル（この実行で作ったもの）
+        self._names = {}      # グループのキー → 書庫名
+        self._arcnames = {}   # 書庫名 → 書き込んだ書庫内の名前
+        self._moved_dirs = set()  # 書き出し済みのファイルを書庫へ移した後のサブフォルダ（close() で空なら消す）
+        self.archives = []    # 書き上げた書庫のパス
+
+    def archive_path(self, name):
+        return os.path.join(self.output_folder, name + self.extension)
+
+    def _archive_name(self, group):
+        """グループ (キー, 名前) の書庫名。別のフォルダが同じ名前なら name_2, name_3 … にします。"""
+        key, name = group
+        archive_name = self._names.get(key)
+        if archive_name is None:
+            archive_name = name
+            taken = set(self._names.values())
+            n = 2
+            while archive_name in taken:
+                archive_name = f"{name}_{n}"
+                n += 1
+            self._names[key] = archive_name
+        return archive_name
+
+    @property
+    def waiting(self):
+        """前の番号を待って並べ替え中の件数。"""
+        with self._lock:
+            return len(self._ready)
+
+    def submit(self, seq, group, items):
+        """番号 seq の出力を group の書庫へ書き込みに回し、(書いたバイト数, 所要ミリ秒) を返す Future を返します。
+
+        group は (入力フォルダ・アーカイブの絶対パスなど一意なキー, 書庫の名前)。
+        items は [(出力ファイル名, 書庫内の名前, バイト列), ...]。バイト列が None のものは output_folder に
+        書き出し済みのファイルで、書庫へ移してから消します。
+        """
+        future = Future()
+        with self._lock:
+            self._ready[seq] = (group, items, future)
+            self._drain()
+        return future
+
+    def skip(self, seq):
+        """番号 seq は出力なし（エラー・取り消し）として、後続の書き込みを先へ進めます。"""
+        with self._lock:
+            self._ready[seq] = None
+            self._drain()
+
+    def _drain(self):
+        while self._next in self._ready:
+            entry = self._ready.pop(self._next)
+            self._next += 1
+            if entry is not None:
+                self._executor.submit(self._write, *entry)
+
+    def _open(self, name):
+        if self._current is not None and self._current[0] == name:
+            return self._current[1]
+        if self._current is not None:
+            self._current[1].close()
+        # 同じグループが飛び飛びに来たら、この実行で作った書庫へ追記する
+        tmp_path = self._temp_paths.get(name)
+        mode = "a" if tmp_path else "w"
+        if tmp_path is None:
+            tmp_path = self._temp_paths[name] = temp_path_for(self.archive_path(name))
+        self._current = (name, zipfile.ZipFile(tmp_path, mode, compression=self.compression))
+        return self._current[1]
+
+    def _write(self, group, items, future):
+        t0 = time.perf_counter()
+        try:
+            name = self._archive_name(group)
+            archive = self._open(name)
+            arcnames = self._arcnames.setdefault(name, set())
+            # 同じ名前のエントリは ZIP に重複して入ってしまうので、書く前に断る
+            duplicate = next((arcname for _, arcname, _ in items if arcname in arcnames), None)
+            if duplicate is not None:
+                raise ValueError(f"書庫内の名前が重複しています: {name}{self.extension}!/{duplicate}")
+            written = 0
+            date_time = time.localtime()[:6]
+            for filename, arcname, data in items:
+                arcnames.add(arcname)
+                if data is None:
+                    path = os.path.join(self.output_folder, filename)
+                    archive.write(path, arcname)
+                    remove_quietly(path)
+                    if os.path.dirname(filename):
+                        self._moved_dirs.add(os.path.dirname(filename))
+                else:
+                    archive.writestr(zipfile.ZipInfo(arcname, date_time), data, compress_type=self.compression)
+                    written += len(data)
+        except BaseException as e:
+            future.set_exception(e)
+            return
+        future.set_result((written, (time.perf_counter() - t0) * 1000))
+
+    def close(self):
+        """残りの書き込みを待ち、書庫を閉じて置き換えます。"""
+        self._executor.shutdown(wait=True)
+        if self._current is not None:
+            self._current[1].close()
+            self._current = None
+        for name, tmp_path in self._temp_paths.items():
+            path = self.archive_path(name)
+            os.replace(tmp_path, path)
+            self.archives.append(path)
+        self._temp_paths.clear()
+        self._remove_empty_dirs()
+
+    def _remove_empty_dirs(self):
+        """書庫へ移したファイルのために作られ、空になったサブフォルダを深い方から消します。"""
+        folders = set()
+        for folder in self._moved_dirs:
+            while folder:
+                folders.add(folder)
+                folder = os.path.dirname(folder)
+        for folder in sorted(folders, key=lambda name: name.count("/"), reverse=True):
+            try:
+                os.rmdir(os.path.join(self.output_folder, folder))
+            except OSError:
+                pass  # 他のファイルが残っている
+        self._moved_dirs.clear()